@@ -0,0 +1,141 @@
+# Monte Carlo difficulty balancer: plays seeded games of one room per trial on a
+# process pool and streams per-(difficulty, room) aggregates to a JSON-lines file.
+#
+#   python src/balance.py --rooms 1-1000 --trials 20 --out balance.jsonl
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import main
+
+POLICIES = ("bot", "random")
+RANDOM_KEYS = "wasdwasdfue"
+
+
+def bot_actions(state: main.GameState, rng: random.Random) -> str:
+    # Greedy bot: spend any power-up, hit an adjacent monster, otherwise walk the
+    # shortest path to the exit and stop short of arrows and dangerous spikes
+    player = state.player
+    if player.power_up:
+        return "u"
+    if main.find_adjacent_monster(player, state.monsters) is not None:
+        return "f"
+    field = main.FlowField(state.grid, state.exit_pos, state.occupancy)
+    row, col = player.row, player.col
+    moves = ""
+    for _ in range(state.allowed_moves):
+        best = field.best_step(row, col, rng)
+        if best is None:
+            break
+        dr, dc = best
+        row, col = row + dr, col + dc
+        spike = state.occupancy.spike_at((row, col))
+        if (row, col) in state.arrows.at or (spike is not None and spike.is_dangerous()):
+            break
+        moves += next(key for key, step in main.DIRECTIONS.items() if step == (dr, dc))
+    return moves or "f"
+
+
+def random_actions(state: main.GameState, rng: random.Random) -> str:
+    return "".join(rng.choice(RANDOM_KEYS) for _ in range(state.allowed_moves))
+
+
+def play_room(difficulty: str, room: int, seed: int, policy: str, max_turns: int) -> dict:
+    # One trial: generate the room and play it until the exit, death or the turn cap.
+    # The game and the policy get separate generators so policies don't shift the game's rolls.
+    state = main.GameState(difficulty, prefetch=False, room=room, seed=seed)
+    policy_rng = random.Random(seed)
+    # Stats of the build that made the room being played (balance runs never use a library)
+    build = state.room_stats
+    retries, repairs = build["retries"], build["repairs"]
+    min_turns = build["survival_turns"]  # Only trap rooms are checked
+    choose = bot_actions if policy == "bot" else random_actions
+    damage = 0
+    outcome = "exit" if state.room != room else "timeout"
+    cause = None
+    while outcome == "timeout" and state.turn < max_turns:
+        for event in main.step(state, choose(state, policy_rng)):
+            if event.kind == "damage":
+                damage += int(event.text)
+            elif event.kind == "room":
+                outcome = "exit"
+            elif event.kind == "game_over":
+                # hp (monsters or arrows), arrow, spike
+                outcome, cause = "death", event.text
+    return {"outcome": outcome, "cause": cause, "turns": state.turn, "damage": damage, "retries": retries,
+            "min_turns": min_turns, "repairs": repairs}
+
+
+def run_cell(difficulty: str, room: int, trials: int, seed: int, policy: str, max_turns: int) -> dict:
+    seeds = [random.Random(f"{seed}:{difficulty}:{room}:{trial}").getrandbits(63) for trial in range(trials)]
+    results = [play_room(difficulty, room, trial_seed, policy, max_turns) for trial_seed in seeds]
+    exits = [r for r in results if r["outcome"] == "exit"]
+    checked = [r["min_turns"] for r in results if r["min_turns"] is not None]
+    return {
+        "difficulty": difficulty,
+        "room": room,
+        "trials": trials,
+        "survival": len(exits) / trials,
+        "deaths": {cause: sum(r["cause"] == cause for r in results) for cause in sorted({r["cause"] for r in results} - {None})},
+        "timeouts": sum(r["outcome"] == "timeout" for r in results),
+        "turns_to_exit": sum(r["turns"] for r in exits) / len(exits) if exits else None,
+        "damage": sum(r["damage"] for r in results) / trials,
+        "retries": sum(r["retries"] for r in results) / trials,
+        # Trap rooms: fewest turns that get through the hazards, and shooters walled up to allow it
+        "min_turns": sum(checked) / len(checked) if checked else None,
+        "repairs": sum(r["repairs"] for r in results) / trials,
+    }
+
+
+def parse_ranges(text: str) -> list[int]:
+    # "1-1000", "5" or "1,5,10-20"; only non-negative numbers, "-" always means a range
+    numbers = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        if not first.isdigit() or not (last or first).isdigit():
+            raise ValueError(f"bad range {part!r} (use non-negative numbers like 0-99 or 1,5,10-20)")
+        numbers.extend(range(int(first), int(last or first) + 1))
+    return numbers
+
+
+def parse_rooms(text: str) -> list[int]:
+    return [room for room in parse_ranges(text) if 1 <= room <= main.MAX_ROOM]
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sweep rooms and difficulties with seeded play")
+    parser.add_argument("--rooms", default="1-20", help="room list, e.g. 1-1000 or 1,5,10-20")
+    parser.add_argument("--difficulties", default="emh")
+    parser.add_argument("--trials", type=int, default=20, help="games per (difficulty, room)")
+    parser.add_argument("--policy", choices=POLICIES, default="bot")
+    parser.add_argument("--max-turns", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="balance.jsonl")
+    args = parser.parse_args(argv)
+    if any(d not in main.START_STATS for d in args.difficulties):
+        parser.error(f"difficulties must be made of {''.join(main.START_STATS)}")
+
+    try:
+        rooms = parse_rooms(args.rooms)
+    except ValueError as e:
+        parser.error(f"--rooms: {e}")
+    cells = [(d, room) for room in rooms for d in args.difficulties]
+    start = time.perf_counter()
+    with open(args.out, "w") as out, ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_cell, d, room, args.trials, args.seed, args.policy, args.max_turns) for d, room in cells]
+        for done, future in enumerate(as_completed(futures), 1):
+            # Written as soon as each cell finishes, so a long sweep can be watched or cut short
+            out.write(json.dumps(future.result()) + "\n")
+            out.flush()
+            if done % 50 == 0 or done == len(cells):
+                print(f"{done}/{len(cells)} cells, {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
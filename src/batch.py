@@ -0,0 +1,775 @@
+# Batched simulator: many independent games stored as stacked NumPy arrays and
+# advanced one turn at a time in lockstep. The rules follow GameState/step in
+# main.py; room generation and the explosive power-up (rare, per-game events)
+# reuse the scalar code. Rooms come from main.room_rng like in GameState, in-game
+# rolls from one StreamRandom per game.
+#
+#   python src/batch.py --games 2000 --turns 200 --difficulty m
+#   python src/batch.py --check --games 50 --turns 150
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import main
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+# Tile codes (the first four match the array-backed generator)
+TILE_CODES = [main.WALL, main.FLOOR, main.EXIT, main.SHOOTER, main.HEALTH, 'P']
+T_WALL, T_FLOOR, T_EXIT, T_SHOOTER, T_HEALTH, T_POWER = range(len(TILE_CODES))
+CODE_OF_TILE = {char: code for code, char in enumerate(TILE_CODES)}
+
+# Arrow codes, 0 means no arrow. Order matches main.SHOOTER_TO_ARROW.
+ARROW_CODES = [None, main.ARROW_UP, main.ARROW_DOWN, main.ARROW_LEFT, main.ARROW_RIGHT]
+ARROW_DR = np.array([0, -1, 1, 0, 0])
+ARROW_DC = np.array([0, 0, 0, -1, 1])
+
+# Action codes: w a s d are 1-4 (main.DIRECTIONS order), then f, u, e
+A_NONE, A_F, A_U, A_E = 0, 5, 6, 7
+ACTION_CODES = {key: i + 1 for i, key in enumerate(main.DIRECTIONS)}
+ACTION_CODES.update({"f": A_F, "u": A_U, "e": A_E})
+DIR_DR = np.array([0] + [dr for dr, _ in main.DIRECTIONS.values()])
+DIR_DC = np.array([0] + [dc for _, dc in main.DIRECTIONS.values()])
+MOVE_TO_ARROW = np.array([0, 1, 3, 2, 4])  # EW -> up, EA -> left, ES -> down, ED -> right
+
+POWER_CODES = [None, 'time_stop', 'invulnerable/5hp', 'explosive']
+P_NONE, P_TIME_STOP, P_INVULN, P_EXPLOSIVE = range(len(POWER_CODES))
+
+INF = np.int32(1 << 30)
+
+
+def mix64(x: int) -> int:
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+    return x ^ (x >> 31)
+
+
+def mix64_array(x):
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+# Counter-based random stream (splitmix64 over seed + counter). Every draw is a
+# pure function of (seed, counter), so a batch can draw for many games at once
+# and a scalar GameState given the same stream as its rng sees the same numbers.
+# Only covers what step() uses: random() and choice().
+class StreamRandom:
+    def __init__(self, seed: int, counter: int = 0):
+        self.key = mix64(seed & MASK64)
+        self.counter = counter
+
+    def next64(self) -> int:
+        self.counter += 1
+        return mix64((self.key + self.counter * GOLDEN) & MASK64)
+
+    def random(self) -> float:
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def choice(self, seq):
+        return seq[int(self.random() * len(seq))]
+
+
+def stream_draw(keys, counters):
+    # Vectorized StreamRandom.random() for one draw per game; advances the counters
+    counters += np.uint64(1)
+    raw = mix64_array(keys + counters * np.uint64(GOLDEN))
+    return (raw >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def parse_cheat(seq: str):
+    # Same cheat codes as main.step: 56840<room> or 56840<power-up name>
+    if seq.startswith("56840"):
+        value = seq[5:]
+        if value.isdigit():
+            return min(int(value), main.MAX_ROOM)
+        if value in main.VALID_POWERS:
+            return value
+    return None
+
+
+def encode_actions(actions: list[str]):
+    # Action strings -> (codes, lengths, cheats by game). Quit and restart are shell commands.
+    seqs = [a.strip().lower() for a in actions]
+    cheats = {}
+    for g, seq in enumerate(seqs):
+        cheat = parse_cheat(seq)
+        if cheat is not None:
+            cheats[g] = cheat
+            seqs[g] = ""
+        elif "q" in seq or "r" in seq:
+            raise ValueError(f"batch games only take play actions, got {seq!r}")
+    width = max([1, *(len(seq) for seq in seqs)])
+    codes = np.zeros((len(seqs), width), dtype=np.int8)
+    for g, seq in enumerate(seqs):
+        codes[g, :len(seq)] = [ACTION_CODES.get(ch, A_NONE) for ch in seq]
+    return codes, np.array([len(seq) for seq in seqs]), cheats
+
+
+class BatchGames:
+    def __init__(self, seeds: list[int], difficulty: str):
+        self.n = n = len(seeds)
+        self.difficulty = difficulty
+        self.size = size = main.GRID_SIZE
+        self.seeds = list(seeds)
+        self.keys = np.array([mix64(seed & MASK64) for seed in seeds], dtype=np.uint64)
+        self.counters = np.zeros(n, dtype=np.uint64)
+        start_hp, start_ammo = main.START_STATS[difficulty]
+
+        self.tiles = np.zeros((n, size, size), dtype=np.uint8)
+        self.arrow = np.zeros((n, size, size), dtype=np.int8)
+        self.fresh = np.zeros((n, size, size), dtype=bool)
+        self.mmap = np.zeros((n, size, size), dtype=np.int32)  # monster slot + 1
+        self.smap = np.zeros((n, size, size), dtype=np.int32)  # spike slot + 1
+
+        self.prow = np.ones(n, dtype=np.int64)
+        self.pcol = np.ones(n, dtype=np.int64)
+        self.php = np.full(n, start_hp, dtype=np.int64)
+        self.pammo = np.full(n, start_ammo, dtype=np.int64)
+        self.power = np.zeros(n, dtype=np.int8)
+        self.invuln = np.zeros(n, dtype=bool)
+        self.predicted = np.zeros(n, dtype=bool)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.room = np.ones(n, dtype=np.int64)
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.over = np.zeros(n, dtype=bool)
+        self.exit_row = np.zeros(n, dtype=np.int64)
+        self.exit_col = np.zeros(n, dtype=np.int64)
+
+        self.mrow = np.zeros((n, 0), dtype=np.int64)
+        self.mcol = np.zeros((n, 0), dtype=np.int64)
+        self.mhp = np.zeros((n, 0), dtype=np.int64)
+        self.mpresent = np.zeros((n, 0), dtype=bool)
+        self.srow = np.zeros((n, 0), dtype=np.int64)
+        self.scol = np.zeros((n, 0), dtype=np.int64)
+        self.speriod = np.ones((n, 0), dtype=np.int64)
+        self.soffset = np.zeros((n, 0), dtype=np.int64)
+        self.spresent = np.zeros((n, 0), dtype=bool)
+        self.sturn = np.zeros(n, dtype=np.int64)
+        self.krow = np.zeros((n, 0), dtype=np.int64)
+        self.kcol = np.zeros((n, 0), dtype=np.int64)
+        self.kperiod = np.ones((n, 0), dtype=np.int64)
+        self.kpresent = np.zeros((n, 0), dtype=bool)
+        self.kturn = np.zeros(n, dtype=np.int64)
+
+        for g in range(n):
+            self.enter_room(g, min(1, main.MAX_ROOM))
+        self.begin_turn(np.arange(n))
+
+
+    def grow(self, monsters: int, spikes: int, shooters: int) -> None:
+        def pad(arr, width, fill):
+            if arr.shape[1] >= width:
+                return arr
+            extra = np.full((arr.shape[0], width - arr.shape[1]), fill, dtype=arr.dtype)
+            return np.concatenate([arr, extra], axis=1)
+        self.mrow, self.mcol, self.mhp = (pad(a, monsters, 0) for a in (self.mrow, self.mcol, self.mhp))
+        self.mpresent = pad(self.mpresent, monsters, False)
+        self.srow, self.scol, self.soffset = (pad(a, spikes, 0) for a in (self.srow, self.scol, self.soffset))
+        self.speriod = pad(self.speriod, spikes, 1)
+        self.spresent = pad(self.spresent, spikes, False)
+        self.krow, self.kcol = (pad(a, shooters, 0) for a in (self.krow, self.kcol))
+        self.kperiod = pad(self.kperiod, shooters, 1)
+        self.kpresent = pad(self.kpresent, shooters, False)
+
+    def enter_room(self, g: int, room: int) -> None:
+        rng = main.room_rng(self.seeds[g], room)
+        grid, exit_pos, monsters, spikes, shooters = main.generate_room(main.Actor(row=1, col=1, hp=0), room, self.difficulty, rng)
+        self.grow(len(monsters), len(spikes), len(shooters))
+        self.room[g] = room
+        self.prow[g], self.pcol[g] = 1, 1
+        self.exit_row[g], self.exit_col[g] = exit_pos
+        self.tiles[g] = [[CODE_OF_TILE[ch] for ch in row] for row in grid]
+        self.arrow[g] = 0
+        self.fresh[g] = False
+        self.mmap[g] = 0
+        self.smap[g] = 0
+        self.mpresent[g] = False
+        for slot, m in enumerate(monsters):
+            self.mrow[g, slot], self.mcol[g, slot], self.mhp[g, slot] = m.row, m.col, m.hp
+            self.mpresent[g, slot] = True
+            self.mmap[g, m.row, m.col] = slot + 1
+        self.spresent[g] = False
+        for slot, s in enumerate(spikes):
+            self.srow[g, slot], self.scol[g, slot] = s.row, s.col
+            self.speriod[g, slot], self.soffset[g, slot] = s.period, s.offset
+            self.spresent[g, slot] = True
+            self.smap[g, s.row, s.col] = slot + 1
+        self.sturn[g] = 0
+        self.kpresent[g] = False
+        for slot, k in enumerate(shooters):
+            self.krow[g, slot], self.kcol[g, slot], self.kperiod[g, slot] = k.row, k.col, k.period
+            self.kpresent[g, slot] = True
+        self.kturn[g] = 0
+
+
+    def draw_into(self, games):
+        # Draw one number per game and store the advanced counters back
+        counters = self.counters[games]
+        values = stream_draw(self.keys[games], counters)
+        self.counters[games] = counters
+        return values
+
+    def spike_danger(self, games, rows, cols):
+        # Whether the spike at (row, col) of each game is present and dangerous
+        slot = self.smap[games, rows, cols] - 1
+        has = slot >= 0
+        slot = np.where(has, slot, 0)
+        period = self.speriod[games, slot]
+        phase = (self.sturn[games] + self.soffset[games, slot]) % period
+        return has & (phase < period // 2)
+
+    def danger_map(self, games):
+        # Dense dangerous-spike layer for the given games
+        period = self.speriod[games]
+        dangerous = self.spresent[games] & (((self.sturn[games, None] + self.soffset[games]) % period) < period // 2)
+        layer = np.zeros((len(games), self.size, self.size), dtype=bool)
+        g_idx, slot = np.nonzero(dangerous)
+        layer[g_idx, self.srow[games][g_idx, slot], self.scol[games][g_idx, slot]] = True
+        return layer
+
+    def remove_dead(self, games) -> None:
+        dead = self.mpresent[games] & (self.mhp[games] == 0)
+        g_idx, slot = np.nonzero(dead)
+        g = games[g_idx]
+        rows, cols = self.mrow[g, slot], self.mcol[g, slot]
+        mine = self.mmap[g, rows, cols] == slot + 1
+        self.mmap[g[mine], rows[mine], cols[mine]] = 0
+        self.mpresent[g, slot] = False
+
+    def kill_monsters_at(self, games, rows, cols) -> None:
+        slot = self.mmap[games, rows, cols] - 1
+        has = slot >= 0
+        g, slot = games[has], slot[has]
+        alive = self.mhp[g, slot] > 0
+        self.mhp[g[alive], slot[alive]] = 0
+
+
+    def fire_shooters(self, games) -> None:
+        ready = self.kpresent[games] & (self.kturn[games, None] % self.kperiod[games] == 0)
+        g_idx, slot = np.nonzero(ready)
+        if len(g_idx):
+            g = games[g_idx]
+            order = []
+            cells = []
+            dirs = []
+            for code in range(1, 5):
+                r = self.krow[g, slot] + ARROW_DR[code]
+                c = self.kcol[g, slot] + ARROW_DC[code]
+                inside = (r >= 0) & (r < self.size) & (c >= 0) & (c < self.size)
+                r, c = np.where(inside, r, 0), np.where(inside, c, 0)
+                ok = inside & (self.tiles[g, r, c] == T_FLOOR) & (self.arrow[g, r, c] == 0)
+                cells.append(((g * self.size + r) * self.size + c)[ok])
+                order.append((slot * 4 + code)[ok])
+                dirs.append(np.full(ok.sum(), code, dtype=np.int8))
+            cells, order, dirs = np.concatenate(cells), np.concatenate(order), np.concatenate(dirs)
+            # First shooter (list order, then direction order) to reach a tile places its arrow
+            by_cell = np.lexsort((order, cells))
+            cells, dirs = cells[by_cell], dirs[by_cell]
+            first = np.unique(cells, return_index=True)[1]
+            flat_arrow = self.arrow.reshape(-1)
+            flat_fresh = self.fresh.reshape(-1)
+            flat_arrow[cells[first]] = dirs[first]
+            flat_fresh[cells[first]] = True
+        self.kturn[games] += 1
+
+    def move_arrows(self, games) -> None:
+        arrow = self.arrow[games]
+        fresh = self.fresh[games]
+        tiles = self.tiles[games]
+        moving = (arrow > 0) & ~fresh
+        count, size = len(games), self.size
+        gi = np.arange(count)
+        player_hits = np.zeros(count, dtype=np.int64)
+        new_arrow = np.where(fresh, arrow, 0).astype(np.int8)
+        arrivals = {}
+        for code in range(1, 5):
+            dr, dc = ARROW_DR[code], ARROW_DC[code]
+            g_idx, r, c = np.nonzero(moving & (arrow == code))
+            nr, nc = r + dr, c + dc
+            inside = (nr >= 0) & (nr < size) & (nc >= 0) & (nc < size)
+            g_idx, r, c, nr, nc = g_idx[inside], r[inside], c[inside], nr[inside], nc[inside]
+            # Every in-bounds step hits whatever stands on the target tile
+            self.kill_monsters_at(games[g_idx], nr, nc)
+            np.add.at(player_hits, g_idx, (self.prow[games[g_idx]] == nr) & (self.pcol[games[g_idx]] == nc))
+            ok = tiles[g_idx, nr, nc] == T_FLOOR
+            if dr > 0 or dc > 0:
+                # Moving down/right: a moving arrow on the target has not left yet and clears the tile
+                ok &= ~moving[g_idx, nr, nc]
+            arrivals[code] = (g_idx[ok], nr[ok], nc[ok])
+        # Later arrows in row-major order win a shared tile: from below, right, left, above
+        for code in (2, 4, 3, 1):
+            g_idx, nr, nc = arrivals[code]
+            new_arrow[g_idx, nr, nc] = code
+        self.arrow[games] = new_arrow
+        self.fresh[games] = False
+        # The crossing-path rule cannot trigger here: the player does not move during this phase
+
+        # Insta-kill if player or monster is standing on an arrow after all arrows move
+        g_idx, r, c = np.nonzero(new_arrow)
+        self.kill_monsters_at(games[g_idx], r, c)
+        standing = new_arrow[gi, self.prow[games], self.pcol[games]] > 0
+        inv = self.invuln[games]
+        power = self.power[games]
+        hp = self.php[games]
+        hit = ~inv & ((player_hits > 0) | standing)
+        absorbed = hit & (power == P_INVULN)
+        dies = hit & (standing | (player_hits >= 2) | (power != P_INVULN))
+        power[absorbed] = P_NONE
+        hp[dies] = 0
+        self.power[games] = power
+        self.php[games] = hp
+
+    def begin_turn(self, games) -> None:
+        games = games[~self.over[games]]
+        while len(games):
+            self.fire_shooters(games)
+            self.move_arrows(games)
+            rows, cols = self.prow[games], self.pcol[games]
+            health = self.tiles[games, rows, cols] == T_HEALTH
+            self.php[games[health]] += 2
+            self.tiles[games[health], rows[health], cols[health]] = T_FLOOR
+            at_exit = (rows == self.exit_row[games]) & (cols == self.exit_col[games])
+            for g in games[at_exit]:
+                self.enter_room(g, int(self.room[g]) + 1)
+            games_done = games[~at_exit]
+            self.over[games_done[self.php[games_done] <= 0]] = True
+            games = games[at_exit]
+
+
+    def explode(self, g: int, radius: int = 4) -> int:
+        pr, pc = int(self.prow[g]), int(self.pcol[g])
+        r0, r1 = max(1, pr - radius), min(self.size - 1, pr + radius + 1)
+        c0, c1 = max(1, pc - radius), min(self.size - 1, pc + radius + 1)
+        rr, cc = np.mgrid[r0:r1, c0:c1]
+        disc = (rr - pr) ** 2 + (cc - pc) ** 2 <= radius * radius
+        tiles = self.tiles[g, r0:r1, c0:c1]
+        cleared = disc & (tiles != T_EXIT)
+        tiles[cleared] = T_FLOOR
+        self.arrow[g, r0:r1, c0:c1][cleared] = 0
+        self.fresh[g, r0:r1, c0:c1][cleared] = False
+        inside = (self.mrow[g] - pr) ** 2 + (self.mcol[g] - pc) ** 2 <= radius * radius
+        killed = self.mpresent[g] & (self.mhp[g] > 0) & inside
+        self.mhp[g, killed] = 0
+        return int(killed.sum())
+
+    def apply_actions(self, codes, lengths, games) -> None:
+        n = self.n
+        i = np.zeros(n, dtype=np.int64)
+        limit = np.full(n, main.ALLOWED_MOVES, dtype=np.int64)
+        used = np.zeros(n, dtype=bool)
+        running = np.zeros(n, dtype=bool)
+        running[games] = True
+        width = codes.shape[1]
+        while True:
+            g = np.nonzero(running & (i < lengths) & (i < limit))[0]
+            if not len(g):
+                return
+            move = codes[g, i[g]]
+            nxt = codes[g, np.minimum(i[g] + 1, width - 1)]
+            rows, cols = self.prow[g], self.pcol[g]
+
+            # Shoot arrow: 'e' followed by direction (w/a/s/d)
+            shoot = (move == A_E) & (i[g] + 1 < lengths[g])
+            sg = g[shoot]
+            code = MOVE_TO_ARROW[np.where((nxt[shoot] >= 1) & (nxt[shoot] <= 4), nxt[shoot], 0)]
+            nr, nc = rows[shoot] + ARROW_DR[code], cols[shoot] + ARROW_DC[code]
+            fire = (code > 0) & (self.pammo[sg] != 0)
+            fire &= (self.tiles[sg, nr, nc] == T_FLOOR) & (self.arrow[sg, nr, nc] == 0)
+            self.arrow[sg[fire], nr[fire], nc[fire]] = code[fire]
+            self.pammo[sg[fire]] -= 1
+            i[sg] += 2
+            g, move, rows, cols = g[~shoot], move[~shoot], rows[~shoot], cols[~shoot]
+
+            # Health/ammo pickup
+            health = self.tiles[g, rows, cols] == T_HEALTH
+            self.php[g[health]] += 2
+            if self.difficulty != "e":
+                self.pammo[g[health]] += 2
+            self.tiles[g[health], rows[health], cols[health]] = T_FLOOR
+
+            # Arrow and spike checks skip the first action
+            later = i[g] > 0
+            protected = self.invuln[g] | (self.power[g] == P_INVULN)
+            on_arrow = later & (self.arrow[g, rows, cols] > 0) & ~protected
+            spiked = later & ~on_arrow & self.spike_danger(g, rows, cols)
+            survive = spiked & protected
+            sg = g[survive]
+            slot = self.smap[sg, rows[survive], cols[survive]] - 1
+            self.spresent[sg, slot] = False
+            self.smap[sg, rows[survive], cols[survive]] = 0
+            self.invuln[sg] = False
+            self.power[sg[self.power[sg] == P_INVULN]] = P_NONE
+            dead = on_arrow | (spiked & ~protected)
+            self.over[g[dead]] = True
+            running[g[dead]] = False
+            keep = ~dead
+            g, move, rows, cols = g[keep], move[keep], rows[keep], cols[keep]
+
+            # Power-up pickup
+            power_tile = self.tiles[g, rows, cols] == T_POWER
+            roll_g = g[power_tile & (self.power[g] == P_NONE)]
+            roll = self.draw_into(roll_g)
+            self.power[roll_g] = np.where(roll < 1/3, P_TIME_STOP, np.where(roll < 2/3, P_INVULN, P_EXPLOSIVE))
+            self.tiles[g[power_tile], rows[power_tile], cols[power_tile]] = T_FLOOR
+
+            at_exit = (rows == self.exit_row[g]) & (cols == self.exit_col[g])
+            for eg in g[at_exit]:
+                self.enter_room(eg, int(self.room[eg]) + 1)
+            running[g[at_exit]] = False
+            defeated = ~at_exit & (self.php[g] <= 0)
+            self.over[g[defeated]] = True
+            running[g[defeated]] = False
+            keep = ~at_exit & ~defeated
+            g, move, rows, cols = g[keep], move[keep], rows[keep], cols[keep]
+            i[g] += 1
+
+            # Use power-up
+            use = (move == A_U) & (self.power[g] != P_NONE) & ~used[g]
+            ug = g[use]
+            kind = self.power[ug]
+            limit[ug[kind == P_TIME_STOP]] += 200
+            inv = ug[kind == P_INVULN]
+            self.invuln[inv] = True
+            self.php[inv] += 5
+            for eg in ug[kind == P_EXPLOSIVE]:
+                killed = self.explode(eg)
+                self.score[eg] += killed
+                limit[eg] += 2 * killed
+            self.power[ug] = P_NONE
+            used[ug] = True
+
+            # Attack the first adjacent monster
+            attack = move == A_F
+            ag = g[attack]
+            target = np.full(len(ag), -1, dtype=np.int64)
+            for d in range(1, 5):
+                tr, tc = rows[attack] + DIR_DR[d], cols[attack] + DIR_DC[d]
+                slot = self.mmap[ag, tr, tc] - 1
+                hit = (target < 0) & (slot >= 0)
+                hit &= self.mhp[ag, np.maximum(slot, 0)] != 0
+                target[hit] = slot[hit]
+            found = target >= 0
+            fg, fslot = ag[found], target[found]
+            mortal = self.mhp[fg, fslot] != -1
+            fg, fslot = fg[mortal], fslot[mortal]
+            self.mhp[fg, fslot] -= 1
+            kill = self.mhp[fg, fslot] == 0
+            self.score[fg[kill]] += 1
+            limit[fg[kill]] += 2
+            self.predicted[ag] = ~found
+            if len(ag):
+                self.remove_dead(ag)
+
+            # Move
+            walk = (move >= 1) & (move <= 4)
+            wg = g[walk]
+            nr = np.clip(rows[walk] + DIR_DR[move[walk]], 0, self.size - 1)
+            nc = np.clip(cols[walk] + DIR_DC[move[walk]], 0, self.size - 1)
+            tile = self.tiles[wg, nr, nc]
+            free = (tile != T_WALL) & (tile != T_SHOOTER)
+            self.prow[wg[free]], self.pcol[wg[free]] = nr[free], nc[free]
+
+
+    def flow_field(self, games, danger):
+        # Same distances as main.FlowField: Dijkstra from the player, run as a
+        # bucket queue over every game at once, stopping per game once its
+        # monsters are settled plus one step of slack.
+        size = self.size
+        area = size * size
+        count = len(games)
+        tile_cost = np.array([main.PATH_COSTS.get(ch, 1) for ch in TILE_CODES], dtype=object)
+        blocked_lut = np.array([cost is None for cost in tile_cost])
+        cost_lut = np.array([1 if cost is None else cost for cost in tile_cost], dtype=np.int64)
+        tiles = self.tiles[games].reshape(-1)
+        blocked = blocked_lut[tiles]
+        enter = (cost_lut[tiles] + danger.reshape(-1) * main.PATH_SPIKE_COST).astype(np.int32)
+        max_enter = max([1, *(c for c in main.PATH_COSTS.values() if c is not None)]) + main.PATH_SPIKE_COST
+
+        # Blocked tiles hold -1 so a single comparison rejects them while relaxing
+        dist = np.where(blocked, -1, INF).astype(np.int32)
+        source = np.zeros(count * area, dtype=bool)
+        g_idx, slot = np.nonzero(self.mpresent[games])
+        cells = np.unique(g_idx * area + self.mrow[games][g_idx, slot] * size + self.mcol[games][g_idx, slot])
+        source[cells] = True
+        pending = np.bincount(cells // area, minlength=count)
+        bound = np.full(count, INF, dtype=np.int64)
+        start = (np.arange(count) * area + self.prow[games] * size + self.pcol[games]).astype(np.int32)
+        dist[start] = 0
+        costs = sorted({int(c) for c in cost_lut} | {int(c) + main.PATH_SPIKE_COST for c in cost_lut})
+        offsets = (-size, -1, size, 1)
+        # Bucket queue: level -> arrays of cells reached at that distance. A cell is
+        # only queued when its distance drops, so stale copies are the only repeats.
+        buckets = {0: [start]}
+        while buckets:
+            level = min(buckets)
+            cells = np.concatenate(buckets.pop(level))
+            cells = cells[dist[cells] == level]
+            if bound.min() < level:
+                cells = cells[bound[cells // area] >= level]
+            if not len(cells):
+                continue
+            hit = source[cells]
+            if hit.any():
+                owners = cells[hit] // area
+                np.subtract.at(pending, owners, 1)
+                done = owners[pending[owners] == 0]
+                bound[done] = np.minimum(bound[done], level + max_enter)
+            step = enter[cells]
+            for cost in costs:
+                group = cells[step == cost]
+                nd = level + cost
+                for off in offsets:
+                    nb = group + off
+                    nb = nb[nd < dist[nb]]
+                    if len(nb):
+                        dist[nb] = nd
+                        buckets.setdefault(nd, []).append(nb)
+        dist[blocked] = INF
+        return dist.reshape(count, size, size)
+
+    def move_monsters(self, games) -> None:
+        games = games[self.mpresent[games].any(axis=1)]
+        if not len(games) or not self.mpresent.shape[1]:
+            return
+        danger = self.danger_map(games)
+        field = self.flow_field(games, danger)
+        local = np.full(self.n, -1, dtype=np.int64)
+        local[games] = np.arange(len(games))
+        size = self.size
+        arrow = self.arrow
+        chase_chance = main.MONSTER_CHASE_CHANCE
+        for slot in range(self.mpresent.shape[1]):
+            active = games[self.mpresent[games, slot]]
+            for _ in range(2):  # Up to 2 moves per turn
+                if not len(active):
+                    break
+                mr, mc = self.mrow[active, slot], self.mcol[active, slot]
+                pr, pc = self.prow[active], self.pcol[active]
+                # If already adjacent to player, stop moving
+                active = active[np.abs(mr - pr) + np.abs(mc - pc) != 1]
+                if not len(active):
+                    break
+                mr, mc = self.mrow[active, slot], self.mcol[active, slot]
+                li = local[active]
+                chase = self.draw_into(active) < chase_chance
+                dr = np.zeros(len(active), dtype=np.int64)
+                dc = np.zeros(len(active), dtype=np.int64)
+                stuck = np.zeros(len(active), dtype=bool)
+                if chase.any():
+                    cg, cl, cr, cc = active[chase], li[chase], mr[chase], mc[chase]
+                    own = field[cl, cr, cc]
+                    near = np.stack([field[cl, cr + DIR_DR[d], cc + DIR_DC[d]] for d in range(1, 5)], axis=1)
+                    best = near.min(axis=1)
+                    can = best < own
+                    stuck[np.nonzero(chase)[0][~can]] = True
+                    cg, cl, near, best = cg[can], cl[can], near[can], best[can]
+                    tied = near == best[:, None]
+                    pick = (self.draw_into(cg) * tied.sum(axis=1)).astype(np.int64)
+                    d = np.argmax(tied & (np.cumsum(tied, axis=1) - 1 == pick[:, None]), axis=1) + 1
+                    where = np.nonzero(chase)[0][can]
+                    dr[where], dc[where] = DIR_DR[d], DIR_DC[d]
+                wander = ~chase
+                if wander.any():
+                    d = (self.draw_into(active[wander]) * 4).astype(np.int64) + 1
+                    dr[wander], dc[wander] = DIR_DR[d], DIR_DC[d]
+                active, dr, dc, mr, mc, li = active[~stuck], dr[~stuck], dc[~stuck], mr[~stuck], mc[~stuck], li[~stuck]
+                nr = np.clip(mr + dr, 0, size - 1)
+                nc = np.clip(mc + dc, 0, size - 1)
+                # Dangerous spike or arrow on the target tile kills the monster
+                dies = danger[li, nr, nc] | (arrow[active, nr, nc] > 0)
+                self.mhp[active[dies], slot] = 0
+                keep = ~dies
+                active, nr, nc, mr, mc = active[keep], nr[keep], nc[keep], mr[keep], mc[keep]
+                tile = self.tiles[active, nr, nc]
+                other = self.mmap[active, nr, nc]
+                go = (tile != T_WALL) & (tile != T_SHOOTER) & ((other == 0) | (other == slot + 1))
+                mg = active[go]
+                mine = self.mmap[mg, mr[go], mc[go]] == slot + 1
+                self.mmap[mg[mine], mr[go][mine], mc[go][mine]] = 0
+                self.mmap[mg, nr[go], nc[go]] = slot + 1
+                self.mrow[mg, slot], self.mcol[mg, slot] = nr[go], nc[go]
+
+    def resolve_damage(self, games) -> None:
+        # Prediction attack: each adjacent live monster dies with 80% chance
+        pred = games[self.predicted[games]]
+        for d in range(1, 5):
+            if not len(pred):
+                break
+            slot = self.mmap[pred, self.prow[pred] + DIR_DR[d], self.pcol[pred] + DIR_DC[d]] - 1
+            alive = (slot >= 0) & (self.mhp[pred, np.maximum(slot, 0)] > 0)
+            ag, aslot = pred[alive], slot[alive]
+            kill = self.draw_into(ag) < 0.8
+            self.mhp[ag[kill], aslot[kill]] = 0
+            self.score[ag[kill]] += 1
+        self.predicted[pred] = False
+
+        rows, cols = self.prow[games], self.pcol[games]
+        inv = self.invuln[games]
+        slot = self.mmap[games, rows, cols] - 1
+        on_me = slot >= 0
+        og, oslot = games[on_me], slot[on_me]
+        mortal = self.mhp[og, oslot] != -1
+        self.mhp[og[mortal], oslot[mortal]] = 0
+        self.score[og[mortal]] += 1
+        damage = on_me.astype(np.int64)
+        for d in range(1, 5):
+            slot = self.mmap[games, rows + DIR_DR[d], cols + DIR_DC[d]] - 1
+            damage += (slot >= 0) & (self.mhp[games, np.maximum(slot, 0)] != 0)
+        self.php[games] -= np.where(inv, 0, damage)
+        self.invuln[games] = False
+        self.remove_dead(games)
+
+
+    def step(self, actions: list[str]) -> None:
+        codes, lengths, cheats = encode_actions(actions)
+        games = np.nonzero(~self.over)[0]
+        cheated = np.array([g for g in games if g in cheats], dtype=np.int64)
+        for g in cheated:
+            if isinstance(cheats[g], int):
+                self.enter_room(g, cheats[g])
+            else:
+                self.power[g] = POWER_CODES.index(cheats[g])
+        self.begin_turn(cheated)
+        games = games[~np.isin(games, cheated)]
+        self.turn[games] += 1
+        self.apply_actions(codes, lengths, games)
+        games = games[~self.over[games]]
+        self.move_monsters(games)
+        # Advance all spike timers
+        self.sturn[games] += 1
+        self.resolve_damage(games)
+        self.begin_turn(games)
+
+
+    def snapshot(self, g: int) -> dict:
+        # Plain-Python view of one game, comparable with scalar_snapshot()
+        present = np.nonzero(self.mpresent[g])[0]
+        arrows = {(int(r), int(c)): ARROW_CODES[self.arrow[g, r, c]] for r, c in zip(*np.nonzero(self.arrow[g]))}
+        return {
+            "over": bool(self.over[g]),
+            "player": (int(self.prow[g]), int(self.pcol[g]), int(self.php[g]), int(self.pammo[g]), POWER_CODES[self.power[g]]),
+            "score": int(self.score[g]),
+            "room": int(self.room[g]),
+            "tiles": ["".join(TILE_CODES[t] for t in row) for row in self.tiles[g]],
+            "arrows": arrows,
+            "monsters": [(int(self.mrow[g, s]), int(self.mcol[g, s]), int(self.mhp[g, s])) for s in present],
+            "spikes": sorted((int(self.srow[g, s]), int(self.scol[g, s])) for s in np.nonzero(self.spresent[g])[0]),
+        }
+
+
+def scalar_snapshot(state: main.GameState) -> dict:
+    player = state.player
+    return {
+        "over": state.game_over,
+        "player": (player.row, player.col, player.hp, player.ammo, player.power_up),
+        "score": state.score,
+        "room": state.room,
+        "tiles": ["".join(row) for row in state.grid],
+        "arrows": {pos: state.arrows.glyph[slot] for pos, slot in state.arrows.at.items()},
+        "monsters": state.monsters.records(),
+        "spikes": sorted((s.row, s.col) for s in state.spikes),
+    }
+
+
+def random_actions(rng, count: int) -> list[str]:
+    keys = np.array(list("wasdsdsdsdffueweaesed"))
+    lengths = rng.integers(1, 5, size=count)
+    return ["".join(rng.choice(keys, size=k)) for k in lengths]
+
+
+def exit_seeking_actions(rng, states: list[main.GameState]) -> list[str]:
+    # Mostly walk the shortest path to the exit so checks also cover room transitions
+    actions = []
+    for action, state in zip(random_actions(rng, len(states)), states):
+        if state.game_over or rng.random() < 0.3:
+            actions.append(action)
+            continue
+        field = main.FlowField(state.grid, state.exit_pos)
+        row, col = state.player.row, state.player.col
+        moves = ""
+        for _ in range(main.ALLOWED_MOVES):
+            here = field.dist[row * field.width + col]
+            key = min(main.DIRECTIONS, key=lambda k: field.dist[(row + main.DIRECTIONS[k][0]) * field.width + col + main.DIRECTIONS[k][1]])
+            dr, dc = main.DIRECTIONS[key]
+            if field.dist[(row + dr) * field.width + col + dc] >= here:
+                break
+            moves += key
+            row, col = row + dr, col + dc
+        roll = rng.random()
+        if roll < 0.02:
+            action = f"56840{rng.integers(1, 12)}"
+        elif roll < 0.05:
+            action = "56840" + rng.choice(sorted(main.VALID_POWERS))
+        else:
+            action = moves + action[:1] if roll < 0.25 else moves or action
+        actions.append(action)
+    return actions
+
+
+def check(games: int, turns: int, difficulty: str, seed: int) -> bool:
+    # Scalar-vs-batch equivalence on seeded games with the same action script
+    seeds = list(range(seed, seed + games))
+    batch = BatchGames(seeds, difficulty)
+    states = [main.GameState(difficulty, prefetch=False, seed=s, rng=StreamRandom(s)) for s in seeds]
+    script = np.random.default_rng(seed)
+    for turn in range(turns + 1):
+        for g, state in enumerate(states):
+            want, got = scalar_snapshot(state), batch.snapshot(g)
+            if want != got:
+                diff = [key for key in want if want[key] != got[key]]
+                print(f"mismatch: game seed {seeds[g]} turn {turn} fields {diff}")
+                for key in diff:
+                    print(f"  scalar {key}: {want[key]}")
+                    print(f"  batch  {key}: {got[key]}")
+                return False
+        if turn == turns:
+            rooms = sum(state.room - 1 for state in states)
+            print(f"{rooms} room transitions, {sum(s.game_over for s in states)} games over")
+            break
+        actions = exit_seeking_actions(script, states)
+        for state, action in zip(states, actions):
+            main.step(state, action)
+        batch.step(actions)
+    print(f"ok: {games} games x {turns} turns match the scalar engine")
+    return True
+
+
+def benchmark(games: int, turns: int, difficulty: str, seed: int) -> None:
+    start = time.perf_counter()
+    batch = BatchGames(list(range(seed, seed + games)), difficulty)
+    setup = time.perf_counter() - start
+    script = np.random.default_rng(seed)
+    played = 0
+    start = time.perf_counter()
+    for _ in range(turns):
+        live = int((~batch.over).sum())
+        if not live:
+            break
+        batch.step(random_actions(script, games))
+        played += live
+    elapsed = time.perf_counter() - start
+    print(f"setup {setup:.2f}s for {games} games")
+    print(f"{played} game-turns in {elapsed:.2f}s: {played / elapsed:.0f} game-turns/s")
+    print(f"alive {int((~batch.over).sum())}/{games}, mean room {batch.room.mean():.2f}, mean score {batch.score.mean():.2f}")
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run many dungeon games at once")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--difficulty", choices=["e", "m", "h"], default="m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="compare against the scalar engine instead of benchmarking")
+    args = parser.parse_args(argv)
+    if args.check:
+        return 0 if check(args.games, args.turns, args.difficulty, args.seed) else 1
+    benchmark(args.games, args.turns, args.difficulty, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,301 @@
+# Benchmarks for room generation, the turn step and rendering at growing grid
+# sizes, with fixed seeds. Results can be saved as a JSON baseline and compared
+# against later runs. Turn cases also show how much of a real-time tick they use.
+#
+#   python src/bench.py --save bench_baseline.json
+#   python src/bench.py --compare bench_baseline.json
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import main
+
+SIZES = [24, 64, 128, 256, 512]
+TILE_SIZES = list(range(1, 9))
+DIFFICULTIES = ["e", "m", "h"]
+ROOMS = {"normal": 1, "trap": 5}
+VIEWPORT = (40, 80)  # Rows, columns in tiles
+SEED = 1234
+STEP_KEYS = "wasdwasdfue"
+
+
+def measure(run, budget: float, min_runs: int = 1) -> dict:
+    # Call run() until the time budget is spent; run() may return extra stats to average
+    times = []
+    extras = []
+    spent = 0.0
+    while len(times) < min_runs or spent < budget:
+        start = time.perf_counter()
+        extra = run()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+        if isinstance(extra, dict):
+            extras.append(extra)
+    result = {"seconds": statistics.median(times), "best": min(times), "runs": len(times)}
+    for key in extras[0] if extras else ():
+        result[key] = sum(extra[key] for extra in extras) / len(extras)
+    return result
+
+
+def peak_kb(run) -> int:
+    # Peak traced allocation of one more call, measured apart from the timings
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+class GridSize:
+    # Temporarily change main.GRID_SIZE (and optionally the generation engine)
+    def __init__(self, size: int, engine: str | None = None):
+        self.size = size
+        self.engine = engine
+
+    def __enter__(self):
+        self.saved = main.GRID_SIZE, main.GRID_ENGINE
+        main.GRID_SIZE = self.size
+        if self.engine is not None:
+            main.GRID_ENGINE = self.engine
+        return self
+
+    def __exit__(self, *exc):
+        main.GRID_SIZE, main.GRID_ENGINE = self.saved
+
+
+def bench_build_grid(size: int, engine: str, budget: float) -> dict:
+    rng = random.Random(SEED)
+
+    def run():
+        _, _, retries = main.build_grid(width=size, height=size, floor_chance=0.65, walkers=6, walk_steps=80, rng=rng, difficulty="m")
+        return {"retries": retries}
+
+    with GridSize(size, engine):
+        result = measure(run, budget)
+        result["peak_kb"] = peak_kb(run)
+    return result
+
+
+def bench_is_reachable(size: int, budget: float) -> dict:
+    with GridSize(size):
+        grid, _, _ = main.build_grid(width=size, height=size, floor_chance=0.65, walkers=6, walk_steps=80, rng=random.Random(SEED), difficulty="m")
+    end = (size - 2, size - 2)
+    return measure(lambda: main.is_reachable(grid, (1, 1), end), budget)
+
+
+def bench_survival(size: int, budget: float) -> dict:
+    # Survivability search on a hard trap room (hazards played forward, up to 3 steps a turn)
+    room = ROOMS["trap"]
+    with GridSize(size):
+        grid, exit_pos, _, spikes, shooters = main.generate_room(main.Actor(row=1, col=1, hp=0), room, "h", main.room_rng(SEED, room))
+    result = measure(lambda: main.survival_search(grid, exit_pos, spikes, shooters), budget)
+    result["turns"] = main.survival_search(grid, exit_pos, spikes, shooters)[0]
+    return result
+
+
+def bench_generate_room(size: int, difficulty: str, room: int, budget: float) -> dict:
+    rng = random.Random(SEED)
+
+    def run():
+        _, stats = main.generate_room_stats(main.Actor(row=1, col=1, hp=0), room, difficulty, rng)
+        return {"retries": stats["retries"]}
+
+    with GridSize(size):
+        result = measure(run, budget)
+        result["peak_kb"] = peak_kb(run)
+    return result
+
+
+def bench_room_library(size: int, budget: float) -> dict:
+    # Room transition served from a library file instead of generate_room
+    rooms = list(range(1, 11))
+    with GridSize(size), tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rooms.lib")
+        records = [("m", room, SEED, main.encode_room(main.generate_room(main.Actor(row=1, col=1, hp=0), room, "m", main.room_rng(SEED, room)))) for room in rooms]
+        main.write_library(path, records, size, main.GRID_ENGINE)
+        library = main.RoomLibrary(path)
+        cycle = iter(rooms * 10**6)
+        result = measure(lambda: library.get("m", next(cycle), SEED), budget)
+        result["peak_kb"] = peak_kb(lambda: library.get("m", 1, SEED))
+        library.close()
+    return result
+
+
+def bench_step(size: int, difficulty: str, budget: float) -> dict:
+    # Per-turn cost with a fixed action script; games that end are rebuilt outside the timing
+    script = random.Random(SEED)
+    with GridSize(size):
+        state = main.GameState(difficulty, prefetch=False, seed=SEED)
+
+        def run():
+            nonlocal state
+            if state.game_over:
+                state = main.GameState(difficulty, prefetch=False, seed=script.getrandbits(32))
+            actions = "".join(script.choice(STEP_KEYS) for _ in range(main.ALLOWED_MOVES))
+            start = time.perf_counter()
+            main.step(state, actions)
+            return {"step_seconds": time.perf_counter() - start}
+
+        result = measure(run, budget, min_runs=20)
+    # The rebuilds are not part of a turn, report the mean step time itself
+    return {"seconds": result["step_seconds"], "runs": result["runs"], "tick_share": result["step_seconds"] * main.TICK_RATE}
+
+
+def bench_render(size: int, tile_size: int, budget: float) -> dict:
+    with GridSize(size):
+        state = main.GameState("m", prefetch=False, seed=SEED)
+        saved = main.TILE_SIZE
+        main.TILE_SIZE = tile_size
+        try:
+            frame = state.frame()
+            result = measure(lambda: main.expand_frame(frame), budget)
+            result["peak_kb"] = peak_kb(lambda: main.expand_frame(frame))
+            # Diff renderer: alternate between two consecutive turns
+            before = state.frame()
+            main.step(state, "f")
+            after = state.frame()
+            renderer = main.TerminalRenderer(out=io.StringIO())
+            renderer.prev = before  # Skip the first full redraw, it clears the real screen
+            frames = [after, before]
+
+            def draw():
+                renderer.out = io.StringIO()
+                renderer.draw(frames[0], "")
+                frames.reverse()
+
+            result["diff_seconds"] = measure(draw, budget / 2)["seconds"]
+        finally:
+            main.TILE_SIZE = saved
+    return result
+
+
+def bench_viewport(size: int, budget: float) -> dict:
+    # Camera window of a fixed size; the cost should not grow with the map
+    with GridSize(size):
+        state = main.GameState("m", prefetch=False, seed=SEED)
+    camera = main.Camera(*VIEWPORT)
+    return measure(lambda: main.expand_frame(camera.frame(state)), budget)
+
+
+def bench_explode(size: int, budget: float) -> dict:
+    # Blast around the player; it visits the disc only, so the map size should not matter
+    with GridSize(size):
+        state = main.GameState("h", prefetch=False, seed=SEED)
+    return measure(lambda: main.explode(state), budget)
+
+
+def bench_world(difficulty: str, budget: float) -> dict:
+    # Open-world turn cost: only the chunks around the player are simulated
+    script = random.Random(SEED)
+    state = main.WorldState(difficulty, seed=SEED)
+
+    def run():
+        nonlocal state
+        if state.game_over:
+            state = main.WorldState(difficulty, seed=script.getrandbits(32))
+        actions = "".join(script.choice(STEP_KEYS) for _ in range(main.ALLOWED_MOVES))
+        start = time.perf_counter()
+        main.step(state, actions)
+        return {"step_seconds": time.perf_counter() - start}
+
+    result = measure(run, budget, min_runs=20)
+    return {"seconds": result["step_seconds"], "runs": result["runs"], "tick_share": result["step_seconds"] * main.TICK_RATE}
+
+
+def run_suite(sizes: list[int], tile_sizes: list[int], budget: float) -> dict:
+    engines = ["python"] + (["numpy"] if main.np is not None else [])
+    cases = []
+    for size in sizes:
+        for engine in engines:
+            cases.append((f"build_grid/{engine}/{size}", lambda s=size, e=engine: bench_build_grid(s, e, budget)))
+        cases.append((f"is_reachable/{size}", lambda s=size: bench_is_reachable(s, budget)))
+        cases.append((f"survival/{size}", lambda s=size: bench_survival(s, budget)))
+        cases.append((f"room_library/{size}", lambda s=size: bench_room_library(s, budget)))
+        for difficulty in DIFFICULTIES:
+            for kind, room in ROOMS.items():
+                cases.append((f"generate_room/{difficulty}/{kind}/{size}", lambda s=size, d=difficulty, r=room: bench_generate_room(s, d, r, budget)))
+            cases.append((f"step/{difficulty}/{size}", lambda s=size, d=difficulty: bench_step(s, d, budget)))
+        cases.append((f"viewport/{size}", lambda s=size: bench_viewport(s, budget)))
+        cases.append((f"explode/{size}", lambda s=size: bench_explode(s, budget)))
+        for tile_size in tile_sizes:
+            cases.append((f"render/tile{tile_size}/{size}", lambda s=size, t=tile_size: bench_render(s, t, budget)))
+    for difficulty in DIFFICULTIES:
+        cases.append((f"world_step/{difficulty}", lambda d=difficulty: bench_world(d, budget)))
+    results = {}
+    for name, case in cases:
+        results[name] = case()
+        print(format_line(name, results[name]), flush=True)
+    return results
+
+
+def format_line(name: str, result: dict, baseline: dict | None = None) -> str:
+    line = f"{name:<34} {result['seconds'] * 1000:>10.3f} ms"
+    if "retries" in result:
+        line += f"  retries {result['retries']:.2f}"
+    if "turns" in result:
+        line += f"  {result['turns']} turns to survive"
+    if "peak_kb" in result:
+        line += f"  peak {result['peak_kb']} KiB"
+    if "diff_seconds" in result:
+        line += f"  diff draw {result['diff_seconds'] * 1000:.3f} ms"
+    if "tick_share" in result:
+        # Part of a real-time tick (main.TICK_RATE) that one step() uses up
+        line += f"  {result['tick_share']:.0%} of a tick"
+    if baseline is not None:
+        line += f"  x{result['seconds'] / baseline['seconds']:.2f} vs baseline"
+    return line
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    # Lists every case against the baseline; returns how many got slower than the threshold
+    slower = 0
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<34} (not in baseline)")
+            continue
+        line = format_line(name, result, base)
+        if result["seconds"] > base["seconds"] * threshold:
+            slower += 1
+            line += "  SLOWER"
+        print(line)
+    return slower
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark generation, turns and rendering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--tiles", type=int, nargs="+", default=TILE_SIZES, help="TILE_SIZE values for render cases")
+    parser.add_argument("--budget", type=float, default=0.2, help="seconds to spend per case")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=1.10, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.tiles, args.budget)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "numpy": main.np is not None, "seed": SEED, "results": results}, f, indent=1)
+        print(f"Saved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        slower = compare(results, baseline, args.threshold)
+        print(f"{slower} case(s) slower than x{args.threshold:.2f}")
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
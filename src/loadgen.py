@@ -0,0 +1,149 @@
+# Load generator for src/server.py: opens many sessions on localhost, each sending
+# random action strings in a closed loop (send a turn, wait for the whole reply,
+# optionally think, repeat), and reports turn throughput and latency percentiles.
+#
+#   python src/loadgen.py --sessions 1000 --duration 20 --think 200
+#   python src/loadgen.py --ramp 250 500 1000 2000 --p99 50 --server-workers 4
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import main
+import server
+
+RANDOM_KEYS = "wasdwasdfue"
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []  # Seconds from sending a command to the end of its reply
+        self.bytes = 0
+        self.games = 0
+        self.errors = 0
+
+
+async def read_reply(reader: asyncio.StreamReader) -> tuple[list[str], int]:
+    # One reply block: returns its event lines and the bytes it took
+    events = []
+    size = 0
+    while True:
+        raw = await reader.readline()
+        if not raw:
+            raise ConnectionError("server closed the connection")
+        size += len(raw)
+        line = raw.decode().rstrip("\n")
+        kind, _, rest = line.partition(" ")
+        if kind in ("ok", "error"):
+            if kind == "error":
+                events.append(line)
+            return events, size
+        if kind == "event":
+            events.append(rest)
+        elif kind in ("full", "delta"):
+            # Tile lines follow, one per row (full) or per changed tile (delta)
+            for _ in range(int(rest.split()[0])):
+                size += len(await reader.readline())
+
+
+def new_command(args: argparse.Namespace, rng: random.Random) -> str:
+    return f"new {args.difficulty} {rng.getrandbits(32)}" + (" world" if args.world else "")
+
+
+async def player(index: int, args: argparse.Namespace, deadline: float, stats: Stats) -> None:
+    rng = random.Random(f"{args.seed}:{index}")
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    command = new_command(args, rng)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write((command + "\n").encode())
+            await writer.drain()
+            events, size = await read_reply(reader)
+            stats.latencies.append(time.perf_counter() - start)
+            stats.bytes += size
+            if any(event.startswith("error") for event in events):
+                stats.errors += 1
+            if command.startswith("new"):
+                stats.games += 1
+            if any(event.startswith("game_over") for event in events):
+                command = new_command(args, rng)
+            else:
+                command = "".join(rng.choice(RANDOM_KEYS) for _ in range(main.ALLOWED_MOVES))
+            if args.think:
+                await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think / 1000)
+        writer.write(b"quit\n")
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def run_load(args: argparse.Namespace, sessions: int) -> tuple[Stats, float]:
+    stats = Stats()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    # Connections open in small batches so the listen backlog is not flooded
+    tasks = []
+    for i in range(sessions):
+        tasks.append(asyncio.create_task(player(i, args, deadline, stats)))
+        if i % 100 == 99:
+            await asyncio.sleep(0.01)
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    stats.errors += sum(isinstance(result, Exception) for result in results)
+    return stats, time.perf_counter() - start
+
+
+def percentile(ordered: list[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))] if ordered else 0.0
+
+
+def report(sessions: int, stats: Stats, elapsed: float, cores: int) -> float:
+    # Prints one line per run and returns its p99 latency in milliseconds
+    ordered = sorted(stats.latencies)
+    turns = len(ordered)
+    p50, p90, p99 = (percentile(ordered, share) * 1000 for share in (0.5, 0.9, 0.99))
+    print(
+        f"{sessions:>6} sessions  {turns / elapsed:>9.0f} turns/s ({turns / elapsed / cores:.0f}/core)"
+        f"  latency p50 {p50:.2f} p90 {p90:.2f} p99 {p99:.2f} max {(ordered[-1] if ordered else 0) * 1000:.2f} ms"
+        f"  {stats.bytes / max(turns, 1):.0f} B/turn  {stats.games} games  {stats.errors} errors",
+        flush=True,
+    )
+    return p99
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure a dungeon server with many simulated players")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=server.DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--ramp", type=int, nargs="+", metavar="N", help="run once per session count instead of --sessions")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--think", type=float, default=0.0, metavar="MS", help="mean pause between turns per player")
+    parser.add_argument("--difficulty", choices=["e", "m", "h"], default="m")
+    parser.add_argument("--world", action="store_true", help="play open-world sessions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--server-workers", type=int, default=1, help="server processes, for the per-core figures")
+    parser.add_argument("--p99", type=float, metavar="MS", help="latency target: report the most sessions per core that kept p99 under it")
+    args = parser.parse_args(argv)
+
+    best = None
+    for sessions in args.ramp or [args.sessions]:
+        stats, elapsed = asyncio.run(run_load(args, sessions))
+        p99 = report(sessions, stats, elapsed, args.server_workers)
+        if args.p99 is not None and p99 <= args.p99 and not stats.errors:
+            best = sessions
+    if args.p99 is not None:
+        if best is None:
+            print(f"No run kept p99 under {args.p99:g} ms")
+        else:
+            print(f"{best / args.server_workers:.0f} sessions per core with p99 under {args.p99:g} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
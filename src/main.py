@@ -1,14 +1,3 @@
-# Shooter with independent timer
-class Shooter:
-    def __init__(self, row, col):
-        self.row = row
-        self.col = col
-        self.period = random.randint(2, 5)
-        self.turn = 0
-    def ready(self):
-        return self.turn % self.period == 0
-    def advance(self):
-        self.turn += 1
 SHOOTER = "#"
 ARROW_UP = "↑"
 ARROW_DOWN = "↓"
@@ -16,12 +5,44 @@ ARROW_RIGHT = "→"
 ARROW_LEFT = "←"
 TILE_SIZE = 2  # Each tile is TILE_SIZE x TILE_SIZE block
 import os
+import sys
+import shutil
+import time
 import random
 import math
+import json
+import hashlib
+import gc
+import argparse
+import asyncio
+import atexit
+import struct
+import mmap
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, build_grid falls back to the pure-Python engine
+    np = None
+try:
+    import termios
+    import tty
+except ImportError:  # Not on Windows; real-time mode polls the console through msvcrt there
+    termios = tty = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
 
 GRID_SIZE = 24  # Change this to set map size (nxn)
+# Generation engine for build_grid: "python" or "numpy" (array-backed, needs NumPy). The two
+# build different rooms from the same seed; numpy is picked with --engine or DUNGEON_ENGINE
+ENGINES = ("python", "numpy")
+GRID_ENGINE = os.environ.get("DUNGEON_ENGINE", "python")
 WALL = "■"
 FLOOR = "."
 EXIT = "E"
@@ -32,26 +53,117 @@ HEALTH = "+"
 SPIKE_DANGEROUS = "▲"
 SPIKE_SAFE = "_"
 
+SPIKE_PERIODS = (2, 3, 4)
+# Slot of each spike (period, phase) in HazardClock.danger
+SPIKE_SLOTS = {(period, phase): i for i, (period, phase) in enumerate((p, k) for p in SPIKE_PERIODS for k in range(p))}
+
+
+# Spike and shooter timers of one room, driven by turn counters instead of a
+# counter per object. A spike is dangerous while (turn + offset) % period <
+# period // 2 and a shooter fires when turn % period == 0, so hazards only differ
+# by (period, phase). Spikes read a danger bitmap with one entry per (period,
+# phase), refreshed once per tick; shooters sit in buckets keyed the same way so
+# a tick only visits the ones that fire. Spikes and shooters keep separate
+# counters because they advance at different points of a turn.
+class HazardClock:
+    def __init__(self, spikes=(), shooters=()):
+        self.spike_turn = 0
+        self.shooter_turn = 0
+        self.danger = [False] * len(SPIKE_SLOTS)
+        self.refresh()
+        self.buckets = {}  # (period, phase) -> [(index, shooter)] in list order
+        for spike in spikes:
+            self.bind_spike(spike, spike.turn)
+        for index, shooter in enumerate(shooters):
+            self.bind_shooter(shooter, shooter.turn)
+            self.buckets.setdefault((shooter.period, shooter.start % shooter.period), []).append((index, shooter))
+
+    def refresh(self) -> None:
+        for (period, phase), slot in SPIKE_SLOTS.items():
+            self.danger[slot] = (self.spike_turn + phase) % period < period // 2
+
+    def bind_spike(self, spike: "Spike", turn: int) -> None:
+        # Move a spike onto this clock, keeping its own turn count
+        spike.clock = self
+        spike.start = self.spike_turn - turn
+        spike.slot = SPIKE_SLOTS[(spike.period, (turn + spike.offset - self.spike_turn) % spike.period)]
+
+    def bind_shooter(self, shooter: "Shooter", turn: int) -> None:
+        shooter.clock = self
+        shooter.start = self.shooter_turn - turn
+
+    def tick_spikes(self) -> None:
+        self.spike_turn += 1
+        self.refresh()
+
+    def tick_shooters(self) -> None:
+        self.shooter_turn += 1
+
+    def due(self) -> list["Shooter"]:
+        # Shooters that fire this turn, in the order of the room's shooter list
+        fired = []
+        for (period, phase), bucket in self.buckets.items():
+            if self.shooter_turn % period == phase:
+                fired.extend(bucket)
+        fired.sort(key=lambda item: item[0])
+        return [shooter for _, shooter in fired]
+
+    def release(self, spikes, shooters) -> None:
+        # Hand hazards back to the stopped clock with their turns, e.g. when a chunk is frozen
+        for spike in spikes:
+            STOPPED_CLOCK.bind_spike(spike, spike.turn)
+        for shooter in shooters:
+            STOPPED_CLOCK.bind_shooter(shooter, shooter.turn)
+
+
+# Clock of hazards outside a live room (just generated, frozen or being loaded); it never ticks
+STOPPED_CLOCK = HazardClock()
+
+
+# Shooter with independent timer
+class Shooter:
+    def __init__(self, row, col, rng=random):
+        self.row = row
+        self.col = col
+        self.period = rng.randint(2, 5)
+        STOPPED_CLOCK.bind_shooter(self, 0)
+
+    @property
+    def turn(self) -> int:
+        return self.clock.shooter_turn - self.start
+
+    @turn.setter
+    def turn(self, value: int) -> None:
+        self.clock.bind_shooter(self, value)
+
+    def ready(self):
+        return self.turn % self.period == 0
+
 class Spike:
-    def __init__(self, row, col):
+    def __init__(self, row, col, rng=random):
         self.row = row
         self.col = col
-        self.period = random.choice([2, 3, 4])  # How many turns per cycle
-        self.offset = random.randint(0, self.period-1)  # Phase offset
-        self.turn = 0
+        self.period = rng.choice(SPIKE_PERIODS)  # How many turns per cycle
+        self.offset = rng.randint(0, self.period-1)  # Phase offset
+        STOPPED_CLOCK.bind_spike(self, 0)
+
+    @property
+    def turn(self) -> int:
+        return self.clock.spike_turn - self.start
+
+    @turn.setter
+    def turn(self, value: int) -> None:
+        self.clock.bind_spike(self, value)
+
     def is_dangerous(self):
         # Dangerous for half the period, safe for the other half
-        phase = (self.turn + self.offset) % self.period
-        return phase < self.period // 2
-    def advance(self):
-        self.turn += 1
+        return self.clock.danger[self.slot]
 
-def place_spikes(grid: list[list[str]], count: int, forbidden: set[tuple[int, int]]):
+def place_spikes(grid: list[list[str]], count: int, free: "FreeTiles", rng=random):
     spikes = []
-    for _ in range(count):
-        r, c = random_floor_tile(grid, forbidden)
-        spikes.append(Spike(r, c))
-        forbidden.add((r, c))
+    for _ in range(min(count, len(free))):
+        r, c = free.draw(rng)
+        spikes.append(Spike(r, c, rng))
     return spikes
 
 DIRECTIONS = {
@@ -60,10 +172,14 @@ DIRECTIONS = {
     "s": (1, 0),
     "d": (0, 1),
 }
+DIRECTION_STEPS = list(DIRECTIONS.values())
 
-
-def clear_screen() -> None:
-    os.system("cls" if os.name == "nt" else "clear")
+ARROW_DIRS = {
+    ARROW_UP: (-1, 0),
+    ARROW_DOWN: (1, 0),
+    ARROW_LEFT: (0, -1),
+    ARROW_RIGHT: (0, 1),
+}
 
 
 @dataclass
@@ -75,6 +191,251 @@ class Actor:
     power_up: str = None  # Holds current power-up
 
 
+# Arrows in flight. Each arrow is a slot in parallel lists; only slots in the
+# active set are stepped and `at` maps a tile to the slot standing on it.
+# Arrows always sit on FLOOR tiles, the grid itself never holds arrow glyphs.
+class ArrowStore:
+    def __init__(self):
+        self.row = []
+        self.col = []
+        self.glyph = []
+        self.free = []
+        self.active = set()
+        self.fresh = set()  # Spawned by shooters this turn, they wait one turn before moving
+        self.at = {}
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def clear(self) -> None:
+        # Drop every arrow but keep the slots for the next room
+        self.free = list(range(len(self.row) - 1, -1, -1))
+        self.active.clear()
+        self.fresh.clear()
+        self.at.clear()
+
+    def glyph_at(self, pos: tuple[int, int]) -> str | None:
+        slot = self.at.get(pos)
+        return None if slot is None else self.glyph[slot]
+
+    def add(self, row: int, col: int, glyph: str, fresh: bool = False) -> None:
+        if self.free:
+            slot = self.free.pop()
+            self.row[slot], self.col[slot], self.glyph[slot] = row, col, glyph
+        else:
+            slot = len(self.row)
+            self.row.append(row)
+            self.col.append(col)
+            self.glyph.append(glyph)
+        self.active.add(slot)
+        self.at[(row, col)] = slot
+        if fresh:
+            self.fresh.add(slot)
+
+    def drop(self, slot: int) -> None:
+        pos = (self.row[slot], self.col[slot])
+        if self.at.get(pos) == slot:
+            del self.at[pos]
+        self.active.discard(slot)
+        self.fresh.discard(slot)
+        self.free.append(slot)
+
+    def remove(self, pos: tuple[int, int]) -> None:
+        slot = self.at.get(pos)
+        if slot is not None:
+            self.drop(slot)
+
+    def advance(self, grid: list[list[str]]) -> list[tuple[tuple[int, int], tuple[int, int]]]:
+        # Move every live arrow one tile, in row-major order like the old grid scan.
+        # Returns the (from, to) steps that stayed in bounds so callers can resolve hits.
+        moving = sorted((slot for slot in self.active if slot not in self.fresh), key=lambda s: (self.row[s], self.col[s]))
+        self.fresh.clear()
+        pending = set(moving)
+        steps = []
+        for slot in moving:
+            pending.discard(slot)
+            r, c = self.row[slot], self.col[slot]
+            dr, dc = ARROW_DIRS[self.glyph[slot]]
+            nr, nc = r + dr, c + dc
+            if not (0 <= nr < len(grid) and 0 <= nc < len(grid[0])):
+                self.drop(slot)
+                continue
+            steps.append(((r, c), (nr, nc)))
+            if grid[nr][nc] != FLOOR:
+                self.drop(slot)
+                continue
+            other = self.at.get((nr, nc))
+            if other in pending:
+                # That arrow still has to leave and takes the tile with it
+                self.drop(slot)
+                continue
+            if other is not None:
+                self.drop(other)
+            del self.at[(r, c)]
+            self.row[slot], self.col[slot] = nr, nc
+            self.at[(nr, nc)] = slot
+        return steps
+
+
+# Monsters of the current room as a struct of arrays, with slots reused through
+# a free list like ArrowStore. `order` holds the live slots in spawn order (the
+# order they move in) and `at` maps a tile to the slot standing on it. Killed
+# monsters (hp 0) keep their slot, tile and turn order until remove_dead().
+class MonsterPool:
+    def __init__(self, monsters: list[Actor] = ()):
+        self.row = array("i")
+        self.col = array("i")
+        self.hp = array("i")
+        self.invulnerable = bytearray()
+        self.free = []
+        self.order = []
+        self.at = {}
+        self.load(monsters)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def load(self, monsters: list[Actor]) -> None:
+        # Replace the contents with a new room's monsters, reusing the slots
+        self.free = list(range(len(self.row) - 1, -1, -1))
+        self.order.clear()
+        self.at.clear()
+        for monster in monsters:
+            self.add_record(monster.row, monster.col, monster.hp)
+
+    def add(self, row: int, col: int, hp: int, invulnerable: bool = False) -> int:
+        if self.free:
+            slot = self.free.pop()
+            self.row[slot], self.col[slot], self.hp[slot], self.invulnerable[slot] = row, col, hp, invulnerable
+        else:
+            slot = len(self.row)
+            self.row.append(row)
+            self.col.append(col)
+            self.hp.append(hp)
+            self.invulnerable.append(invulnerable)
+        self.order.append(slot)
+        self.at[(row, col)] = slot
+        return slot
+
+    def add_record(self, row: int, col: int, hp: int) -> int:
+        # Saves, digests and generated rooms write an invulnerable monster as hp -1
+        return self.add(row, col, 1, True) if hp == -1 else self.add(row, col, hp)
+
+    def hp_record(self, slot: int) -> int:
+        return -1 if self.immune(slot) else self.hp[slot]
+
+    def records(self) -> list[tuple[int, int, int]]:
+        return [(self.row[slot], self.col[slot], self.hp_record(slot)) for slot in self.order]
+
+    def actors(self) -> list[Actor]:
+        return [Actor(row=row, col=col, hp=hp) for row, col, hp in self.records()]
+
+    def alive(self, slot: int) -> bool:
+        return self.hp[slot] != 0
+
+    def vulnerable(self, slot: int) -> bool:
+        # Alive and can be killed by attacks, arrows and explosions
+        return self.hp[slot] > 0 and not self.invulnerable[slot]
+
+    def immune(self, slot: int) -> bool:
+        return self.invulnerable[slot] and self.hp[slot] != 0
+
+    def move(self, slot: int, row: int, col: int) -> None:
+        pos = (self.row[slot], self.col[slot])
+        if self.at.get(pos) == slot:
+            del self.at[pos]
+        self.at[(row, col)] = slot
+        self.row[slot], self.col[slot] = row, col
+
+    def try_move(self, slot: int, dr: int, dc: int, grid: list[list[str]]) -> None:
+        new_row, new_col = clamp_move(self.row[slot] + dr, self.col[slot] + dc, grid)
+        if grid[new_row][new_col] == WALL or grid[new_row][new_col] == SHOOTER:
+            return
+        # Monsters don't move onto each other, dead ones included
+        other = self.at.get((new_row, new_col))
+        if other is not None and other != slot:
+            return
+        self.move(slot, new_row, new_col)
+
+    def adjacent(self, row: int, col: int) -> list[int]:
+        found = []
+        for dr, dc in DIRECTIONS.values():
+            slot = self.at.get((row + dr, col + dc))
+            if slot is not None:
+                found.append(slot)
+        return found
+
+    def remove_dead(self) -> None:
+        # Free the slots of monsters with hp 0; invulnerable ones never get there by attacks
+        kept = 0
+        for slot in self.order:
+            if self.hp[slot] != 0:
+                self.order[kept] = slot
+                kept += 1
+                continue
+            pos = (self.row[slot], self.col[slot])
+            if self.at.get(pos) == slot:
+                del self.at[pos]
+            self.free.append(slot)
+        del self.order[kept:]
+
+
+# Position -> spike map for the current room (monsters keep their own in
+# MonsterPool.at). Pickups are grid tiles already, so they need no entry here.
+class SpatialIndex:
+    def __init__(self, spikes: list | None = None):
+        self.spikes = {(s.row, s.col): s for s in spikes or []}
+
+    def spike_at(self, pos: tuple[int, int]):
+        return self.spikes.get(pos)
+
+    def remove_spike(self, spike) -> None:
+        if self.spikes.get((spike.row, spike.col)) is spike:
+            del self.spikes[(spike.row, spike.col)]
+
+
+# Area queries for effects (explosions, shooter rays, future bombs). A shape is
+# a list of (dr, dc) offsets built once and cached, and a query only visits the
+# cells of the shape, so its cost depends on the shape and not on the map size.
+AREA_SHAPES = {}
+
+
+def disc_offsets(radius: int) -> list[tuple[int, int]]:
+    # Cells whose centre is within `radius` of the origin, row by row
+    key = ("disc", radius)
+    if key not in AREA_SHAPES:
+        AREA_SHAPES[key] = [
+            (dr, dc)
+            for dr in range(-radius, radius + 1)
+            for dc in range(-radius, radius + 1)
+            if dr * dr + dc * dc <= radius * radius
+        ]
+    return AREA_SHAPES[key]
+
+
+def line_offsets(dr: int, dc: int, length: int) -> list[tuple[int, int]]:
+    # The `length` cells after the origin in one direction
+    key = ("line", dr, dc, length)
+    if key not in AREA_SHAPES:
+        AREA_SHAPES[key] = [(dr * i, dc * i) for i in range(1, length + 1)]
+    return AREA_SHAPES[key]
+
+
+def area_cells(row: int, col: int, offsets: list[tuple[int, int]], top: int, left: int, bottom: int, right: int) -> list[tuple[int, int]]:
+    # Cells of a shape placed at (row, col) that fall inside rows [top, bottom) and columns [left, right)
+    return [(row + dr, col + dc) for dr, dc in offsets if top <= row + dr < bottom and left <= col + dc < right]
+
+
+def area_entities(at: dict, row: int, col: int, offsets: list[tuple[int, int]]) -> list:
+    # Entities of a position map (MonsterPool.at, SpatialIndex.spikes, ArrowStore.at) inside a shape
+    found = []
+    for dr, dc in offsets:
+        entity = at.get((row + dr, col + dc))
+        if entity is not None:
+            found.append(entity)
+    return found
+
+
 def clamp_move(row: int, col: int, grid: list[list[str]]) -> tuple[int, int]:
     max_row = len(grid) - 1
     max_col = len(grid[0]) - 1
@@ -83,6 +444,34 @@ def clamp_move(row: int, col: int, grid: list[list[str]]) -> tuple[int, int]:
     return row, col
 
 
+def get_shooter_count(difficulty: str | None, shooter_multiplier: int, rng=random) -> int:
+    # Shooter count depends on the difficulty; grids built without one get none
+    if difficulty is not None:
+        diff = difficulty
+        # Always at least 1 shooter in easy trap rooms
+        if diff == 'e' and shooter_multiplier > 1:
+            base = 1
+        elif diff == 'e':
+            base = 1 if rng.random() < 0.15 else 0
+        elif diff == 'm':
+            base = 1
+        elif diff == 'h':
+            base = rng.choice([2, 3])
+        else:
+            base = 0
+        return base * shooter_multiplier
+    return 0
+
+
+def select_engine(name: str) -> None:
+    global GRID_ENGINE
+    if name not in ENGINES:
+        raise ValueError(f"unknown generation engine {name!r} (choose from {', '.join(ENGINES)})")
+    if name == "numpy" and np is None:
+        raise ValueError("the numpy generation engine needs NumPy installed")
+    GRID_ENGINE = name
+
+
 def build_grid(
     width: int,
     height: int,
@@ -90,9 +479,16 @@ def build_grid(
     walkers: int,
     walk_steps: int,
     shooter_multiplier: int = 1,
-) -> list[list[str]]:
+    rng=random,
+    difficulty: str | None = None,
+) -> tuple[list[list[str]], list[Shooter], int]:
+    # Returns the grid, its shooters and how many times it was regenerated (unreachable exit)
+    if GRID_ENGINE == "numpy" and np is not None:
+        return build_grid_numpy(width, height, floor_chance, walkers, walk_steps, shooter_multiplier, rng, difficulty)
+
     start = (1, 1)
     end = (height - 2, width - 2)
+    retries = 0
 
     while True:
         grid = [[WALL for _ in range(width)] for _ in range(height)]
@@ -105,7 +501,7 @@ def build_grid(
                     grid[r][c] = FLOOR
 
         while (row, col) != end:
-            if random.random() < 0.5:
+            if rng.random() < 0.5:
                 row += 1 if row < end[0] else 0
                 row -= 1 if row > end[0] else 0
             else:
@@ -115,46 +511,130 @@ def build_grid(
 
         for r in range(1, height - 1):
             for c in range(1, width - 1):
-                if grid[r][c] == WALL and random.random() < floor_chance:
+                if grid[r][c] == WALL and rng.random() < floor_chance:
                     grid[r][c] = FLOOR
         for _ in range(walkers):
-            row, col = random.randint(1, height - 2), random.randint(1, width - 2)
+            row, col = rng.randint(1, height - 2), rng.randint(1, width - 2)
             for _ in range(walk_steps):
                 grid[row][col] = FLOOR
-                dr, dc = random.choice(list(DIRECTIONS.values()))
+                dr, dc = rng.choice(list(DIRECTIONS.values()))
                 row = max(1, min(height - 2, row + dr))
                 col = max(1, min(width - 2, col + dc))
         grid[end[0]][end[1]] = EXIT
 
         # Place SHOOTER tiles after map is generated, based on difficulty
-        def get_shooter_count():
-            if hasattr(build_grid, 'difficulty'):
-                diff = build_grid.difficulty
-                # Always at least 1 shooter in easy trap rooms
-                if diff == 'e' and shooter_multiplier > 1:
-                    base = 1
-                elif diff == 'e':
-                    base = 1 if random.random() < 0.15 else 0
-                elif diff == 'm':
-                    base = 1
-                elif diff == 'h':
-                    base = random.choice([2, 3])
-                else:
-                    base = 0
-                return base * shooter_multiplier
-            return 0
-        shooter_count = get_shooter_count()
+        shooter_count = get_shooter_count(difficulty, shooter_multiplier, rng)
         # Place shooters on random wall tiles (not on border)
         wall_tiles = [(r, c) for r in range(2, height-2) for c in range(2, width-2) if grid[r][c] == WALL]
-        random.shuffle(wall_tiles)
+        rng.shuffle(wall_tiles)
         shooters = []
         for i in range(min(shooter_count, len(wall_tiles))):
             r, c = wall_tiles[i]
             grid[r][c] = SHOOTER
-            shooters.append(Shooter(r, c))
+            shooters.append(Shooter(r, c, rng))
 
         if is_reachable(grid, start, end):
-            return grid, shooters
+            return grid, shooters, retries
+        # Count regenerations (unreachable exit) for the balancer
+        retries += 1
+
+
+# Tile codes used by the array-backed generator
+GEN_TILES = [WALL, FLOOR, EXIT, SHOOTER]
+GEN_WALL, GEN_FLOOR, GEN_EXIT, GEN_SHOOTER = range(len(GEN_TILES))
+
+
+def build_grid_numpy(
+    width: int,
+    height: int,
+    floor_chance: float,
+    walkers: int,
+    walk_steps: int,
+    shooter_multiplier: int = 1,
+    rng=random,
+    difficulty: str | None = None,
+) -> tuple[list[list[str]], list[Shooter], int]:
+    # Same rules as build_grid, but every carving pass works on a whole uint8 array at once
+    start = (1, 1)
+    end = (height - 2, width - 2)
+    gen = np.random.default_rng(rng.getrandbits(64))
+    retries = 0
+
+    while True:
+        tiles = np.full((height, width), GEN_WALL, dtype=np.uint8)
+        tiles[max(1, start[0] - 1):min(height - 1, start[0] + 2), max(1, start[1] - 1):min(width - 1, start[1] + 2)] = GEN_FLOOR
+
+        # Main path: a monotone walk, each step picks the row or the column axis with p=0.5
+        need = (end[0] - start[0]) + (end[1] - start[1])
+        row, col = start
+        while (row, col) != end:
+            pick_row = gen.random(2 * need + 16) < 0.5
+            rows = np.minimum(row + np.cumsum(pick_row), end[0])
+            cols = np.minimum(col + np.cumsum(~pick_row), end[1])
+            tiles[rows, cols] = GEN_FLOOR
+            row, col = int(rows[-1]), int(cols[-1])
+
+        # Random floor mask over the interior
+        inner = tiles[1:-1, 1:-1]
+        inner[gen.random(inner.shape) < floor_chance] = GEN_FLOOR
+
+        # Walkers move together, one vectorized step per iteration
+        if walkers > 0 and walk_steps > 0:
+            steps = np.array(list(DIRECTIONS.values()), dtype=np.int64)
+            wr = gen.integers(1, height - 1, size=walkers)
+            wc = gen.integers(1, width - 1, size=walkers)
+            trail_r = np.empty((walk_steps, walkers), dtype=np.int64)
+            trail_c = np.empty((walk_steps, walkers), dtype=np.int64)
+            moves = steps[gen.integers(0, len(steps), size=(walk_steps, walkers))]
+            for step in range(walk_steps):
+                trail_r[step] = wr
+                trail_c[step] = wc
+                wr = np.clip(wr + moves[step, :, 0], 1, height - 2)
+                wc = np.clip(wc + moves[step, :, 1], 1, width - 2)
+            tiles[trail_r, trail_c] = GEN_FLOOR
+        tiles[end] = GEN_EXIT
+
+        shooter_count = get_shooter_count(difficulty, shooter_multiplier, rng)
+        wall_tiles = np.argwhere(tiles[2:height - 2, 2:width - 2] == GEN_WALL) + 2
+        picked = wall_tiles[gen.permutation(len(wall_tiles))[:shooter_count]] if shooter_count > 0 else wall_tiles[:0]
+        tiles[picked[:, 0], picked[:, 1]] = GEN_SHOOTER
+
+        # One labeling pass replaces the BFS; the carved main path normally keeps
+        # start and exit in the same component so the retry is only a safety net
+        labels = label_components((tiles != GEN_WALL) & (tiles != GEN_SHOOTER))
+        if labels[start] != 0 and labels[start] == labels[end]:
+            lookup = np.array(GEN_TILES, dtype=object)
+            grid = lookup[tiles].tolist()
+            shooters = [Shooter(int(r), int(c), rng) for r, c in picked]
+            return grid, shooters, retries
+        retries += 1
+
+
+def label_components(passable):
+    # Connected-component labels (4-neighbourhood) for a boolean array, 0 means blocked.
+    # Horizontal runs become nodes and vertically touching runs are merged by
+    # min-label hooking plus pointer jumping, so every round is a handful of array ops.
+    left = np.zeros_like(passable)
+    left[:, 1:] = passable[:, :-1]
+    run_id = np.cumsum((passable & ~left).ravel()).reshape(passable.shape)
+    run_id[~passable] = 0
+    below = passable[:-1] & passable[1:]
+    upper = run_id[:-1][below]
+    lower = run_id[1:][below]
+    roots = np.arange(int(run_id.max()) + 1)
+    while True:
+        hooked = roots.copy()
+        smallest = np.minimum(roots[upper], roots[lower])
+        np.minimum.at(hooked, roots[upper], smallest)
+        np.minimum.at(hooked, roots[lower], smallest)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, roots):
+            return roots[run_id]
+        roots = hooked
 
 
 def is_reachable(
@@ -162,10 +642,10 @@ def is_reachable(
     start: tuple[int, int],
     end: tuple[int, int],
 ) -> bool:
-    queue: list[tuple[int, int]] = [start]
+    queue: deque[tuple[int, int]] = deque([start])
     seen = {start}
     while queue:
-        row, col = queue.pop(0)
+        row, col = queue.popleft()
         if (row, col) == end:
             return True
         for dr, dc in DIRECTIONS.values():
@@ -188,174 +668,755 @@ def find_char(grid: list[list[str]], char: str) -> list[tuple[int, int]]:
     return results
 
 
-def random_floor_tile(grid: list[list[str]], forbidden: set[tuple[int, int]]) -> tuple[int, int]:
-    floors = [
-        (r, c)
-        for r in range(1, len(grid) - 1)
-        for c in range(1, len(grid[0]) - 1)
-        if grid[r][c] == FLOOR and (r, c) not in forbidden
-    ]
-    return random.choice(floors)
+# Free floor tiles of a room, built once and shared by all placement helpers.
+# Swap-remove over a list plus a position map gives O(1) random draw and removal.
+class FreeTiles:
+    def __init__(self, grid: list[list[str]], forbidden=()):
+        self.tiles = [
+            (r, c)
+            for r in range(1, len(grid) - 1)
+            for c in range(1, len(grid[0]) - 1)
+            if grid[r][c] == FLOOR and (r, c) not in forbidden
+        ]
+        self.index = {pos: i for i, pos in enumerate(self.tiles)}
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def __contains__(self, pos) -> bool:
+        return pos in self.index
+
+    def remove(self, pos: tuple[int, int]) -> None:
+        i = self.index.pop(pos, None)
+        if i is None:
+            return
+        last = self.tiles.pop()
+        if i < len(self.tiles):
+            self.tiles[i] = last
+            self.index[last] = i
+
+    def draw(self, rng=random) -> tuple[int, int]:
+        # Random free tile, removed from the index (IndexError when empty, like random.choice)
+        if not self.tiles:
+            raise IndexError("no free floor tiles left")
+        pos = self.tiles[rng.randrange(len(self.tiles))]
+        self.remove(pos)
+        return pos
 
 
 def spawn_monsters(
     grid: list[list[str]],
     count: int,
-    forbidden: set[tuple[int, int]],
+    free: FreeTiles,
     invuln_count: int = 0,
+    rng=random,
 ) -> list[Actor]:
     monsters: list[Actor] = []
     # Spawn invulnerable monsters first (hp = -1)
     for _ in range(invuln_count):
         try:
-            row, col = random_floor_tile(grid, forbidden)
-            forbidden.add((row, col))
+            row, col = free.draw(rng)
             monsters.append(Actor(row=row, col=col, hp=-1))
         except IndexError:
             break
     # Spawn regular monsters
     for _ in range(count):
         try:
-            row, col = random_floor_tile(grid, forbidden)
-            forbidden.add((row, col))
+            row, col = free.draw(rng)
             monsters.append(Actor(row=row, col=col, hp=1))
         except IndexError:
             break
     return monsters
 
 
-def render(grid: list[list[str]], player: Actor, monsters: list[Actor], spikes: list) -> str:
-    temp = [row[:] for row in grid]
+def frame_overlay(grid: list[list[str]], player: Actor, monsters: MonsterPool, spikes: list, arrows: ArrowStore | None = None) -> dict[tuple[int, int], str]:
+    # Everything drawn on top of the grid tiles, keyed by position
+    overlay = {}
+    # Arrow glyph layer comes from the arrow store
+    if arrows is not None:
+        for (r, c), slot in arrows.at.items():
+            overlay[(r, c)] = arrows.glyph[slot]
     # Place monsters
-    for monster in monsters:
-        if monster.hp > 0 or monster.hp == -1:
-            if monster.hp == -1:
-                temp[monster.row][monster.col] = INVULN_MONSTER
-            else:
-                temp[monster.row][monster.col] = MONSTER
+    for slot in monsters.order:
+        if monsters.alive(slot):
+            overlay[(monsters.row[slot], monsters.col[slot])] = INVULN_MONSTER if monsters.invulnerable[slot] else MONSTER
     # Place player
-    temp[player.row][player.col] = PLAYER
+    overlay[(player.row, player.col)] = PLAYER
     # Place spikes (dangerous or safe), but only if tile is not occupied by something else
     for s in spikes:
         r, c = s.row, s.col
-        spike_char = SPIKE_DANGEROUS if s.is_dangerous() else SPIKE_SAFE
         # Only render spike if tile is not player, monster, health, shooter, arrow, exit, or powerup
-        if temp[r][c] in (FLOOR, WALL):
-            temp[r][c] = spike_char
-
-    # Color mapping
-    def colorize(char):
-        if char == PLAYER:
-            return "\033[32m@\033[0m"
-        if char == MONSTER:
-            return "\033[31mM\033[0m"
-        if char == INVULN_MONSTER:
-            return "\033[31;1mX\033[0m"
-        if char == HEALTH:
-            return "\033[32m+\033[0m"
-        if char == SPIKE_DANGEROUS:
-            return "\033[90m▲\033[0m"  # Gray
-        if char == SPIKE_SAFE:
-            return "\033[37m_\033[0m"  # White underscore
-        if char == SHOOTER:
-            return "\033[37m#\033[0m"  # White shooter
-        if char == ARROW_UP:
-            return "\033[37m↑\033[0m"
-        if char == ARROW_DOWN:
-            return "\033[37m↓\033[0m"
-        if char == ARROW_RIGHT:
-            return "\033[37m→\033[0m"
-        if char == ARROW_LEFT:
-            return "\033[37m←\033[0m"
-        if char == EXIT:
-            return "\033[34mE\033[0m"
-        if char == 'P':
-            return "\033[34mP\033[0m"
-        if char == '.':
-            return "\033[30;1m.\033[0m"
-        return char
-
-    expanded_rows = []
-    for row in temp:
-        block_rows = [[] for _ in range(TILE_SIZE)]
-        for cell in row:
-            colored = colorize(cell)
-            cell_block = (colored + ' ') * TILE_SIZE
-            for i in range(TILE_SIZE):
-                block_rows[i].append(cell_block)
-        for block_row in block_rows:
-            expanded_rows.append(block_row)
-
-    return "\n".join("".join(cell for cell in tile_row) for tile_row in expanded_rows)
+        if overlay.get((r, c), grid[r][c]) in (FLOOR, WALL):
+            overlay[(r, c)] = SPIKE_DANGEROUS if s.is_dangerous() else SPIKE_SAFE
+    return overlay
+
+
+def compose_frame(grid: list[list[str]], player: Actor, monsters: MonsterPool, spikes: list, arrows: ArrowStore | None = None) -> list[list[str]]:
+    # Full tile snapshot of the frame, used by the diff renderer
+    temp = [row[:] for row in grid]
+    for (r, c), char in frame_overlay(grid, player, monsters, spikes, arrows).items():
+        temp[r][c] = char
+    return temp
+
+
+def compose_view(grid: list[list[str]], player: Actor, monsters: MonsterPool, spikes: list, arrows: ArrowStore | None,
+                 top: int, left: int, height: int, width: int) -> list[list[str]]:
+    # Like compose_frame, but only the rows and columns of the window are copied
+    view = [row[left:left + width] for row in grid[top:top + height]]
+    for (r, c), char in frame_overlay(grid, player, monsters, spikes, arrows).items():
+        if top <= r < top + height and left <= c < left + width:
+            view[r - top][c - left] = char
+    return view
+
+
+# Color mapping
+def colorize(char):
+    if char == PLAYER:
+        return "\033[32m@\033[0m"
+    if char == MONSTER:
+        return "\033[31mM\033[0m"
+    if char == INVULN_MONSTER:
+        return "\033[31;1mX\033[0m"
+    if char == HEALTH:
+        return "\033[32m+\033[0m"
+    if char == SPIKE_DANGEROUS:
+        return "\033[90m▲\033[0m"  # Gray
+    if char == SPIKE_SAFE:
+        return "\033[37m_\033[0m"  # White underscore
+    if char == SHOOTER:
+        return "\033[37m#\033[0m"  # White shooter
+    if char == ARROW_UP:
+        return "\033[37m↑\033[0m"
+    if char == ARROW_DOWN:
+        return "\033[37m↓\033[0m"
+    if char == ARROW_RIGHT:
+        return "\033[37m→\033[0m"
+    if char == ARROW_LEFT:
+        return "\033[37m←\033[0m"
+    if char == EXIT:
+        return "\033[34mE\033[0m"
+    if char == 'P':
+        return "\033[34mP\033[0m"
+    if char == '.':
+        return "\033[30;1m.\033[0m"
+    return char
+
+
+# Tile character -> colored TILE_SIZE-wide block, built once per tile size
+class GlyphTable(dict):
+    def __init__(self, tile_size: int):
+        super().__init__()
+        self.tile_size = tile_size
+        for char in (WALL, FLOOR, EXIT, PLAYER, MONSTER, INVULN_MONSTER, HEALTH, 'P', SPIKE_DANGEROUS, SPIKE_SAFE, SHOOTER, *ARROW_DIRS):
+            self[char]
+
+    def __missing__(self, char: str) -> str:
+        block = (colorize(char) + ' ') * self.tile_size
+        self[char] = block
+        return block
+
+
+GLYPH_TABLES: dict[int, GlyphTable] = {}
+
+
+def glyph_table(tile_size: int) -> GlyphTable:
+    table = GLYPH_TABLES.get(tile_size)
+    if table is None:
+        table = GLYPH_TABLES[tile_size] = GlyphTable(tile_size)
+    return table
+
+
+def expand_frame(temp: list[list[str]], overlay: dict[tuple[int, int], str] | None = None) -> str:
+    # Each tile row is joined once from cached blocks and repeated TILE_SIZE times.
+    # The overlay is patched into the block list, so the grid is never copied.
+    table = glyph_table(TILE_SIZE)
+    patches = {}
+    for (r, c), char in (overlay or {}).items():
+        patches.setdefault(r, []).append((c, char))
+    lines = []
+    for r, row in enumerate(temp):
+        blocks = list(map(table.__getitem__, row))
+        for c, char in patches.get(r, ()):
+            blocks[c] = table[char]
+        line = "".join(blocks)
+        lines.extend([line] * TILE_SIZE)
+    return "\n".join(lines)
+
+
+def render(grid: list[list[str]], player: Actor, monsters: MonsterPool, spikes: list, arrows: ArrowStore | None = None) -> str:
+    return expand_frame(grid, frame_overlay(grid, player, monsters, spikes, arrows))
+
+
+# Keeps the last frame on screen and only rewrites tiles that changed, using
+# ANSI cursor moves. Each draw goes out as a single write to the terminal.
+class TerminalRenderer:
+    def __init__(self, out=None):
+        self.out = out if out is not None else sys.stdout
+        self.prev = None
+        self.prev_status = None
+        self.tile_size = TILE_SIZE
+        self.message = None  # Shown once under the status line by the next draw
+
+    def notify(self, text: str) -> None:
+        # Messages go through the frame: anything printed below it is cleared by the next draw
+        self.message = text if self.message is None else f"{self.message}\n{text}"
+
+    def invalidate(self) -> None:
+        # Force a full redraw on the next frame (e.g. after other output scrolled the screen)
+        self.prev = None
+
+    def draw(self, frame: list[list[str]], status: str) -> None:
+        parts = []
+        if (
+            self.prev is None
+            or self.tile_size != TILE_SIZE
+            or len(self.prev) != len(frame)
+            or len(self.prev[0]) != len(frame[0])
+        ):
+            # Only full redraws clear the screen, in the same write as the frame so
+            # nothing blank is ever shown and no shell is started
+            parts.append("\033[2J\033[H")
+            parts.append(expand_frame(frame))
+            self.tile_size = TILE_SIZE
+            self.prev_status = None
+        else:
+            tile_width = 2 * TILE_SIZE
+            table = glyph_table(TILE_SIZE)
+            for r, (row, old) in enumerate(zip(frame, self.prev)):
+                if row == old:
+                    continue
+                for c, (cell, was) in enumerate(zip(row, old)):
+                    if cell == was:
+                        continue
+                    block = table[cell]
+                    for i in range(TILE_SIZE):
+                        parts.append(f"\033[{r * TILE_SIZE + i + 1};{c * tile_width + 1}H{block}")
+        # Status sits one blank line under the map, the prompt goes right below it
+        status_row = len(frame) * TILE_SIZE + 2
+        if status != self.prev_status:
+            parts.append(f"\033[{status_row};1H\033[2K{status}")
+        parts.append(f"\033[{status_row + 1};1H\033[J")
+        if self.message is not None:
+            parts.append(self.message + "\n")
+            self.message = None
+        self.out.write("".join(parts))
+        self.out.flush()
+        self.prev = frame
+        self.prev_status = status
+
+
+# Window of the map that gets drawn. The camera stays put while the player is
+# inside the inner box (margin tiles from each edge) and re-centres on the player
+# once they leave it, so walking around does not scroll the whole screen each turn.
+class Camera:
+    def __init__(self, height: int | None = None, width: int | None = None, margin: int | None = None):
+        # Without a fixed size the window follows the terminal size
+        self.fixed = (height, width) if height and width else None
+        self.margin = margin
+        self.top = 0
+        self.left = 0
+        self.origin = (0, 0)
+
+    def size(self) -> tuple[int, int]:
+        if self.fixed is not None:
+            return self.fixed
+        columns, lines = shutil.get_terminal_size()
+        # Leave room for the blank line, the status line and the prompt
+        return max(1, (lines - 3) // TILE_SIZE), max(1, columns // (2 * TILE_SIZE))
+
+    def follow(self, row: int, col: int, grid_height: int, grid_width: int) -> tuple[int, int, int, int]:
+        height, width = self.size()
+        height, width = min(height, grid_height), min(width, grid_width)
+        self.top = self.scroll(self.top, row, height, grid_height)
+        self.left = self.scroll(self.left, col, width, grid_width)
+        return self.top, self.left, height, width
+
+    def scroll(self, start: int, pos: int, span: int, total: int) -> int:
+        margin = self.margin if self.margin is not None else span // 4
+        if not start + margin <= pos < start + span - margin:
+            start = pos - span // 2
+        return max(0, min(start, total - span))
+
+    def frame(self, state: "GameState") -> list[list[str]]:
+        # The world mode grid moves under the player, keep the view where it was on screen
+        origin = getattr(state, "origin", (0, 0))
+        self.top += self.origin[0] - origin[0]
+        self.left += self.origin[1] - origin[1]
+        self.origin = origin
+        top, left, height, width = self.follow(state.player.row, state.player.col, len(state.grid), len(state.grid[0]))
+        return compose_view(state.grid, state.player, state.monsters, state.spikes, state.arrows, top, left, height, width)
+
 
 # Move try_move above main
 def try_move(actor: Actor, dr: int, dc: int, grid: list[list[str]]) -> None:
     new_row, new_col = clamp_move(actor.row + dr, actor.col + dc, grid)
     if grid[new_row][new_col] == WALL or grid[new_row][new_col] == SHOOTER:
         return
-    # Prevent monsters from moving onto each other
-    for other in getattr(actor, 'monster_list', []):
-        if other is not actor and (other.row, other.col) == (new_row, new_col):
-            return
     actor.row, actor.col = new_row, new_col
 
 
-def remove_dead(monsters: list[Actor]) -> list[Actor]:
-    # Only remove monsters with hp == 0 (dead regular monsters). Invulnerable (hp < 0) are never removed.
-    return [m for m in monsters if m.hp != 0]
-
-
-def find_adjacent_monster(player: Actor, monsters: list[Actor]) -> Actor | None:
-    for dr, dc in DIRECTIONS.values():
-        target_row = player.row + dr
-        target_col = player.col + dc
-        for monster in monsters:
-            if (monster.hp > 0 or monster.hp == -1) and (monster.row, monster.col) == (target_row, target_col):
-                return monster
+# Monster pursuit: chance to follow the flow field, otherwise step randomly
+MONSTER_CHASE_CHANCE = 0.8
+# Flow-field cost of entering a tile (None = impassable, missing tiles cost 1)
+PATH_COSTS = {WALL: None, SHOOTER: None}
+PATH_SPIKE_COST = 6  # Extra cost for a spike that is dangerous this turn
+
+
+FLOW_NUMPY_CELLS = 64 * 64  # Smaller maps are faster with the plain search
+FLOW_CACHE_BYTES = 1 << 20  # Per game: fields kept for reuse on one layout, 8 bytes a cell each
+
+
+# Flow-field data for the map a game is on: the neighbour graph of its current layout
+# and the last few fields built on it. It lives on the game state and is replaced with
+# the room (or world window), so nothing outlives the layout it was built for.
+class FlowCache:
+    def __init__(self):
+        self.tiles = None
+        self.graph = None  # (neighbours, entry costs) for the plain search
+        self.fields = OrderedDict()  # (target, dangerous spikes) -> FlowField
+
+    def use(self, tiles: str) -> None:
+        # Forget everything built for another layout (a pickup taken, a new room)
+        if tiles != self.tiles:
+            self.tiles = tiles
+            self.graph = None
+            self.fields.clear()
+
+
+# Distance-to-player field shared by every monster for one turn (Dijkstra from the player).
+# With `sources` (the monster tiles) the search stops once every source is settled
+# plus one step of slack (`bound`), which is all a monster's two moves can read:
+# tiles up to the bound hold exact distances and the rest hold the same or more.
+# So a field built for the same tiles, target and spikes with a bound at least as
+# large gives every monster the same steps, and is reused (through `cache`) while the
+# player and the spike phase stay put.
+class FlowField:
+    def __init__(self, grid: list[list[str]], target: tuple[int, int], index: SpatialIndex | None = None, sources=(),
+                 cache: FlowCache | None = None):
+        self.height = height = len(grid)
+        self.width = width = len(grid[0])
+        # Extra cost for spikes that are dangerous this turn
+        extra = {}
+        if index is not None:
+            for (r, c), spike in index.spikes.items():
+                if spike.is_dangerous():
+                    extra[r * width + c] = PATH_SPIKE_COST
+        max_enter = max([1, *(cost for cost in PATH_COSTS.values() if cost is not None)]) + PATH_SPIKE_COST
+        if cache is None:
+            cache = FlowCache()
+        cache.use("".join(map("".join, grid)))
+        key = (target, frozenset(extra.items()))
+        cached = cache.fields.get(key)
+        if cached is not None:
+            need = max((cached.dist[r * width + c] for r, c in sources), default=math.inf) + max_enter
+            if need <= cached.bound:
+                cache.fields.move_to_end(key)
+                self.dist, self.bound = cached.dist, cached.bound
+                return
+        if np is not None and height * width >= FLOW_NUMPY_CELLS:
+            self.dist = flow_distances_numpy(grid, target, extra, sources)
+        else:
+            if cache.graph is None:
+                cache.graph = flow_graph(grid)
+            self.dist = flow_distances(cache.graph, width, target, extra, sources, max_enter)
+        self.bound = max((self.dist[r * width + c] for r, c in sources), default=math.inf) + max_enter
+        cache.fields[key] = self
+        while len(cache.fields) > max(1, FLOW_CACHE_BYTES // (8 * height * width)):
+            cache.fields.popitem(last=False)
+
+    def best_step(self, row: int, col: int, rng=random) -> tuple[int, int] | None:
+        # Step that lowers the distance the most, ties broken randomly; None if stuck
+        best = self.dist[row * self.width + col]
+        choices = []
+        for dr, dc in DIRECTIONS.values():
+            nr, nc = row + dr, col + dc
+            if not (0 <= nr < self.height and 0 <= nc < self.width):
+                continue
+            d = self.dist[nr * self.width + nc]
+            if d < best:
+                best = d
+                choices = [(dr, dc)]
+            elif d == best and choices:
+                choices.append((dr, dc))
+        return rng.choice(choices) if choices else None
+
+
+def flow_graph(grid: list[list[str]]) -> tuple[list[list[int]], list[int]]:
+    # Open neighbours and entry cost of every tile, built once per layout (see FlowCache)
+    height, width = len(grid), len(grid[0])
+    blocked = {tile for tile, cost in PATH_COSTS.items() if cost is None}
+    neighbours = []
+    enter = []
+    for row in range(height):
+        for col in range(width):
+            enter.append(PATH_COSTS.get(grid[row][col], 1))
+            neighbours.append([
+                nr * width + nc
+                for nr, nc in ((row + dr, col + dc) for dr, dc in DIRECTION_STEPS)
+                if 0 <= nr < height and 0 <= nc < width and grid[nr][nc] not in blocked
+            ])
+    return neighbours, enter
+
+
+def flow_distances(graph: tuple[list[list[int]], list[int]], width: int, target: tuple[int, int], extra: dict[int, int], sources, max_enter: int) -> list:
+    # Dijkstra over small integer costs as a bucket queue (one list per distance);
+    # with no dangerous spike every cost is 1 and it is a plain breadth-first search.
+    # Cells settle in a different order than with a heap, but the same cells settle
+    # before the bound and the distances come out the same.
+    neighbours, enter = graph
+    dist = [math.inf] * len(enter)
+    pending = {r * width + c for r, c in sources}
+    bound = math.inf
+    start = target[0] * width + target[1]
+    dist[start] = 0
+    buckets = [[start]]
+    level = 0
+    while level < len(buckets) and level <= bound:
+        for cell in buckets[level]:
+            if dist[cell] != level:
+                continue  # Queued again at a lower distance
+            if cell in pending:
+                pending.discard(cell)
+                if not pending:
+                    bound = level + max_enter
+            # Cost a neighbour pays to step onto this tile
+            nd = level + enter[cell] + extra.get(cell, 0)
+            for neighbour in neighbours[cell]:
+                if nd < dist[neighbour]:
+                    dist[neighbour] = nd
+                    while len(buckets) <= nd:
+                        buckets.append([])
+                    buckets[nd].append(neighbour)
+        level += 1
+    return dist
+
+
+def flow_distances_numpy(grid: list[list[str]], target: tuple[int, int], extra: dict[int, int], sources=()):
+    # Same distances as the FlowField search, including the tentative values it leaves
+    # past its stopping point, but run as a bucket queue: every cell settled at one
+    # distance is relaxed in a few array operations. The grid gets a blocked border so
+    # neighbour offsets never leave it.
+    height, width = len(grid), len(grid[0])
+    stride = width + 2
+    codes = np.frombuffer("".join("".join(row) for row in grid).encode("utf-32-le"), dtype=np.uint32).reshape(height, width)
+    blocked = np.ones((height + 2, stride), dtype=bool)
+    inner = np.zeros((height, width), dtype=bool)
+    enter = np.ones((height + 2, stride), dtype=np.int64)
+    for tile, cost in PATH_COSTS.items():
+        if cost is None:
+            inner |= codes == ord(tile)
+        else:
+            enter[1:-1, 1:-1][codes == ord(tile)] = cost
+    blocked[1:-1, 1:-1] = inner
+    blocked, enter = blocked.ravel(), enter.ravel()
+    for cell, cost in extra.items():
+        enter[(cell // width + 1) * stride + cell % width + 1] += cost
+    tile_costs = {1, *(cost for cost in PATH_COSTS.values() if cost is not None)}
+    costs = sorted(tile_costs | {cost + PATH_SPIKE_COST for cost in tile_costs})
+    max_enter = costs[-1]
+
+    # Blocked cells hold -1 so the distance comparison alone rejects them while relaxing
+    dist = np.where(blocked, -1, np.inf)
+    source = np.zeros(len(blocked), dtype=bool)
+    source[[(r + 1) * stride + c + 1 for r, c in sources]] = True
+    pending = int(source.sum())
+    bound = math.inf
+    start = (target[0] + 1) * stride + target[1] + 1
+    dist[start] = 0
+    offsets = (-stride, -1, stride, 1)
+    # Level -> arrays of cells queued at that distance. A cell is only queued when its
+    # distance drops, so stale copies are the only repeats and are dropped when popped.
+    buckets = {0: [np.array([start])]}
+    while buckets:
+        level = min(buckets)
+        if level > bound:
+            break
+        cells = np.concatenate(buckets.pop(level))
+        cells = cells[dist[cells] == level]
+        if not len(cells):
+            continue
+        if pending:
+            pending -= int(source[cells].sum())
+            if not pending:
+                bound = level + max_enter
+        step = enter[cells]
+        for cost in costs:
+            group = cells[step == cost]
+            if not len(group):
+                continue
+            nd = level + cost
+            for off in offsets:
+                nb = group + off
+                nb = nb[nd < dist[nb]]
+                if len(nb):
+                    dist[nb] = nd
+                    buckets.setdefault(nd, []).append(nb)
+    dist[blocked] = np.inf
+    return dist.reshape(height + 2, stride)[1:-1, 1:-1].ravel()
+
+
+def find_adjacent_monster(player: Actor, monsters: MonsterPool) -> int | None:
+    for slot in monsters.adjacent(player.row, player.col):
+        if monsters.alive(slot):
+            return slot
     return None
 
 
 
-def place_health_pickups(grid: list[list[str]], count: int, forbidden: set[tuple[int, int]]):
-    for _ in range(count):
-        r, c = random_floor_tile(grid, forbidden)
+def place_health_pickups(grid: list[list[str]], count: int, free: FreeTiles, rng=random):
+    for _ in range(min(count, len(free))):
+        r, c = free.draw(rng)
         grid[r][c] = HEALTH
-        forbidden.add((r, c))
 
-def generate_room(player: Actor, room: int, difficulty: str) -> tuple[list[list[str]], tuple[int, int], list[Actor]]:
-    # Pass difficulty to build_grid for shooter placement
-    build_grid.difficulty = difficulty
+
+def place_powerups(grid: list[list[str]], count: int, free: FreeTiles, rng=random):
+    for _ in range(min(count, len(free))):
+        r, c = free.draw(rng)
+        grid[r][c] = 'P'
+
+
+# Survivability check. is_reachable only asks for a static path; this one plays the
+# room's hazards forward from the moment it is entered and asks whether some
+# sequence of turns (up to `moves` steps each) reaches the exit alive. Monsters,
+# pickups and power-ups are left out: without monsters the arrows do not depend on
+# what the player does, so the whole hazard field is known in advance. The rules
+# are the ones step() applies:
+# - tiles passed through within a turn (every step but the last) must not hold an
+#   arrow or a dangerous spike
+# - the tile a turn ends on must survive the shooter phase: no arrow stepping onto
+#   it and none standing on it afterwards (spikes are not checked there)
+# - the exit ends the room as soon as it is passed through, or at the end of a
+#   turn if no arrow flies into it
+# States are (tile, time) where time is the turn up to the point the hazard field
+# repeats, at most a flight across the room plus the LCM of the timer periods.
+# Every set of tiles is an int with one bit per tile, so a step of the whole
+# frontier is four shifts and a mask.
+class HazardTimeline:
+    # Per turn k >= 1: tiles safe to pass through (`safe`) and tiles deadly to end
+    # the turn on (`deadly`). Turns are simulated only as far as they are asked for.
+    # Arrows are one bitmask per direction; the shooter phase follows fire_shooters
+    # and ArrowStore.advance tile for tile. `spike_tick` is the spike clock when the
+    # player gets the first input (see ENTRY_SPIKE_TICKS).
+    def __init__(self, grid: list[list[str]], spikes: list, shooters: list, spike_tick: int = 0):
+        height, width = len(grid), len(grid[0])
+        self.floor = tile_mask(grid, FLOOR)
+        # Bit shift of each arrow direction, in ArrowStore.advance's order of arrival:
+        # an arrow arriving from a later tile replaces one from an earlier tile
+        self.shifts = sorted(dr * width + dc for dr, dc in ARROW_DIRS.values())
+        self.arrows = [0] * len(self.shifts)
+        # Tiles shooters fire into, by direction, for each (period, phase) that fires
+        # together. A tile more than one shooter fires into goes to the first one in
+        # the room's shooter list that is due, so those are kept apart as claims.
+        claims = {}  # Bit -> [(direction, period, phase)] in shooter list order
+        for shooter in shooters:
+            phase = -shooter.turn % shooter.period  # Fires after turn k when k % period == phase
+            for _, dr, dc in SHOOTER_TO_ARROW:
+                r, c = shooter.row + dr, shooter.col + dc
+                if 0 <= r < height and 0 <= c < width and grid[r][c] == FLOOR:
+                    claims.setdefault(r * width + c, []).append((self.shifts.index(dr * width + dc), shooter.period, phase))
+        self.groups = {}
+        for bit, claim in claims.items():
+            if len(claim) == 1:
+                direction, period, phase = claim[0]
+                self.groups.setdefault((period, phase), [0] * len(self.shifts))[direction] |= 1 << bit
+        self.contested = {bit: claim for bit, claim in claims.items() if len(claim) > 1}
+        self.period = math.lcm(*SPIKE_PERIODS, *(shooter.period for shooter in shooters))
+        # Spike danger by spike ticks since the room was entered, one mask per tick of the cycle
+        phases = {}
+        for spike in spikes:
+            slot = (spike.period, (spike.turn + spike_tick + spike.offset) % spike.period)
+            phases[slot] = phases.get(slot, 0) | 1 << (spike.row * width + spike.col)
+        self.spike_masks = [0] * math.lcm(*SPIKE_PERIODS)
+        for tick in range(len(self.spike_masks)):
+            for (period, phase), mask in phases.items():
+                if (tick + phase) % period < period // 2:
+                    self.spike_masks[tick] |= mask
+        self.safe, self.deadly = [0], [0]
+        self.seen = {}  # Arrows and turn in the cycle -> first turn they were seen
+        self.loop = None  # Once known: first turn of the cycle, turn len(safe) repeats it
+        self.shooter_phase(0)  # Runs when the room is entered, before the first input
+
+    def shooter_phase(self, k: int) -> int:
+        # begin_turn's fire and move after turn k, returns the tiles arrows stepped onto
+        moving = self.arrows
+        occupied = self.arrow_mask()
+        fresh = [0] * len(moving)
+        for (period, phase), tiles in self.groups.items():
+            if k % period == phase:
+                for direction, mask in enumerate(tiles):
+                    fresh[direction] |= mask
+        fresh = [mask & ~occupied for mask in fresh]
+        for bit, claim in self.contested.items():
+            if not occupied >> bit & 1:
+                for direction, period, phase in claim:
+                    if k % period == phase:
+                        fresh[direction] |= 1 << bit
+                        break
+        hit = 0
+        landed = 0
+        for direction, shift in enumerate(self.shifts):
+            arrived = moving[direction] << shift if shift > 0 else moving[direction] >> -shift
+            hit |= arrived
+            arrived &= self.floor
+            if shift > 0:
+                # The arrow ahead has not moved yet and takes the tile with it
+                arrived &= ~occupied
+            moving[direction] = arrived & ~landed
+            landed |= arrived
+        for direction, arrows in enumerate(fresh):
+            moving[direction] |= arrows & ~landed
+        return hit
+
+    def arrow_mask(self) -> int:
+        mask = 0
+        for arrows in self.arrows:
+            mask |= arrows
+        return mask
+
+    def index(self, k: int) -> int:
+        # Where turn k's masks are, simulating up to it or to the cycle
+        while self.loop is None and k >= len(self.safe):
+            turn = len(self.safe)
+            key = (*self.arrows, turn % self.period)
+            if key in self.seen:
+                self.loop = self.seen[key]
+                break
+            self.seen[key] = turn
+            self.safe.append(~(self.arrow_mask() | self.spike_masks[(turn - 1) % len(self.spike_masks)]))
+            hit = self.shooter_phase(turn)
+            self.deadly.append(hit | self.arrow_mask())
+        if k < len(self.safe):
+            return k
+        return self.loop + (k - self.loop) % (len(self.safe) - self.loop)
+
+
+def tile_mask(grid: list[list[str]], *tiles: str) -> int:
+    # Bitmask of the tiles of these kinds, bit row * width + col
+    table = str.maketrans({tile: "1" if tile in tiles else "0" for tile in set().union(*grid)})
+    return int("".join(map("".join, grid))[::-1].translate(table), 2)
+
+
+def survival_search(grid: list[list[str]], exit_pos: tuple[int, int], spikes: list, shooters: list,
+                    start: tuple[int, int] = (1, 1), moves: int | None = None, spike_tick: int = 0) -> tuple[int | None, int]:
+    # Fewest turns that reach the exit alive (None: no way through) and the tiles
+    # the search got to, as a bitmask
+    moves = ALLOWED_MOVES if moves is None else moves
+    height, width = len(grid), len(grid[0])
+    passable = ((1 << height * width) - 1) & ~tile_mask(grid, WALL, SHOOTER)
+    # Tiles that can step left / right without wrapping onto the next row
+    go_left = int(("1" * (width - 1) + "0") * height, 2)
+    go_right = int(("0" + "1" * (width - 1)) * height, 2)
+
+    def spread(tiles: int) -> int:
+        # One action: stay (a blocked move or a non-move) or step to an open neighbour
+        moved = (tiles >> width) | (tiles << width) | ((tiles & go_left) >> 1) | ((tiles & go_right) << 1)
+        return tiles | (moved & passable)
+
+    timeline = HazardTimeline(grid, spikes, shooters, spike_tick)
+    safe, deadly = timeline.safe, timeline.deadly
+    goal = 1 << (exit_pos[0] * width + exit_pos[1])
+    visited = {}
+    frontier = reached = 1 << (start[0] * width + start[1])
+    k = 1
+    while frontier:
+        t = timeline.index(k)
+        step = spread(frontier)
+        ends = step
+        for _ in range(moves - 1):
+            if step & goal:
+                return k, reached | ends  # Passed through with an action to spare
+            step = spread(step & safe[t])
+            ends |= step
+        if ends & goal and not goal & deadly[t]:
+            return k, reached | ends
+        alive = ends & ~deadly[t]
+        k += 1
+        # Only (tile, time) states not seen before are expanded again
+        t = timeline.index(k)
+        frontier = alive & ~visited.get(t, 0)
+        visited[t] = visited.get(t, 0) | frontier
+        reached |= frontier
+    return None, reached
+
+
+# Spike clock of a room when its first input is read. Walking through an exit enters
+# the next room in the middle of step(), which still ticks the new room's spikes that
+# turn; a new game, a room cheat or begin_turn's exit check enter it with the clock at 0.
+ENTRY_SPIKE_TICKS = (0, 1)
+
+
+def secure_trap_room(grid: list[list[str]], exit_pos: tuple[int, int], spikes: list, shooters: list) -> tuple[int | None, int]:
+    # Repairs a room nobody can get through by walling up shooters until the
+    # survivability search finds a way for every entry tick, each time the one
+    # nearest the exit among those firing into tiles the player got to. Returns the
+    # search's turn count (the most over the entry ticks) and how many shooters
+    # were walled up.
+    # Rooms that already pass are left alone, so no generator draws change.
+    width = len(grid[0])
+    repairs = 0
+    while True:
+        most = 0
+        for tick in ENTRY_SPIKE_TICKS:
+            turns, reached = survival_search(grid, exit_pos, spikes, shooters, spike_tick=tick)
+            if turns is None:
+                break
+            most = max(most, turns)
+        else:
+            return most, repairs
+        if not shooters:
+            return None, repairs
+
+        def exposure(shooter: Shooter) -> tuple[bool, int]:
+            fires_at = 0
+            for _, dr, dc in SHOOTER_TO_ARROW:
+                fires_at |= 1 << max(0, (shooter.row + dr) * width + shooter.col + dc)
+            return not fires_at & reached, abs(shooter.row - exit_pos[0]) + abs(shooter.col - exit_pos[1])
+
+        shooter = min(shooters, key=exposure)
+        grid[shooter.row][shooter.col] = WALL
+        shooters.remove(shooter)
+        repairs += 1
+
+
+def generate_room(player: Actor, room: int, difficulty: str, rng=random, size: int | None = None) -> tuple[list[list[str]], tuple[int, int], list[Actor]]:
+    return generate_room_stats(player, room, difficulty, rng, size)[0]
+
+
+def generate_room_stats(player: Actor, room: int, difficulty: str, rng=random, size: int | None = None) -> tuple[tuple, dict]:
+    # generate_room plus what the build took, for the balancer and benchmarks: build_grid
+    # regenerations, shooters walled up by secure_trap_room and the trap room's survival
+    # turn count (None in other rooms). Nothing is kept between calls, so the room
+    # pipeline thread and the main thread can both build rooms.
+    size = GRID_SIZE if size is None else size
+    stats = {"retries": 0, "repairs": 0, "survival_turns": None}
     # Trap rooms get harder as room increases
     if room % 5 == 0:
         # Trap room starting difficulty based on overall difficulty
         trap_scale = max(1, room // 5)
         if difficulty == 'e':
             base_shooters = 8
-            base_spikes = int(GRID_SIZE * 1.2)
+            base_spikes = int(size * 1.2)
         elif difficulty == 'm':
             base_shooters = 16
-            base_spikes = int(GRID_SIZE * 2.0)
+            base_spikes = int(size * 2.0)
         else:  # 'h'
             base_shooters = 32
-            base_spikes = int(GRID_SIZE * 4.0)
+            base_spikes = int(size * 4.0)
         shooter_multiplier = min(base_shooters + trap_scale, 15 * trap_scale)
         # Calculate available floor tiles for capping
-        grid_tmp, _ = build_grid(width=GRID_SIZE, height=GRID_SIZE, floor_chance=0.65, walkers=6, walk_steps=80, shooter_multiplier=1)
-        available_floors = [
-            (r, c)
-            for r in range(1, len(grid_tmp) - 1)
-            for c in range(1, len(grid_tmp[0]) - 1)
-            if grid_tmp[r][c] == FLOOR and (r, c) not in {(1, 1)}
-        ]
+        grid_tmp, _, retries = build_grid(width=size, height=size, floor_chance=0.65, walkers=6, walk_steps=80, shooter_multiplier=1, rng=rng, difficulty=difficulty)
+        stats["retries"] += retries
+        available_floors = FreeTiles(grid_tmp, {(1, 1)})
         max_trap_features = max(1, len(available_floors) - 2)  # leave space for player and powerup
         shooter_multiplier = min(shooter_multiplier, max_trap_features // 2)
         max_spikes = max_trap_features - shooter_multiplier
         trap_spike_scale = min(trap_scale, 5)
-        spike_count = min(base_spikes + int(GRID_SIZE * 0.5 * (trap_spike_scale - 1)), max_spikes)
+        spike_count = min(base_spikes + int(size * 0.5 * (trap_spike_scale - 1)), max_spikes)
     else:
         shooter_multiplier = 1
         max_spikes = None
-    grid, shooters = build_grid(width=GRID_SIZE, height=GRID_SIZE, floor_chance=0.65, walkers=6, walk_steps=80, shooter_multiplier=shooter_multiplier)
+    grid, shooters, retries = build_grid(width=size, height=size, floor_chance=0.65, walkers=6, walk_steps=80, shooter_multiplier=shooter_multiplier, rng=rng, difficulty=difficulty)
+    stats["retries"] += retries
     exit_pos = find_char(grid, EXIT)[0]
     # Ensure player spawn tile is always safe
     grid[1][1] = FLOOR
@@ -363,21 +1424,15 @@ def generate_room(player: Actor, room: int, difficulty: str) -> tuple[list[list[
     if room % 5 == 0:
         # Trap room: no monsters, just spikes and shooters
         monsters = []
-        forbidden = {(1, 1), exit_pos}
+        available_floors = FreeTiles(grid, {(1, 1), exit_pos})
         health_count = 0
         # More spikes for trap rooms, scaling with room number
-        spikes = place_spikes(grid, spike_count, forbidden)
+        spikes = place_spikes(grid, spike_count, available_floors, rng)
         powerup_count = 1
-        if powerup_count > 0:
-            for _ in range(powerup_count):
-                while True:
-                    r = random.randint(1, len(grid) - 2)
-                    c = random.randint(1, len(grid[0]) - 2)
-                    if (r, c) not in forbidden and grid[r][c] == FLOOR:
-                        grid[r][c] = 'P'
-                        forbidden.add((r, c))
-                        break
-        return grid, exit_pos, monsters, spikes, shooters
+        place_powerups(grid, powerup_count, available_floors, rng)
+        # Fewest turns to get through the hazards, for the balancer and benchmarks
+        stats["survival_turns"], stats["repairs"] = secure_trap_room(grid, exit_pos, spikes, shooters)
+        return (grid, exit_pos, monsters, spikes, shooters), stats
     else:
         if difficulty == "e":
             monster_count = 3 + room
@@ -386,11 +1441,11 @@ def generate_room(player: Actor, room: int, difficulty: str) -> tuple[list[list[
         elif difficulty == "m":
             monster_count = 5 + 2 * room
             health_count = 1
-            invuln_count = 1 if random.random() < 0.10 else 0
+            invuln_count = 1 if rng.random() < 0.10 else 0
         else:
             monster_count = 10 + 4 * room
             health_count = 1 if room == 1 else 0
-            roll = random.random()
+            roll = rng.random()
             if roll < 0.80:
                 invuln_count = 1
             elif roll < 0.90:
@@ -398,12 +1453,7 @@ def generate_room(player: Actor, room: int, difficulty: str) -> tuple[list[list[
             else:
                 invuln_count = 0
         # Cap monsters to available floor tiles
-        available_floors = [
-            (r, c)
-            for r in range(1, len(grid) - 1)
-            for c in range(1, len(grid[0]) - 1)
-            if grid[r][c] == FLOOR and (r, c) not in {(1, 1), exit_pos}
-        ]
+        available_floors = FreeTiles(grid, {(1, 1), exit_pos})
         max_monsters = max(0, len(available_floors))
         total_monsters = min(monster_count + invuln_count, max_monsters)
         # Try to keep the same ratio of invuln/regular
@@ -413,455 +1463,1600 @@ def generate_room(player: Actor, room: int, difficulty: str) -> tuple[list[list[
         else:
             invuln_count = 0
             monster_count = 0
-        monsters = spawn_monsters(grid, count=monster_count, forbidden={(1, 1), exit_pos}, invuln_count=invuln_count)
-        forbidden = {(1, 1), exit_pos}
-        forbidden.update((m.row, m.col) for m in monsters)
+        monsters = spawn_monsters(grid, count=monster_count, free=available_floors, invuln_count=invuln_count, rng=rng)
         if health_count > 0:
-            place_health_pickups(grid, health_count, forbidden)
+            place_health_pickups(grid, health_count, available_floors, rng)
         if difficulty == "m":
             spike_count = monster_count
         elif difficulty == "h":
             spike_count = int(monster_count * 1.5)
         else:
             spike_count = max(2, monster_count // 2)
-        spikes = place_spikes(grid, spike_count, forbidden)
+        spikes = place_spikes(grid, spike_count, available_floors, rng)
         powerup_count = 0
         if difficulty in ("e", "m"):
             powerup_count = 1
         elif difficulty == "h" and room < 10:
-            if random.random() < 0.10:
+            if rng.random() < 0.10:
                 powerup_count = 1
         if powerup_count > 0:
-            for _ in range(powerup_count):
-                while True:
-                    r = random.randint(1, len(grid) - 2)
-                    c = random.randint(1, len(grid[0]) - 2)
-                    if (r, c) not in forbidden and grid[r][c] == FLOOR:
-                        grid[r][c] = 'P'
-                        forbidden.add((r, c))
-                        break
-        return grid, exit_pos, monsters, spikes, shooters
+            place_powerups(grid, powerup_count, available_floors, rng)
+        return (grid, exit_pos, monsters, spikes, shooters), stats
 
 
-def main() -> None:
-    global TILE_SIZE
-    while True:
-        tile_input = input("Enter tile size (integer >= 1): ").strip()
-        if tile_input.isdigit() and int(tile_input) >= 1:
-            TILE_SIZE = int(tile_input)
-            break
-        print("Invalid input. Please enter a positive integer.")
+# Each room is built from its own generator seeded by (session seed, room), so a
+# room comes out the same whether it was prefetched or built on demand
+def room_rng(seed: int, room: int) -> random.Random:
+    return random.Random(f"{seed}:{room}")
 
-    print("Select difficulty: (E)asy, (M)edium, (H)ard")
-    while True:
-        diff = input("Enter difficulty (e/m/h): ").strip().lower()
-        if diff in ("e", "m", "h"):
-            break
-        print("Invalid input. Please enter 'e', 'm', or 'h'.")
-    if diff == "e":
-        start_hp = 5
-        start_ammo = -1
-    elif diff == "m":
-        start_hp = 3
-        start_ammo = 10
-    else:
-        start_hp = 1
-        start_ammo = 5
 
-    allowed_moves = 3
+# Seeds saves and room libraries can store (signed 64 bits); others are refused where they are read
+SEED_RANGE = range(-2**63, 2**63)
 
-    player = Actor(row=1, col=1, hp=start_hp, ammo=start_ammo)
-    room = 1
-    score = 0
-    max_room = 1000
-    grid, exit_pos, monsters, spikes, shooters = generate_room(player, min(room, max_room), diff)
 
-    while True:
-        # Advance shooters and spawn arrows if ready
-        arrow_dirs = {
-            ARROW_UP: (-1, 0),
-            ARROW_DOWN: (1, 0),
-            ARROW_LEFT: (0, -1),
-            ARROW_RIGHT: (0, 1),
-        }
-        shooter_to_arrow = [
-            (ARROW_UP, -1, 0),
-            (ARROW_DOWN, 1, 0),
-            (ARROW_LEFT, 0, -1),
-            (ARROW_RIGHT, 0, 1),
-        ]
+def parse_seed(text: str) -> int:
+    seed = int(text)
+    if seed not in SEED_RANGE:
+        raise ValueError(f"seed {text} is outside the signed 64-bit range")
+    return seed
 
-        # Track arrows spawned this turn so they don't move immediately
-        just_spawned_arrows = set()
-        for shooter in shooters:
-            if shooter.ready():
-                for arrow, dr, dc in shooter_to_arrow:
-                    nr, nc = shooter.row + dr, shooter.col + dc
-                    if 0 <= nr < len(grid) and 0 <= nc < len(grid[0]) and grid[nr][nc] == FLOOR:
-                        grid[nr][nc] = arrow
-                        just_spawned_arrows.add((nr, nc))
-            shooter.advance()
-
-        # Move arrows before rendering, skipping those just spawned
-
-        arrows_to_move = []
-        for r in range(len(grid)):
-            for c in range(len(grid[0])):
-                if grid[r][c] in arrow_dirs and (r, c) not in just_spawned_arrows:
-                    arrows_to_move.append((r, c, grid[r][c]))
-
-        # Track player previous position for crossing detection
-        player_prev = (player.row, player.col)
-        arrow_prev_positions = {}
-        for r, c, arrow in arrows_to_move:
-            arrow_prev_positions[(r, c)] = arrow
-
-        for r, c, arrow in arrows_to_move:
-            dr, dc = arrow_dirs[arrow]
-            nr, nc = r + dr, c + dc
-            # Only move if in bounds
-            if 0 <= nr < len(grid) and 0 <= nc < len(grid[0]):
-                # Insta-kill monster if present
-                for m in monsters:
-                    if m.row == nr and m.col == nc and m.hp > 0:
-                        m.hp = 0
-                # Insta-kill player if present, unless invulnerable
-                if player.row == nr and player.col == nc:
-                    if getattr(player, 'invulnerable', False):
-                        pass
-                    elif player.power_up == 'invulnerable/5hp':
-                        player.power_up = None
-                        pass
-                    else:
-                        player.hp = 0
-                # Crossing path detection: if player moved to where arrow was, and arrow moves to where player was
-                if (nr, nc) == player_prev and (player.row, player.col) == (r, c):
-                    if getattr(player, 'invulnerable', False):
-                        pass
-                    elif player.power_up == 'invulnerable/5hp':
-                        player.power_up = None
-                        pass
-                    else:
-                        player.hp = 0
-                # Arrow moves to next tile
-                if grid[nr][nc] == FLOOR or grid[nr][nc] in arrow_dirs:
-                    grid[nr][nc] = arrow
-                    grid[r][c] = FLOOR
-                else:
-                    grid[r][c] = FLOOR
-            else:
-                grid[r][c] = FLOOR
-
-        # Insta-kill if player or monster is standing on an arrow after all arrows move
-        for m in monsters:
-            if m.hp > 0 and grid[m.row][m.col] in arrow_dirs:
-                m.hp = 0
-        if grid[player.row][player.col] in arrow_dirs:
-            if getattr(player, 'invulnerable', False):
-                pass
-            elif player.power_up == 'invulnerable/5hp':
-                player.power_up = None
-                pass
-            else:
-                player.hp = 0
-
-        # Insta-kill if player or monster is standing on an arrow after all arrows move
-        for m in monsters:
-            if m.hp > 0 and grid[m.row][m.col] in arrow_dirs:
-                m.hp = 0
-        if grid[player.row][player.col] in arrow_dirs:
-            if not (getattr(player, 'invulnerable', False) or player.power_up == 'invulnerable/5hp'):
-                player.hp = 0
-
-        clear_screen()
-        print(render(grid, player, monsters, spikes))
-        print()
-        def show_status():
-            powerup_display = player.power_up if player.power_up else "None"
-            ammo_display = "infinite" if player.ammo < 0 else str(player.ammo)
-            print(
-                f"Room: {room}  HP: {player.hp}  Ammo: {ammo_display}  Power-up: {powerup_display}  Score: {score}  Monsters: {len(monsters)}  Exit: {exit_pos}"
-            )
-        show_status()
+
+# Pre-generated rooms (--rooms FILE, see RoomLibrary); None means every room is generated live
+ROOM_LIBRARY = None
+
+
+def load_room(player: Actor, room: int, difficulty: str, seed: int):
+    # Same result as generate_room_stats with room_rng(seed, room): a library lookup
+    # when the room is in it (no build stats then), otherwise it is built now
+    if ROOM_LIBRARY is not None:
+        result = ROOM_LIBRARY.get(difficulty, room, seed)
+        if result is not None:
+            player.row, player.col = 1, 1
+            return result, None
+    return generate_room_stats(player, room, difficulty, room_rng(seed, room))
+
+
+# Builds the next room on a worker thread while the player is still in the current one
+class RoomPipeline:
+    executor = None  # One shared worker thread for every game in the process
+
+    def __init__(self, difficulty: str, seed: int):
+        self.difficulty = difficulty
+        self.seed = seed
+        self.pending_room = None
+        self.future = None
+        if RoomPipeline.executor is None:
+            RoomPipeline.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="room-prefetch")
+
+    def prefetch(self, room: int) -> None:
+        if self.future is not None and self.pending_room == room:
+            return
+        self.cancel()
+        # The worker gets its own Actor so the live player is never moved from another thread
+        self.pending_room = room
+        self.future = RoomPipeline.executor.submit(load_room, Actor(row=1, col=1, hp=0), room, self.difficulty, self.seed)
+
+    def cancel(self) -> None:
+        # A build that already started just finishes in the background and is dropped
+        if self.future is not None:
+            self.future.cancel()
+        self.future = None
+        self.pending_room = None
+
+    def enter(self, player: Actor, room: int):
+        # Swap in the prefetched room if it matches, otherwise build it now.
+        # Returns what load_room does: the room and its build stats
+        if self.future is not None and self.pending_room == room:
+            loaded = self.future.result()
+            player.row, player.col = 1, 1
+        else:
+            self.cancel()
+            loaded = load_room(player, room, self.difficulty, self.seed)
+        self.future = None
+        self.pending_room = None
+        self.prefetch(room + 1)
+        return loaded
+
+
+# Starting (hp, ammo) per difficulty, ammo -1 means infinite
+START_STATS = {"e": (5, -1), "m": (3, 10), "h": (1, 5)}
+MAX_ROOM = 1000
+ALLOWED_MOVES = 3
+VALID_POWERS = {"time_stop", "invulnerable/5hp", "explosive"}
+SHOOTER_TO_ARROW = [
+    (ARROW_UP, -1, 0),
+    (ARROW_DOWN, 1, 0),
+    (ARROW_LEFT, 0, -1),
+    (ARROW_RIGHT, 0, 1),
+]
+# Shooters fire into the first tile of a ray in each direction
+SHOOTER_RAYS = [(arrow, line_offsets(dr, dc, 1)) for arrow, dr, dc in SHOOTER_TO_ARROW]
+
+
+# Something that happened during a turn, for the shell (or a simulator) to report
+@dataclass
+class Event:
+    kind: str  # room, kill, damage, pickup, powerup, cheat, message, game_over, quit, restart
+    text: str = ""
+
+
+# Everything one game needs between turns. step() advances it without any I/O.
+# The seed fixes every room and every in-game roll (rng, unless one is passed in).
+class GameState:
+    def __init__(self, difficulty: str, prefetch: bool = True, room: int = 1, seed: int | None = None, rng=None):
+        self.monsters = MonsterPool()
+        self.arrows = ArrowStore()
+        self.pipeline = None
+        self.reset(difficulty, prefetch, room, seed, rng)
+
+    def reset(self, difficulty: str, prefetch: bool = True, room: int = 1, seed: int | None = None, rng=None) -> None:
+        # Start a new game in place; the monster pool and arrow store keep their slots
+        start_hp, start_ammo = START_STATS[difficulty]
+        self.difficulty = difficulty
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.rng = random.Random(self.seed) if rng is None else rng
+        self.player = Actor(row=1, col=1, hp=start_hp, ammo=start_ammo)
+        self.room = room
+        self.score = 0
+        self.turn = 0
+        self.allowed_moves = ALLOWED_MOVES
+        self.game_over = False
+        if self.pipeline is not None:
+            self.pipeline.cancel()
+        self.pipeline = RoomPipeline(difficulty, self.seed) if prefetch else None
+        self.enter_room(min(self.room, MAX_ROOM))
+        begin_turn(self, [])
+
+    def enter_room(self, room: int) -> None:
+        self.room = room
+        if self.pipeline is not None:
+            result, self.room_stats = self.pipeline.enter(self.player, room)
+        else:
+            result, self.room_stats = load_room(self.player, room, self.difficulty, self.seed)
+        # Build stats of the current room (see generate_room_stats), None for library rooms
+        self.grid, self.exit_pos, monsters, self.spikes, self.shooters = result
+        self.monsters.load(monsters)
+        self.hazards = HazardClock(self.spikes, self.shooters)
+        self.arrows.clear()
+        self.occupancy = SpatialIndex(self.spikes)
+        self.flow = FlowCache()
+
+    def follow_player(self) -> None:
+        # Rooms are drawn and simulated whole; WorldState moves its window here
+        pass
+
+    def status_line(self) -> str:
+        return f"Room: {self.room}  {self.player_status()}  Exit: {self.exit_pos}"
+
+    def player_status(self) -> str:
+        # The part of the status line that rooms and the open world share
+        player = self.player
+        powerup_display = player.power_up if player.power_up else "None"
+        ammo_display = "infinite" if player.ammo < 0 else str(player.ammo)
+        return f"HP: {player.hp}  Ammo: {ammo_display}  Power-up: {powerup_display}  Score: {self.score}  Monsters: {len(self.monsters)}"
+
+    def frame(self) -> list[list[str]]:
+        return compose_frame(self.grid, self.player, self.monsters, self.spikes, self.arrows)
+
+
+def arrow_hits_player(player: Actor) -> None:
+    # Insta-kill unless invulnerable; a held invulnerable/5hp absorbs the hit
+    if getattr(player, 'invulnerable', False):
+        pass
+    elif player.power_up == 'invulnerable/5hp':
+        player.power_up = None
+    else:
+        player.hp = 0
 
 
+def monster_hits_player(player: Actor) -> None:
+    # Auto-activate invulnerable if present
+    if getattr(player, 'invulnerable', False):
+        pass
+    elif player.power_up == 'invulnerable':
+        player.power_up = None
+        player.invulnerable = True
+    else:
+        player.hp -= 1
+
+
+def fire_shooters(state: GameState) -> None:
+    grid, arrows = state.grid, state.arrows
+    # Arrows spawned this turn are marked fresh so they don't move immediately
+    height, width = len(grid), len(grid[0])
+    for shooter in state.hazards.due():
+        for arrow, ray in SHOOTER_RAYS:
+            for nr, nc in area_cells(shooter.row, shooter.col, ray, 0, 0, height, width):
+                if grid[nr][nc] == FLOOR and (nr, nc) not in arrows.at:
+                    arrows.add(nr, nc, arrow, fresh=True)
+    state.hazards.tick_shooters()
+
+
+def move_arrows(state: GameState) -> None:
+    player, monsters, arrows = state.player, state.monsters, state.arrows
+    # Track player previous position for crossing detection
+    player_prev = (player.row, player.col)
+    for (r, c), (nr, nc) in arrows.advance(state.grid):
+        # Insta-kill monster if present
+        slot = monsters.at.get((nr, nc))
+        if slot is not None and monsters.vulnerable(slot):
+            monsters.hp[slot] = 0
+        # Insta-kill player if present, unless invulnerable
+        if player.row == nr and player.col == nc:
+            arrow_hits_player(player)
+        # Crossing path detection: if player moved to where arrow was, and arrow moves to where player was
+        if (nr, nc) == player_prev and (player.row, player.col) == (r, c):
+            arrow_hits_player(player)
+
+
+def standing_on_arrows(state: GameState) -> None:
+    # Insta-kill if player or monster is standing on an arrow after all arrows move
+    player, monsters, arrows = state.player, state.monsters, state.arrows
+    for pos in arrows.at:
+        slot = monsters.at.get(pos)
+        if slot is not None and monsters.vulnerable(slot):
+            monsters.hp[slot] = 0
+    if (player.row, player.col) in arrows.at:
+        # This used to be two back-to-back checks: the first spends a held
+        # invulnerable/5hp and the second still kills, so keep that outcome
+        if not getattr(player, 'invulnerable', False):
+            if player.power_up == 'invulnerable/5hp':
+                player.power_up = None
+            player.hp = 0
 
+
+def begin_turn(state: GameState, events: list[Event]) -> None:
+    # Hazard phase that runs before the player is asked for input
+    player = state.player
+    state.follow_player()
+    while True:
+        fire_shooters(state)
+        move_arrows(state)
+        standing_on_arrows(state)
         # Health pickup
+        if state.grid[player.row][player.col] == HEALTH:
+            player.hp += 2
+            state.grid[player.row][player.col] = FLOOR
+            events.append(Event("pickup", HEALTH))
+        if (player.row, player.col) != state.exit_pos:
+            break
+        state.enter_room(state.room + 1)
+        events.append(Event("room", str(state.room)))
+    if player.hp <= 0:
+        state.game_over = True
+        events.append(Event("game_over", "hp"))
+
+
+def explode(state: GameState, radius: int = 4) -> int:
+    # Set all tiles in a radius circle to FLOOR, kill monsters, return the kill count.
+    # Only the cells of the disc are visited, whatever the size of the map.
+    grid, player, monsters = state.grid, state.player, state.monsters
+    disc = disc_offsets(radius)
+    for rr, cc in area_cells(player.row, player.col, disc, 1, 1, len(grid) - 1, len(grid[0]) - 1):
+        if grid[rr][cc] != EXIT:
+            grid[rr][cc] = FLOOR
+            state.arrows.remove((rr, cc))
+    # Kill monsters in radius
+    killed = 0
+    for slot in area_entities(monsters.at, player.row, player.col, disc):
+        if monsters.vulnerable(slot):
+            monsters.hp[slot] = 0
+            killed += 1
+    return killed
+
+
+def apply_actions(state: GameState, move_seq: str, events: list[Event]) -> None:
+    player = state.player
+    move_limit = state.allowed_moves  # Start with base allowed moves
+    i = 0
+    powerup_used_this_turn = False
+    while i < len(move_seq) and i < move_limit:
+        grid = state.grid
+        move = move_seq[i]
+        # Shoot arrow: 'e' followed by direction (w/a/s/d)
+        if move == 'e' and i + 1 < len(move_seq):
+            dir_key = move_seq[i + 1]
+            dir_map = {'w': (ARROW_UP, -1, 0), 'a': (ARROW_LEFT, 0, -1), 's': (ARROW_DOWN, 1, 0), 'd': (ARROW_RIGHT, 0, 1)}
+            if dir_key in dir_map and player.ammo != 0:
+                arrow, dr, dc = dir_map[dir_key]
+                nr, nc = player.row + dr, player.col + dc
+                if 0 <= nr < len(grid) and 0 <= nc < len(grid[0]) and grid[nr][nc] == FLOOR and (nr, nc) not in state.arrows.at:
+                    state.arrows.add(nr, nc, arrow)
+                    player.ammo -= 1
+            i += 2
+            continue
+        # Health/ammo pickup
         if grid[player.row][player.col] == HEALTH:
             player.hp += 2
+            if state.difficulty != "e":
+                player.ammo += 2
             grid[player.row][player.col] = FLOOR
-
-            # (Old spike check removed; now handled in move loop with spike objects)
-
-        if (player.row, player.col) == exit_pos:
-            room += 1
-            grid, exit_pos, monsters, spikes, shooters = generate_room(player, room, diff)
-            continue
-
-        if player.hp <= 0:
-            show_status()
-            print(f"Final Score: {score}")
-            print("=================")
-            while True:
-                choice = input("Press R to restart or Q to quit: ").strip().lower()
-                if choice == "q":
+            events.append(Event("pickup", HEALTH))
+        # Spike logic: skip check on first move (i > 0):
+        if i > 0:
+            # Arrow logic: player dies if moves onto arrow (unless invulnerable)
+            if (player.row, player.col) in state.arrows.at:
+                if not (getattr(player, 'invulnerable', False) or player.power_up == 'invulnerable' or player.power_up == 'invulnerable/5hp'):
+                    state.game_over = True
+                    events.append(Event("game_over", "arrow"))
                     return
-                if choice == "r":
-                    main()
+            spike_here = state.occupancy.spike_at((player.row, player.col))
+            if spike_here and spike_here.is_dangerous():
+                if getattr(player, 'invulnerable', False) or player.power_up == 'invulnerable' or player.power_up == 'invulnerable/5hp':
+                    # Remove spike and invulnerability
+                    state.spikes.remove(spike_here)
+                    state.occupancy.remove_spike(spike_here)
+                    if getattr(player, 'invulnerable', False):
+                        player.invulnerable = False
+                    if player.power_up == 'invulnerable/5hp':
+                        player.power_up = None
+                else:
+                    state.game_over = True
+                    events.append(Event("game_over", "spike"))
                     return
+        # Power-up pickup (placeholder: 'P' tile)
+        if grid[player.row][player.col] == 'P':
+            if player.power_up is None:
+                # Randomly choose between time stop, invulnerable, and explosive
+                roll = state.rng.random()
+                if roll < 1/3:
+                    player.power_up = 'time_stop'
+                elif roll < 2/3:
+                    player.power_up = 'invulnerable/5hp'
+                else:
+                    player.power_up = 'explosive'
+                events.append(Event("pickup", player.power_up))
+            grid[player.row][player.col] = FLOOR
+        if (player.row, player.col) == state.exit_pos:
+            state.enter_room(state.room + 1)
+            events.append(Event("room", str(state.room)))
+            return
+        if player.hp <= 0:
+            state.game_over = True
+            events.append(Event("game_over", "defeated"))
+            return
+        if move == "u":
+            if player.power_up and not powerup_used_this_turn:
+                events.append(Event("powerup", player.power_up))
+                if player.power_up == 'time_stop':
+                    move_limit += 200
+                elif player.power_up == 'invulnerable/5hp':
+                    player.invulnerable = True
+                    player.hp += 5
+                elif player.power_up == 'explosive':
+                    killed = explode(state)
+                    state.score += killed
+                    events.extend(Event("kill", "explosive") for _ in range(killed))
+                    move_limit += 2 * killed  # Grant two extra actions per kill immediately
+                player.power_up = None
+                powerup_used_this_turn = True
+            i += 1
+            continue
+        if move == "f":
+            monsters = state.monsters
+            target = find_adjacent_monster(player, monsters)
+            if target is not None:
+                if not monsters.immune(target):
+                    monsters.hp[target] -= 1
+                    if monsters.hp[target] == 0:
+                        state.score += 1
+                        events.append(Event("kill", "attack"))
+                        move_limit += 2  # Grant two extra actions per kill immediately
+                player.predicted_attack = False
+            else:
+                # Set prediction flag if no monster is adjacent
+                player.predicted_attack = True
+            monsters.remove_dead()
+            i += 1
+            continue
+        if move in DIRECTIONS:
+            dr, dc = DIRECTIONS[move]
+            try_move(player, dr, dc, grid)
+            i += 1
+            continue
+        # Invalid input is ignored
+        i += 1
 
 
-        move_seq = input(f"Enter up to {allowed_moves} actions (WASD to move, F to attack, U to use power-up, Q to quit, R to restart): ").strip().lower()
-        # Cheat code: 56840<number> to set next room, or 56840(powerupname) for power-up
-        if move_seq.startswith("56840"):
-            cheat_val = move_seq[5:]
-            valid_powers = {"time_stop", "invulnerable/5hp", "explosive"}
-            if cheat_val.isdigit():
-                max_room = 1000
-                room = int(cheat_val)
-                if room > max_room:
-                    print(f"Room number too high, capping to {max_room}.")
-                    room = max_room
-                grid, exit_pos, monsters, spikes, shooters = generate_room(player, room, diff)
-                print(f"Cheat activated: Next room set to {room}!")
-                continue
-            elif cheat_val in valid_powers:
-                player.power_up = cheat_val
-                print(f"Cheat activated: {cheat_val} power-up granted!")
-                continue
-        if "q" in move_seq:
-            print("Goodbye.")
-            break
-        if "r" in move_seq:
-            main()
-            return
-        move_limit = allowed_moves
-        i = 0
-        powerup_used_this_turn = False
-        move_limit = allowed_moves  # Start with base allowed moves
-        while i < len(move_seq) and i < move_limit:
-            move = move_seq[i]
-            # Shoot arrow: 'e' followed by direction (w/a/s/d)
-            if move == 'e' and i + 1 < len(move_seq):
-                dir_key = move_seq[i + 1]
-                dir_map = {'w': (ARROW_UP, -1, 0), 'a': (ARROW_LEFT, 0, -1), 's': (ARROW_DOWN, 1, 0), 'd': (ARROW_RIGHT, 0, 1)}
-                if dir_key in dir_map and player.ammo != 0:
-                    arrow, dr, dc = dir_map[dir_key]
-                    nr, nc = player.row + dr, player.col + dc
-                    if 0 <= nr < len(grid) and 0 <= nc < len(grid[0]) and grid[nr][nc] == FLOOR:
-                        grid[nr][nc] = arrow
-                        player.ammo -= 1
-                i += 2
-                continue
-            # Health/ammo pickup
-            if grid[player.row][player.col] == HEALTH:
-                player.hp += 2
-                if diff != "e":
-                    player.ammo += 2
-                grid[player.row][player.col] = FLOOR
-            # Spike logic: skip check on first move (i > 0):
-            if i > 0:
-                # Arrow logic: player dies if moves onto arrow (unless invulnerable)
-                if grid[player.row][player.col] in arrow_dirs:
-                    if not (getattr(player, 'invulnerable', False) or player.power_up == 'invulnerable' or player.power_up == 'invulnerable/5hp'):
-                        show_status()
-                        print(f"Final Score: {score}")
-                        print("=================")
-                        while True:
-                            choice = input("Press R to restart or Q to quit: ").strip().lower()
-                            if choice == "q":
-                                return
-                            if choice == "r":
-                                main()
-                                return
-                spike_here = next((s for s in spikes if s.row == player.row and s.col == player.col), None)
-                if spike_here:
-                    if spike_here.is_dangerous():
-                        if getattr(player, 'invulnerable', False) or player.power_up == 'invulnerable' or player.power_up == 'invulnerable/5hp':
-                            # Remove spike and invulnerability
-                            spikes.remove(spike_here)
-                            if getattr(player, 'invulnerable', False):
-                                player.invulnerable = False
-                            if player.power_up == 'invulnerable/5hp':
-                                player.power_up = None
-                        else:
-                            show_status()
-                            print(f"Final Score: {score}")
-                            print("=================")
-                            while True:
-                                choice = input("Press R to restart or Q to quit: ").strip().lower()
-                                if choice == "q":
-                                    return
-                                if choice == "r":
-                                    main()
-                                    return
-                    else:
-                        # Safe spike, nothing happens
-                        pass
-            # Power-up pickup (placeholder: 'P' tile)
-            if grid[player.row][player.col] == 'P':
-                if player.power_up is None:
-                    # Randomly choose between time stop, invulnerable, and explosive
-                    roll = random.random()
-                    if roll < 1/3:
-                        player.power_up = 'time_stop'
-                    elif roll < 2/3:
-                        player.power_up = 'invulnerable/5hp'
-                    else:
-                        player.power_up = 'explosive'
-                grid[player.row][player.col] = FLOOR
-            show_status()
-            if (player.row, player.col) == exit_pos:
-                room += 1
-                grid, exit_pos, monsters, spikes, shooters = generate_room(player, room, diff)
+def move_monsters(state: GameState) -> None:
+    # One pass over the pool arrays in turn order. Moves stay sequential: each one
+    # draws from the game's generator and blocks the monsters that move after it.
+    player, grid, monsters, rng = state.player, state.grid, state.monsters, state.rng
+    if not monsters:
+        return
+    spikes, arrows_at = state.occupancy.spikes, state.arrows.at
+    rows, cols, hp = monsters.row, monsters.col, monsters.hp
+    player_row, player_col = player.row, player.col
+    # One distance field from the player serves every monster this turn. It is built
+    # by the first monster that chases, from where the monsters stood at the start.
+    field = None
+    sources = list(monsters.at)
+    for slot in monsters.order:
+        for _ in range(2):  # Up to 2 moves per turn
+            row, col = rows[slot], cols[slot]
+            # If already adjacent to player, stop moving
+            if abs(row - player_row) + abs(col - player_col) == 1:
                 break
-            if player.hp <= 0:
-                print("You were defeated.")
-                return
-            if move == "u":
-                if player.power_up and not powerup_used_this_turn:
-                    if player.power_up == 'time_stop':
-                        move_limit += 200
-                    elif player.power_up == 'invulnerable/5hp':
-                        player.invulnerable = True
-                        player.hp += 5
-                    elif player.power_up == 'explosive':
-                        # Set all tiles in a radius-4 circle to FLOOR, kill monsters, give points
-                        radius = 4
-                        killed = 0
-                        for rr in range(max(1, player.row-radius), min(len(grid)-1, player.row+radius+1)):
-                            for cc in range(max(1, player.col-radius), min(len(grid[0])-1, player.col+radius+1)):
-                                if math.sqrt((rr-player.row)**2 + (cc-player.col)**2) <= radius:
-                                    if grid[rr][cc] != EXIT:
-                                        grid[rr][cc] = FLOOR
-                        # Kill monsters in radius
-                        for m in monsters:
-                            if m.hp > 0 and math.sqrt((m.row-player.row)**2 + (m.col-player.col)**2) <= radius:
-                                m.hp = 0
-                                killed += 1
-                        score += killed
-                        move_limit += 2 * killed  # Grant two extra actions per kill immediately
-                    player.power_up = None
-                    powerup_used_this_turn = True
-                    show_status()
-                i += 1
+            # Chase along the flow field, or wander randomly
+            if rng.random() < MONSTER_CHASE_CHANCE:
+                if field is None:
+                    field = FlowField(grid, (player_row, player_col), state.occupancy, sources, state.flow)
+                step = field.best_step(row, col, rng)
+                if step is None:
+                    break
+                dr, dc = step
+            else:
+                dr, dc = rng.choice(DIRECTION_STEPS)
+            # Predict new position; a dangerous spike or an arrow there kills the monster
+            target = clamp_move(row + dr, col + dc, grid)
+            spike_there = spikes.get(target)
+            if spike_there is not None and spike_there.is_dangerous():
+                hp[slot] = 0
+                break
+            if target in arrows_at:
+                hp[slot] = 0
+                break
+            monsters.try_move(slot, dr, dc, grid)
+
+
+def advance_spikes(state: GameState) -> None:
+    state.hazards.tick_spikes()
+
+
+def predicted_attack(state: GameState, events: list[Event]) -> None:
+    player, monsters = state.player, state.monsters
+    # Prediction attack: kill any monster that moves adjacent if player.predicted_attack is set
+    if getattr(player, 'predicted_attack', False):
+        for slot in monsters.adjacent(player.row, player.col):
+            if not monsters.vulnerable(slot):
                 continue
-            if move == "f":
-                target = find_adjacent_monster(player, monsters)
-                if target is not None:
-                    if target.hp != -1:
-                        target.hp -= 1
-                        if target.hp == 0:
-                            score += 1
-                            move_limit += 2  # Grant two extra actions per kill immediately
-                    player.predicted_attack = False
-                else:
-                    # Set prediction flag if no monster is adjacent
-                    player.predicted_attack = True
-                monsters = remove_dead(monsters)
-                i += 1
+            if state.rng.random() < 0.8:
+                monsters.hp[slot] = 0
+                state.score += 1
+                events.append(Event("kill", "predicted"))
+        player.predicted_attack = False
+
+
+def resolve_damage(state: GameState, events: list[Event]) -> None:
+    player, monsters = state.player, state.monsters
+    hp_before = player.hp
+    slot = monsters.at.get((player.row, player.col))
+    if slot is not None:
+        if not monsters.immune(slot):
+            monsters.hp[slot] = 0
+            state.score += 1
+            events.append(Event("kill", "collision"))
+        monster_hits_player(player)
+
+    for slot in monsters.adjacent(player.row, player.col):
+        if not monsters.alive(slot):
+            continue
+        monster_hits_player(player)
+    if player.hp < hp_before:
+        events.append(Event("damage", str(hp_before - player.hp)))
+    # Reset invulnerable at end of turn
+    if hasattr(player, 'invulnerable'):
+        player.invulnerable = False
+
+    monsters.remove_dead()
+
+
+def step(state: GameState, actions: str) -> list[Event]:
+    # One turn: the player's action string, monster AI, spikes, damage, and the
+    # hazard phase that leads into the next turn (including room transitions)
+    events: list[Event] = []
+    if state.game_over:
+        return events
+    move_seq = actions.strip().lower()
+    # Cheat code: 56840<number> to set next room, or 56840(powerupname) for power-up
+    if move_seq.startswith("56840"):
+        cheat_val = move_seq[5:]
+        if cheat_val.isdigit():
+            room = int(cheat_val)
+            if room > MAX_ROOM:
+                events.append(Event("message", f"Room number too high, capping to {MAX_ROOM}."))
+                room = MAX_ROOM
+            # Replaces any prefetched room that no longer follows the current one
+            state.enter_room(room)
+            events.append(Event("cheat", f"Cheat activated: Next room set to {room}!"))
+            begin_turn(state, events)
+            return events
+        elif cheat_val in VALID_POWERS:
+            state.player.power_up = cheat_val
+            events.append(Event("cheat", f"Cheat activated: {cheat_val} power-up granted!"))
+            begin_turn(state, events)
+            return events
+    if "q" in move_seq:
+        events.append(Event("quit"))
+        return events
+    if "r" in move_seq:
+        events.append(Event("restart"))
+        return events
+    state.turn += 1
+    apply_actions(state, move_seq, events)
+    if state.game_over:
+        return events
+    move_monsters(state)
+    advance_spikes(state)
+    predicted_attack(state, events)
+    resolve_damage(state, events)
+    begin_turn(state, events)
+    return events
+
+
+# Open-world mode: instead of rooms the dungeon is an endless plane of square
+# chunks. Each chunk is a room built from (seed, chunk row, chunk column) with
+# its exit removed and one doorway per edge; both neighbours of an edge pick the
+# same doorway. Only the chunks around the player are live, stitched into one
+# grid that step() runs on as usual. The other chunks are frozen in an LRU cache,
+# and a chunk pushed out of the cache is kept as a small delta against a fresh
+# build of it, so memory and turn cost do not grow with the distance walked.
+WORLD_RADIUS = 1  # Live chunks in each direction around the player's chunk
+WORLD_CACHE = 32  # Chunks kept whole in memory, at least the live ones
+
+
+def chunk_rng(seed: int, crow: int, ccol: int) -> random.Random:
+    return random.Random(f"{seed}:chunk:{crow}:{ccol}")
+
+
+def chunk_door(seed: int, edge: str, crow: int, ccol: int, size: int) -> int:
+    # Doorway offset on the edge below ("h") or right of ("v") chunk (crow, ccol)
+    return random.Random(f"{seed}:door:{edge}:{crow}:{ccol}").randint(1, size - 2)
+
+
+def reachable_tiles(grid: list[list[str]], start: tuple[int, int]) -> set[tuple[int, int]]:
+    queue = deque([start])
+    seen = {start}
+    while queue:
+        row, col = queue.popleft()
+        for dr, dc in DIRECTIONS.values():
+            nr, nc = row + dr, col + dc
+            if (nr, nc) in seen or not (0 <= nr < len(grid) and 0 <= nc < len(grid[0])):
                 continue
-                # Combo: for each monster killed this turn, allow one extra input next turn
-                combo_bonus = combo_kills
-            if move in DIRECTIONS:
-                dr, dc = DIRECTIONS[move]
-                try_move(player, dr, dc, grid)
-                i += 1
+            if grid[nr][nc] in (WALL, SHOOTER):
                 continue
-            # Invalid input is ignored
-            i += 1
-        for monster in monsters:
-            monster.is_monster = True
-            monster.monster_list = monsters
-            for _ in range(2):  # Up to 2 moves per turn
-                # If already adjacent to player, stop moving
-                if abs(monster.row - player.row) + abs(monster.col - player.col) == 1:
-                    break
-                # 80% chance to move toward player, 20% random
-                if random.random() < 0.8:
-                    dr = 0
-                    dc = 0
-                    if player.row > monster.row:
-                        dr = 1
-                    elif player.row < monster.row:
-                        dr = -1
-                    if player.col > monster.col:
-                        dc = 1
-                    elif player.col < monster.col:
-                        dc = -1
-                    # Prefer vertical or horizontal randomly if both are possible
-                    if dr != 0 and dc != 0:
-                        if random.random() < 0.5:
-                            dc = 0
-                        else:
-                            dr = 0
-                else:
-                    dr, dc = random.choice(list(DIRECTIONS.values()))
-                # Predict new position
-                new_row, new_col = clamp_move(monster.row + dr, monster.col + dc, grid)
-                spike_there = next((s for s in spikes if s.row == new_row and s.col == new_col), None)
-                if spike_there and spike_there.is_dangerous():
-                    monster.hp = 0
-                    break
-                # Arrow logic: monster dies if moves onto arrow
-                if grid[new_row][new_col] in arrow_dirs:
-                    monster.hp = 0
-                    break
-                try_move(monster, dr, dc, grid)
-            del monster.is_monster
-            del monster.monster_list
-        # Advance all spike timers
-        for s in spikes:
-            s.advance()
+            seen.add((nr, nc))
+            queue.append((nr, nc))
+    return seen
 
 
+def carve_door(grid: list[list[str]], area: set[tuple[int, int]], row: int, col: int, dr: int, dc: int) -> None:
+    # Open the border tile and dig straight in until the corridor meets the area.
+    # The main path of build_grid crosses every inner row and column, so it always does.
+    while (row, col) not in area:
+        if grid[row][col] in (WALL, SHOOTER):
+            grid[row][col] = FLOOR
+        row, col = row + dr, col + dc
+
+
+class Chunk:
+    def __init__(self, tiles: list[list[str]], monsters: list[Actor], spikes: list, shooters: list):
+        # Entities use chunk coordinates while the chunk is frozen
+        self.tiles = tiles
+        self.monsters = monsters
+        self.spikes = spikes
+        self.shooters = shooters
+        self.arrows = []  # (row, col, glyph, fresh)
+
+
+def generate_chunk(seed: int, crow: int, ccol: int, difficulty: str, size: int = GRID_SIZE) -> Chunk:
+    # Chunks get harder like rooms do, by distance from the start chunk
+    level = min(1 + abs(crow) + abs(ccol), MAX_ROOM)
+    grid, exit_pos, monsters, spikes, shooters = generate_room(Actor(row=1, col=1, hp=0), level, difficulty, chunk_rng(seed, crow, ccol), size)
+    grid[exit_pos[0]][exit_pos[1]] = FLOOR
+    area = reachable_tiles(grid, (1, 1))
+    last = size - 1
+    carve_door(grid, area, 0, chunk_door(seed, "h", crow - 1, ccol, size), 1, 0)
+    carve_door(grid, area, last, chunk_door(seed, "h", crow, ccol, size), -1, 0)
+    carve_door(grid, area, chunk_door(seed, "v", crow, ccol - 1, size), 0, 0, 1)
+    carve_door(grid, area, chunk_door(seed, "v", crow, ccol, size), last, 0, -1)
+    shooters = [s for s in shooters if grid[s.row][s.col] == SHOOTER]
+    return Chunk(grid, monsters, spikes, shooters)
+
+
+def chunk_delta(chunk: Chunk, base: Chunk) -> tuple | None:
+    # What a played chunk has that a fresh build does not: changed tiles, the
+    # monsters and arrows, the spikes that were destroyed and the (shared) hazard timers.
+    # None when there is no difference, so an untouched chunk is simply rebuilt
+    tiles = {
+        (r, c): tile
+        for r, (row, base_row) in enumerate(zip(chunk.tiles, base.tiles))
+        for c, tile in enumerate(row)
+        if tile != base_row[c]
+    }
+    monsters = [(m.row, m.col, m.hp) for m in chunk.monsters]
+    kept = {(s.row, s.col) for s in chunk.spikes}
+    removed = [(s.row, s.col) for s in base.spikes if (s.row, s.col) not in kept]
+    spike_turn = chunk.spikes[0].turn if chunk.spikes else 0
+    shooter_turn = chunk.shooters[0].turn if chunk.shooters else 0
+    if (
+        not tiles and not removed and not chunk.arrows
+        and monsters == [(m.row, m.col, m.hp) for m in base.monsters]
+        and spike_turn == (base.spikes[0].turn if base.spikes else 0)
+        and shooter_turn == (base.shooters[0].turn if base.shooters else 0)
+    ):
+        return None
+    return tiles, monsters, list(chunk.arrows), removed, spike_turn, shooter_turn
+
+
+def apply_delta(chunk: Chunk, delta: tuple) -> None:
+    tiles, monsters, arrows, removed, spike_turn, shooter_turn = delta
+    for (r, c), tile in tiles.items():
+        chunk.tiles[r][c] = tile
+    chunk.monsters = [Actor(row=r, col=c, hp=hp) for r, c, hp in monsters]
+    chunk.arrows = arrows
+    removed = set(removed)
+    chunk.spikes = [s for s in chunk.spikes if (s.row, s.col) not in removed]
+    for spike in chunk.spikes:
+        spike.turn = spike_turn
+    for shooter in chunk.shooters:
+        shooter.turn = shooter_turn
+
+
+# LRU cache of whole chunks by (chunk row, chunk column), plus the deltas of evicted ones that changed
+class ChunkStore:
+    def __init__(self, seed: int, difficulty: str, size: int = GRID_SIZE, capacity: int = WORLD_CACHE):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.size = size
+        self.capacity = capacity
+        self.chunks = OrderedDict()
+        self.deltas = {}
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def build(self, key: tuple[int, int]) -> Chunk:
+        return generate_chunk(self.seed, key[0], key[1], self.difficulty, self.size)
+
+    def get(self, key: tuple[int, int]) -> Chunk:
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        chunk = self.build(key)
+        delta = self.deltas.pop(key, None)
+        if delta is not None:
+            apply_delta(chunk, delta)
+        self.chunks[key] = chunk
+        while len(self.chunks) > self.capacity:
+            old_key, old = self.chunks.popitem(last=False)
+            delta = chunk_delta(old, self.build(old_key))
+            if delta is not None:
+                self.deltas[old_key] = delta
+        return chunk
+
+
+class WorldState(GameState):
+    def __init__(self, difficulty: str, seed: int | None = None, rng=None, chunk_size: int = GRID_SIZE,
+                 radius: int = WORLD_RADIUS, cache: int = WORLD_CACHE):
+        self.chunk_size = chunk_size
+        self.radius = radius
+        self.cache = cache
+        self.monsters = MonsterPool()
+        self.arrows = ArrowStore()
+        self.reset(difficulty, seed=seed, rng=rng)
+
+    def reset(self, difficulty: str, prefetch: bool = True, room: int = 1, seed: int | None = None, rng=None) -> None:
+        # New world in place; chunks are never prefetched and there are no rooms to start in
+        start_hp, start_ammo = START_STATS[difficulty]
+        self.difficulty = difficulty
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.rng = random.Random(self.seed) if rng is None else rng
+        self.player = Actor(row=1, col=1, hp=start_hp, ammo=start_ammo)
+        self.room = 1
+        self.score = 0
+        self.turn = 0
+        self.allowed_moves = ALLOWED_MOVES
+        self.game_over = False
+        self.pipeline = None
+        self.exit_pos = (-1, -1)  # No exits, the world just goes on
+        self.room_stats = None
+        span = 2 * self.radius + 1
+        self.store = ChunkStore(self.seed, difficulty, self.chunk_size, max(self.cache, span * span))
+        self.center = None
+        self.origin = (0, 0)  # World position of grid[0][0]
+        self.window = {}
+        begin_turn(self, [])
+
+    def enter_room(self, room: int) -> None:
+        # Room cheats have nothing to jump to here
+        pass
+
+    def chunk_of(self, row: int, col: int) -> tuple[int, int]:
+        # Chunk holding a grid position
+        return (row + self.origin[0]) // self.chunk_size, (col + self.origin[1]) // self.chunk_size
+
+    def follow_player(self) -> None:
+        key = self.chunk_of(self.player.row, self.player.col)
+        if key != self.center:
+            if self.window:
+                self.store_window()
+            self.load_window(key)
+
+    def store_window(self) -> None:
+        # Hand tiles and entities back to the chunk they stand in, in chunk coordinates
+        size = self.chunk_size
+        top, left = self.origin
+        self.hazards.release(self.spikes, self.shooters)
+        for (crow, ccol), chunk in self.window.items():
+            r0, c0 = crow * size - top, ccol * size - left
+            chunk.tiles = [row[c0:c0 + size] for row in self.grid[r0:r0 + size]]
+            chunk.monsters, chunk.spikes, chunk.shooters, chunk.arrows = [], [], [], []
+        live = {"monsters": self.monsters.actors(), "spikes": self.spikes, "shooters": self.shooters}
+        for kind, items in live.items():
+            for item in items:
+                crow, ccol = self.chunk_of(item.row, item.col)
+                item.row += top - crow * size
+                item.col += left - ccol * size
+                getattr(self.window[(crow, ccol)], kind).append(item)
+        arrows = self.arrows
+        for slot in arrows.active:
+            row, col = arrows.row[slot], arrows.col[slot]
+            crow, ccol = self.chunk_of(row, col)
+            self.window[(crow, ccol)].arrows.append((row + top - crow * size, col + left - ccol * size, arrows.glyph[slot], slot in arrows.fresh))
+        self.window = {}
+
+    def load_window(self, center: tuple[int, int]) -> None:
+        # Stitch the chunks around `center` into one grid and move the player onto it
+        size, radius = self.chunk_size, self.radius
+        span = 2 * radius + 1
+        top, left = (center[0] - radius) * size, (center[1] - radius) * size
+        self.player.row += self.origin[0] - top
+        self.player.col += self.origin[1] - left
+        self.origin = (top, left)
+        self.center = center
+        self.grid = [[] for _ in range(span * size)]
+        live = {"monsters": [], "spikes": [], "shooters": []}
+        self.arrows.clear()
+        for i in range(span):
+            for j in range(span):
+                key = (center[0] - radius + i, center[1] - radius + j)
+                chunk = self.store.get(key)
+                self.window[key] = chunk
+                dr, dc = i * size, j * size
+                for r, row in enumerate(chunk.tiles):
+                    self.grid[dr + r].extend(row)
+                for kind, items in live.items():
+                    for item in getattr(chunk, kind):
+                        item.row += dr
+                        item.col += dc
+                        items.append(item)
+                for r, c, glyph, fresh in chunk.arrows:
+                    self.arrows.add(r + dr, c + dc, glyph, fresh)
+        self.monsters.load(live["monsters"])
+        self.spikes, self.shooters = live["spikes"], live["shooters"]
+        self.hazards = HazardClock(self.spikes, self.shooters)
+        self.occupancy = SpatialIndex(self.spikes)
+        self.flow = FlowCache()
+        self.room = min(1 + abs(center[0]) + abs(center[1]), MAX_ROOM)
+
+    def status_line(self) -> str:
+        row, col = self.player.row + self.origin[0], self.player.col + self.origin[1]
+        return f"Chunk: {self.center}  Level: {self.room}  {self.player_status()}  Position: {(row, col)}"
+
+
+def state_digest(state: GameState) -> str:
+    # Short fingerprint of everything step() reads, to check that a replay matches
+    player = state.player
+    parts = [
+        state.room, state.score, state.turn, state.game_over,
+        player.row, player.col, player.hp, player.ammo, player.power_up,
+        getattr(player, 'invulnerable', False), getattr(player, 'predicted_attack', False),
+        ["".join(row) for row in state.grid],
+        state.monsters.records(),
+        [(s.row, s.col, s.period, s.offset, s.turn) for s in state.spikes],
+        [(s.row, s.col, s.period, s.turn) for s in state.shooters],
+        sorted((pos, state.arrows.glyph[slot], slot in state.arrows.fresh) for pos, slot in state.arrows.at.items()),
+    ]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+# Replay file: a header line, one ">actions" line per step() call, and an
+# "# end <digest>" line once the session stops
+REPLAY_VERSION = 2
+
+
+class ReplayLog:
+    def __init__(self, path: str, seed: int, difficulty: str, world: bool = False):
+        self.file = open(path, "w", encoding="utf-8")
+        # Map size and generation engine both change the rooms a seed builds, so they go in the header
+        self.write(f"# replay {REPLAY_VERSION} seed={seed} difficulty={difficulty} size={GRID_SIZE} engine={GRID_ENGINE}"
+                   + (" world=1" if world else ""))
+
+    def write(self, line: str) -> None:
+        # Flushed every turn so the log survives a crash
+        self.file.write(line + "\n")
+        self.file.flush()
+
+    def record(self, actions: str) -> None:
+        self.write(">" + actions)
+
+    def close(self, state: GameState) -> None:
+        self.write(f"# end {state_digest(state)}")
+        self.file.close()
+
+
+def load_replay(path: str) -> tuple[int, str, list[str], str | None, bool, int, str]:
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().split("\n")
+    header = lines[0].split()
+    if header[:3] != ["#", "replay", str(REPLAY_VERSION)]:
+        raise ValueError(f"{path}: not a version {REPLAY_VERSION} replay file")
+    fields = dict(item.split("=", 1) for item in header[3:])
+    actions = [line[1:] for line in lines[1:] if line.startswith(">")]
+    ends = [line.split()[2] for line in lines[1:] if line.startswith("# end ")]
+    missing = [name for name in ("seed", "difficulty", "size", "engine") if name not in fields]
+    if missing:
+        raise ValueError(f"{path}: replay header lacks {', '.join(missing)}")
+    engine = fields["engine"]
+    if engine not in ENGINES:
+        raise ValueError(f"{path}: unknown generation engine {engine!r}")
+    if engine == "numpy" and np is None:
+        raise ValueError(f"{path}: recorded with the numpy engine, which needs NumPy installed")
+    return (parse_seed(fields["seed"]), fields["difficulty"], actions, ends[-1] if ends else None,
+            fields.get("world") == "1", int(fields["size"]), engine)
+
+
+def replay(path: str) -> bool:
+    # Re-run a recorded session headless and compare the final state with the log
+    global GRID_SIZE, GRID_ENGINE
+    seed, difficulty, actions, digest, world, size, engine = load_replay(path)
+    saved = GRID_SIZE, GRID_ENGINE
+    GRID_SIZE, GRID_ENGINE = size, engine
+    try:
+        start = time.perf_counter()
+        state = WorldState(difficulty, seed=seed, chunk_size=size) if world else GameState(difficulty, prefetch=False, seed=seed)
+        turns = 0
+        for move_seq in actions:
+            turns += 1
+            if any(event.kind in ("quit", "restart") for event in step(state, move_seq)):
+                break
+        elapsed = time.perf_counter() - start
+    finally:
+        GRID_SIZE, GRID_ENGINE = saved
+    print(f"Replayed {turns} inputs in {elapsed:.3f}s ({turns / max(elapsed, 1e-9):.0f} inputs/s)")
+    print(f"Room: {state.room}  Score: {state.score}  Game over: {state.game_over}")
+    if digest is None:
+        print("Log has no end digest (session still running or crashed)")
+        return True
+    ok = state_digest(state) == digest
+    print("State matches the recording" if ok else f"State MISMATCH: {state_digest(state)} != {digest}")
+    return ok
+
+
+# Binary save file, little-endian:
+#   header | rng state | tiles (height*width bytes, one code per tile) |
+#   monster, spike, shooter and arrow records (fixed size, counts in the header)
+SAVE_MAGIC = b"DGSV"
+SAVE_VERSION = 1
+SAVE_PATH = "dungeon.sav"
+SAVE_HEADER = struct.Struct("<4sHcBIIiqqiqii" "iiiiBBB" "IIII")
+SAVE_RNG = struct.Struct("<625IBd")
+SAVE_MONSTER = struct.Struct("<iii")  # row, col, hp
+SAVE_SPIKE = struct.Struct("<iiiii")  # row, col, period, offset, turn
+SAVE_SHOOTER = struct.Struct("<iiii")  # row, col, period, turn
+SAVE_ARROW = struct.Struct("<iiBB")  # row, col, glyph code, fresh
+SAVE_TILES = [WALL, FLOOR, EXIT, SHOOTER, HEALTH, 'P']
+SAVE_ARROWS = list(ARROW_DIRS)
+SAVE_POWERS = [None, 'time_stop', 'invulnerable/5hp', 'explosive']
+# Tile codes -> glyphs in one str.translate call per row
+SAVE_TILE_TABLE = {code: tile for code, tile in enumerate(SAVE_TILES)}
+
+
+def restore(cls, **fields):
+    # Rebuild an object from saved fields without running __init__ (which rolls new timers)
+    obj = cls.__new__(cls)
+    obj.__dict__.update(fields)
+    return obj
+
+
+def save_game(state: GameState, path: str = SAVE_PATH) -> None:
+    player = state.player
+    height, width = len(state.grid), len(state.grid[0])
+    arrows = [(pos, state.arrows.glyph[slot], slot in state.arrows.fresh) for pos, slot in state.arrows.at.items()]
+    parts = [SAVE_HEADER.pack(
+        SAVE_MAGIC, SAVE_VERSION, state.difficulty.encode(), state.game_over,
+        height, width, state.room, state.score, state.turn, state.allowed_moves, state.seed,
+        state.exit_pos[0], state.exit_pos[1],
+        player.row, player.col, player.hp, player.ammo, SAVE_POWERS.index(player.power_up),
+        getattr(player, 'invulnerable', False), getattr(player, 'predicted_attack', False),
+        len(state.monsters), len(state.spikes), len(state.shooters), len(arrows),
+    )]
+    _, key, gauss = state.rng.getstate()
+    parts.append(SAVE_RNG.pack(*key, gauss is not None, gauss or 0.0))
+    codes = {tile: code for code, tile in enumerate(SAVE_TILES)}
+    parts.append(bytes(codes[tile] for row in state.grid for tile in row))
+    parts.extend(SAVE_MONSTER.pack(*record) for record in state.monsters.records())
+    parts.extend(SAVE_SPIKE.pack(s.row, s.col, s.period, s.offset, s.turn) for s in state.spikes)
+    parts.extend(SAVE_SHOOTER.pack(s.row, s.col, s.period, s.turn) for s in state.shooters)
+    parts.extend(SAVE_ARROW.pack(r, c, SAVE_ARROWS.index(glyph), fresh) for (r, c), glyph, fresh in arrows)
+    # Write to a temporary file first so a crash never leaves a half-written save
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"".join(parts))
+    os.replace(path + ".tmp", path)
+
+
+def load_game(path: str = SAVE_PATH, prefetch: bool = True) -> GameState:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < SAVE_HEADER.size:
+            raise ValueError(f"{path}: not a save file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return read_save(view, path, prefetch)
+            finally:
+                view.release()
+
+
+def read_save(view: memoryview, path: str, prefetch: bool) -> GameState:
+    (magic, version, difficulty, game_over, height, width, room, score, turn, allowed_moves, seed,
+     exit_row, exit_col, p_row, p_col, p_hp, p_ammo, p_power, p_invulnerable, p_predicted,
+     n_monsters, n_spikes, n_shooters, n_arrows) = SAVE_HEADER.unpack_from(view)
+    if magic != SAVE_MAGIC or version != SAVE_VERSION:
+        raise ValueError(f"{path}: not a version {SAVE_VERSION} save file")
+    offset = SAVE_HEADER.size
+    *key, has_gauss, gauss = SAVE_RNG.unpack_from(view, offset)
+    offset += SAVE_RNG.size
+    rng = random.Random()
+    rng.setstate((3, tuple(key), gauss if has_gauss else None))
+    # Tiles are decoded a row at a time straight from the mapping
+    tiles = view[offset:offset + height * width]
+    grid = [list(str(tiles[r * width:(r + 1) * width], "latin-1").translate(SAVE_TILE_TABLE)) for r in range(height)]
+    offset += height * width
+
+    def records(record: struct.Struct, count: int):
+        nonlocal offset
+        chunk = view[offset:offset + record.size * count]
+        offset += record.size * count
+        return record.iter_unpack(chunk)
+
+    monsters = MonsterPool()
+    for r, c, hp in records(SAVE_MONSTER, n_monsters):
+        monsters.add_record(r, c, hp)
+    # Hazard turns live on a clock, so bind each restored object with its turn
+    spikes = []
+    for r, c, period, phase, t in records(SAVE_SPIKE, n_spikes):
+        spikes.append(restore(Spike, row=r, col=c, period=period, offset=phase))
+        STOPPED_CLOCK.bind_spike(spikes[-1], t)
+    shooters = []
+    for r, c, period, t in records(SAVE_SHOOTER, n_shooters):
+        shooters.append(restore(Shooter, row=r, col=c, period=period))
+        STOPPED_CLOCK.bind_shooter(shooters[-1], t)
+    arrows = ArrowStore()
+    for r, c, glyph, fresh in records(SAVE_ARROW, n_arrows):
+        arrows.add(r, c, SAVE_ARROWS[glyph], fresh=bool(fresh))
+
+    player = Actor(row=p_row, col=p_col, hp=p_hp, ammo=p_ammo, power_up=SAVE_POWERS[p_power])
+    player.invulnerable = bool(p_invulnerable)
+    player.predicted_attack = bool(p_predicted)
+    difficulty = difficulty.decode()
+    pipeline = None
+    if prefetch:
+        pipeline = RoomPipeline(difficulty, seed)
+        pipeline.prefetch(room + 1)
+    return restore(
+        GameState, difficulty=difficulty, player=player, room=room, score=score, turn=turn,
+        allowed_moves=allowed_moves, game_over=bool(game_over), seed=seed, rng=rng, pipeline=pipeline,
+        grid=grid, exit_pos=(exit_row, exit_col), monsters=monsters, spikes=spikes, shooters=shooters,
+        hazards=HazardClock(spikes, shooters), arrows=arrows, occupancy=SpatialIndex(spikes), flow=FlowCache(),
+        room_stats=None,
+    )
+
+
+# Room library: rooms generated ahead of time by src/roomlib.py, one file for many
+# (difficulty, room, seed) keys. Rooms only depend on those keys plus the map size
+# and the generation engine, which the header records. Layout, little-endian
+# except the index keys:
+#   header | room records | index (one entry per room, sorted by key)
+# A record is exit and counts, one tile code per tile (SAVE_TILES), then monster,
+# spike and shooter records in the save file formats. Index keys are big-endian
+# with the seed shifted to unsigned, so comparing the raw bytes orders them like
+# the numbers and a lookup is a binary search straight over the mapped file.
+LIBRARY_MAGIC = b"DGRL"
+LIBRARY_VERSION = 3  # 2: trap rooms are checked (and repaired) for a way through, 3: for both entry ticks
+LIBRARY_HEADER = struct.Struct("<4sHHH7sIQ")  # magic, version, height, width, engine, rooms, index offset
+LIBRARY_ROOM = struct.Struct("<iiIII")  # exit row, exit col, monsters, spikes, shooters
+LIBRARY_ENTRY = struct.Struct(">BHQQI")  # difficulty, room, seed + 2**63 | offset, length
+LIBRARY_KEY = 11  # Bytes of an entry that make up its key
+LIBRARY_DIFFICULTIES = list(START_STATS)
+
+
+def library_key(difficulty: str, room: int, seed: int) -> bytes | None:
+    # None for a seed no library can hold
+    if seed not in SEED_RANGE:
+        return None
+    return LIBRARY_ENTRY.pack(LIBRARY_DIFFICULTIES.index(difficulty), room, seed + 2**63, 0, 0)[:LIBRARY_KEY]
+
+
+def encode_room(result) -> bytes:
+    # One generate_room result as a library record
+    grid, exit_pos, monsters, spikes, shooters = result
+    codes = {tile: code for code, tile in enumerate(SAVE_TILES)}
+    parts = [LIBRARY_ROOM.pack(exit_pos[0], exit_pos[1], len(monsters), len(spikes), len(shooters))]
+    parts.append(bytes(codes[tile] for row in grid for tile in row))
+    parts.extend(SAVE_MONSTER.pack(m.row, m.col, m.hp) for m in monsters)
+    parts.extend(SAVE_SPIKE.pack(s.row, s.col, s.period, s.offset, s.turn) for s in spikes)
+    parts.extend(SAVE_SHOOTER.pack(s.row, s.col, s.period, s.turn) for s in shooters)
+    return b"".join(parts)
+
+
+class RoomLibrary:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < LIBRARY_HEADER.size:
+            raise ValueError(f"{path}: not a room library")
+        magic, version, self.height, self.width, engine, self.count, self.index = LIBRARY_HEADER.unpack_from(self.mm)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+            raise ValueError(f"{path}: not a version {LIBRARY_VERSION} room library")
+        self.engine = engine.rstrip(b"\0").decode()
+
+    def close(self) -> None:
+        self.mm.close()
+
+    def check(self, size: int, engine: str) -> None:
+        # Rooms from another map size or generator would not match live generation
+        if (self.height, self.width, self.engine) != (size, size, engine):
+            raise ValueError(f"{self.path}: built for {self.height}x{self.width} maps with the {self.engine} engine, not {size}x{size} with {engine}")
+
+    def entry(self, i: int) -> bytes:
+        start = self.index + i * LIBRARY_ENTRY.size
+        return self.mm[start:start + LIBRARY_ENTRY.size]
+
+    def search(self, key: bytes) -> int:
+        # First index entry whose key is not below `key`
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.entry(mid)[:len(key)] < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def get(self, difficulty: str, room: int, seed: int):
+        # The room as generate_room returns it, or None when it is not in the library
+        key = library_key(difficulty, room, seed)
+        if key is None:
+            return None
+        i = self.search(key)
+        if i == self.count or self.entry(i)[:LIBRARY_KEY] != key:
+            return None
+        *_, offset, length = LIBRARY_ENTRY.unpack(self.entry(i))
+        return self.decode(memoryview(self.mm)[offset:offset + length])
+
+    def decode(self, view: memoryview):
+        height, width = self.height, self.width
+        exit_row, exit_col, n_monsters, n_spikes, n_shooters = LIBRARY_ROOM.unpack_from(view)
+        offset = LIBRARY_ROOM.size
+        tiles = view[offset:offset + height * width]
+        grid = [list(str(tiles[r * width:(r + 1) * width], "latin-1").translate(SAVE_TILE_TABLE)) for r in range(height)]
+        offset += height * width
+        monsters = [Actor(row=r, col=c, hp=hp) for r, c, hp in SAVE_MONSTER.iter_unpack(view[offset:offset + SAVE_MONSTER.size * n_monsters])]
+        offset += SAVE_MONSTER.size * n_monsters
+        spikes = []
+        for r, c, period, phase, t in SAVE_SPIKE.iter_unpack(view[offset:offset + SAVE_SPIKE.size * n_spikes]):
+            spikes.append(restore(Spike, row=r, col=c, period=period, offset=phase))
+            STOPPED_CLOCK.bind_spike(spikes[-1], t)
+        offset += SAVE_SPIKE.size * n_spikes
+        shooters = []
+        for r, c, period, t in SAVE_SHOOTER.iter_unpack(view[offset:offset + SAVE_SHOOTER.size * n_shooters]):
+            shooters.append(restore(Shooter, row=r, col=c, period=period))
+            STOPPED_CLOCK.bind_shooter(shooters[-1], t)
+        return grid, (exit_row, exit_col), monsters, spikes, shooters
+
+    def pick_seed(self, difficulty: str, rng=random) -> int | None:
+        # Seed of a random room of this difficulty, so a new game starts on library rooms
+        first = self.search(bytes([LIBRARY_DIFFICULTIES.index(difficulty)]))
+        last = self.search(bytes([LIBRARY_DIFFICULTIES.index(difficulty) + 1]))
+        if first == last:
+            return None
+        return LIBRARY_ENTRY.unpack(self.entry(rng.randrange(first, last)))[2] - 2**63
+
+
+def write_library(path: str, records, size: int, engine: str) -> int:
+    # records: (difficulty, room, seed, encoded room) in any order; returns the room count
+    index = []
+    with open(path + ".tmp", "wb") as f:
+        f.write(bytes(LIBRARY_HEADER.size))
+        offset = LIBRARY_HEADER.size
+        for difficulty, room, seed, data in records:
+            index.append((library_key(difficulty, room, seed), offset, len(data)))
+            f.write(data)
+            offset += len(data)
+        index.sort()
+        for key, start, length in index:
+            f.write(key + LIBRARY_ENTRY.pack(0, 0, 0, start, length)[LIBRARY_KEY:])
+        f.seek(0)
+        f.write(LIBRARY_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, size, size, engine.encode(), len(index), offset))
+    os.replace(path + ".tmp", path)
+    return len(index)
+
+
+# Opt-in per-phase turn profiler (--profile or DUNGEON_PROFILE=1|FILE). Installing
+# it swaps each phase function for a timed wrapper, so normal runs pay nothing.
+# Each entry: report name, owning class (None = this module), attribute, and a
+# function of the call's arguments giving the number of entities it processes.
+PROFILE_PHASES = [
+    ("turn", None, "step", lambda state, actions: len(state.monsters) + len(state.spikes) + len(state.shooters) + len(state.arrows)),
+    ("actions", None, "apply_actions", lambda state, move_seq, events: len(move_seq)),
+    ("monster_ai", None, "move_monsters", lambda state: len(state.monsters)),
+    ("spikes", None, "advance_spikes", lambda state: len(state.spikes)),
+    ("predicted_attack", None, "predicted_attack", lambda state, events: len(state.monsters)),
+    ("damage", None, "resolve_damage", lambda state, events: len(state.monsters)),
+    ("shooters", None, "fire_shooters", lambda state: len(state.shooters)),
+    ("arrows", None, "move_arrows", lambda state: len(state.arrows)),
+    ("standing_on_arrows", None, "standing_on_arrows", lambda state: len(state.arrows)),
+    ("room", GameState, "enter_room", lambda state, room: room),
+    ("chunks", WorldState, "load_window", lambda state, center: len(state.store)),
+    ("compose", Camera, "frame", lambda camera, state: len(state.monsters) + len(state.spikes) + len(state.arrows)),
+    ("draw", TerminalRenderer, "draw", lambda renderer, frame, status: len(frame) * len(frame[0])),
+]
+PROFILE_OUTSIDE = {"turn", "room", "chunks", "compose", "draw"}  # Not (only) run inside step(), no share of the turn
+PROFILE_BUCKETS = [4, 16, 64, 256, 1024, 4096, 16384]  # Histogram bucket limits in microseconds
+PROFILER = None
+
+
+class Profiler:
+    def __init__(self):
+        self.times = {}  # Phase -> call durations in nanoseconds
+        self.entities = {}  # Phase -> entities per call
+        self.installed = []
+
+    def wrap(self, name: str, fn, count):
+        times = self.times.setdefault(name, [])
+        entities = self.entities.setdefault(name, [])
+
+        def timed(*args):
+            entities.append(count(*args))
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args)
+            finally:
+                times.append(time.perf_counter_ns() - start)
+        return timed
+
+    def install(self) -> None:
+        for name, owner, attr, count in PROFILE_PHASES:
+            target = owner.__dict__ if owner is not None else globals()
+            original = target[attr]
+            self.installed.append((owner, attr, original))
+            if owner is not None:
+                setattr(owner, attr, self.wrap(name, original, count))
+            else:
+                target[attr] = self.wrap(name, original, count)
 
-        # Prediction attack: kill any monster that moves adjacent if player.predicted_attack is set
+    def uninstall(self) -> None:
+        for owner, attr, original in reversed(self.installed):
+            if owner is not None:
+                setattr(owner, attr, original)
+            else:
+                globals()[attr] = original
+        self.installed = []
 
-        monsters_to_kill = []
-        if getattr(player, 'predicted_attack', False):
-            for monster in monsters:
-                if (monster.hp > 0 or monster.hp == -1) and abs(monster.row - player.row) + abs(monster.col - player.col) == 1:
-                    if monster.hp != -1:
-                        monsters_to_kill.append(monster)
-            for monster in monsters_to_kill:
-                if random.random() < 0.8:
-                    monster.hp = 0
-                    score += 1
-            player.predicted_attack = False
+    def summary(self) -> dict:
+        phases = {}
+        for name, times in self.times.items():
+            if not times:
+                continue
+            ordered = sorted(times)
+            entities = self.entities[name]
+            histogram = [0] * (len(PROFILE_BUCKETS) + 1)
+            for t in times:
+                bucket = 0
+                while bucket < len(PROFILE_BUCKETS) and t >= PROFILE_BUCKETS[bucket] * 1000:
+                    bucket += 1
+                histogram[bucket] += 1
+            phases[name] = {
+                "calls": len(times),
+                "total_ms": sum(times) / 1e6,
+                "p50_us": ordered[len(ordered) // 2] / 1000,
+                "p90_us": ordered[len(ordered) * 9 // 10] / 1000,
+                "p99_us": ordered[len(ordered) * 99 // 100] / 1000,
+                "max_us": ordered[-1] / 1000,
+                "entities": sum(entities) / len(entities),
+                "histogram": histogram,
+            }
+        return phases
+
+    def report(self, out=None) -> None:
+        out = out or sys.stdout
+        phases = self.summary()
+        turn_ms = phases["turn"]["total_ms"] if "turn" in phases else 0.0
+        limits = ["<" + (f"{limit}us" if limit < 1000 else f"{limit // 1000}ms") for limit in PROFILE_BUCKETS] + [f">={PROFILE_BUCKETS[-1] // 1000}ms"]
+        print("Turn profile (share: part of the total turn time, for phases that only run inside a turn)", file=out)
+        print(f"{'phase':<20}{'calls':>7}{'total ms':>10}{'share':>7}{'p50 us':>9}{'p90 us':>9}{'p99 us':>9}{'max us':>9}{'entities':>9}  " + " ".join(f"{label:>6}" for label in limits), file=out)
+        for name, phase in sorted(phases.items(), key=lambda item: -item[1]["total_ms"]):
+            share = f"{100 * phase['total_ms'] / turn_ms:.0f}%" if turn_ms and name not in PROFILE_OUTSIDE else ""
+            print(
+                f"{name:<20}{phase['calls']:>7}{phase['total_ms']:>10.2f}{share:>7}{phase['p50_us']:>9.1f}{phase['p90_us']:>9.1f}"
+                f"{phase['p99_us']:>9.1f}{phase['max_us']:>9.1f}{phase['entities']:>9.1f}  " + " ".join(f"{n:>6}" for n in phase["histogram"]),
+                file=out,
+            )
 
-        for monster in monsters:
-            if monster.row == player.row and monster.col == player.col:
-                if monster.hp != -1:
-                    monster.hp = 0
-                    score += 1
-                # Auto-activate invulnerable if present
-                if getattr(player, 'invulnerable', False):
-                    pass
-                elif player.power_up == 'invulnerable':
-                    player.power_up = None
-                    player.invulnerable = True
-                else:
-                    player.hp -= 1
+    def finish(self, path: str | None) -> None:
+        # Print the report and, with a file name, also dump it as JSON
+        self.report()
+        if path:
+            with open(path, "w") as f:
+                json.dump({"buckets_us": PROFILE_BUCKETS, "phases": self.summary()}, f, indent=1)
+            print(f"Profile written to {path}")
+
+
+def memory_usage() -> tuple[int, int | None]:
+    # Live allocator blocks after a collection, plus the resident size in KiB where /proc is available
+    gc.collect()
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    return sys.getallocatedblocks(), rss
+
+
+# Real-time mode (--realtime [HZ]): the world ticks on a fixed clock whether or not
+# a key was pressed. Keys are read without blocking and queued; each tick hands the
+# queued keys to step() as that turn's actions, so a tick is one turn and the replay
+# log stays one ">actions" line per step() call. Drawing runs on its own frame cap
+# and only redraws after something changed.
+TICK_RATE = 5  # World ticks per second
+FRAME_RATE = 30  # Redraws per second at most
+REALTIME_KEYS = set("wasdfueqr")
+
+
+class KeyReader:
+    # Passes key presses to a callback without blocking the event loop. On a POSIX
+    # terminal stdin is put in cbreak mode (no line buffering, no echo) and watched by
+    # the loop; on Windows the console is polled. End of input counts as "q".
+    def __init__(self, loop: asyncio.AbstractEventLoop, callback):
+        self.loop = loop
+        self.callback = callback
+        self.fd = None
+        self.saved = None
+        self.poller = None
+
+    def __enter__(self):
+        if msvcrt is not None:
+            self.poller = self.loop.create_task(self.poll())
+            return self
+        self.fd = sys.stdin.fileno()
+        if termios is not None and os.isatty(self.fd):
+            self.saved = termios.tcgetattr(self.fd)
+            tty.setcbreak(self.fd)
+        self.loop.add_reader(self.fd, self.readable)
+        return self
+
+    def __exit__(self, *exc):
+        if self.poller is not None:
+            self.poller.cancel()
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            if self.saved is not None:
+                termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved)
+
+    def readable(self) -> None:
+        data = os.read(self.fd, 1024)
+        if not data:
+            self.loop.remove_reader(self.fd)
+            self.callback("q")
+            return
+        self.callback(data.decode(errors="ignore"))
+
+    async def poll(self) -> None:
+        while True:
+            while msvcrt.kbhit():
+                self.callback(msvcrt.getwch())
+            await asyncio.sleep(0.01)
+
+
+class RealtimeLoop:
+    def __init__(self, session: "Session", rate: float = TICK_RATE, frame_rate: float = FRAME_RATE):
+        self.session = session
+        self.rate = rate
+        self.period = 1 / rate
+        self.frame_period = 1 / frame_rate
+        self.keys = ""
+        self.dirty = True
+        self.outcome = None  # "quit", "restart" or "over" once the game stops
+        self.ticks = 0
+        self.late = 0
+        self.worst = 0.0  # Furthest a tick finished past its deadline, in seconds
+        self.slowest = 0.0  # Longest step() call, in seconds
+
+    async def run(self) -> str:
+        # Plays until quit, restart or game over; returns which one
+        loop = asyncio.get_running_loop()
+        with KeyReader(loop, self.on_keys):
+            tasks = [asyncio.create_task(self.ticker()), asyncio.create_task(self.painter())]
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                task.result()
+        self.paint()
+        print(self.summary())
+        return self.outcome
+
+    def on_keys(self, text: str) -> None:
+        self.keys += "".join(key for key in text.lower() if key in REALTIME_KEYS)
+        self.dirty = True
+
+    def take_actions(self) -> str:
+        # Everything queued since the last tick; a trailing "e" waits for its direction
+        actions, self.keys = self.keys, ""
+        if actions.endswith("e"):
+            actions, self.keys = actions[:-1], "e"
+        return actions
+
+    def tick(self) -> None:
+        session = self.session
+        actions = self.take_actions()
+        if session.log is not None:
+            session.log.record(actions)
+        start = time.perf_counter()
+        events = step(session.state, actions)
+        self.slowest = max(self.slowest, time.perf_counter() - start)
+        self.ticks += 1
+        self.dirty = True
+        for event in events:
+            if event.kind in ("quit", "restart"):
+                self.outcome = event.kind
+        if self.outcome is None and session.state.game_over:
+            self.outcome = "over"
+
+    async def ticker(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.period
+        while self.outcome is None:
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            self.tick()
+            # A tick is late when it ends after the next one was due (slow step() or a
+            # long draw holding up the loop). The clock then restarts from now instead
+            # of running the missed ticks back to back.
+            overrun = loop.time() - (deadline + self.period)
+            if overrun > 0:
+                self.late += 1
+                self.worst = max(self.worst, overrun)
+                deadline = loop.time()
+            deadline += self.period
+
+    async def painter(self) -> None:
+        while True:
+            if self.dirty:
+                self.dirty = False
+                self.paint()
+            await asyncio.sleep(self.frame_period)
+
+    def paint(self) -> None:
+        session = self.session
+        state = session.state
+        status = f"{state.status_line()}  Tick: {self.ticks}  Late: {self.late}  Keys: {self.keys or '-'}"
+        session.renderer.draw(session.camera.frame(state), status)
+
+    def summary(self) -> str:
+        return (
+            f"{self.ticks} ticks at {self.rate:g}/s, {self.late} late (worst {self.worst * 1000:.1f} ms over), "
+            f"slowest step {self.slowest * 1000:.1f} ms of a {self.period * 1000:.0f} ms tick"
+        )
+
+
+# Runs games one after another. A restart resets the same GameState in place
+# (its monster pool and arrow store keep their slots) instead of calling main()
+# again, so earlier games leave no stack frames or rooms behind.
+class Session:
+    def __init__(self, args: argparse.Namespace, view: tuple[int, int] | None):
+        self.args = args
+        self.view = view
+        self.renderer = TerminalRenderer()
+        self.camera = None
+        self.state = None
+        self.log = None
+        self.games = 0
+        self.baseline = None
+
+    def run(self) -> None:
+        while True:
+            self.games += 1
+            self.start_game()
+            outcome = self.play()
+            self.report()
+            if outcome == "quit":
+                return
 
-        for monster in monsters:
-            if monster.hp == 0:
+    def start_game(self) -> None:
+        global TILE_SIZE
+        args = self.args
+        while True:
+            tile_input = input("Enter tile size (integer >= 1): ").strip()
+            if tile_input.isdigit() and int(tile_input) >= 1:
+                TILE_SIZE = int(tile_input)
+                break
+            print("Invalid input. Please enter a positive integer.")
+
+        if args.load and self.games == 1:
+            self.replace_state(load_game(args.load))
+        else:
+            print("Select difficulty: (E)asy, (M)edium, (H)ard")
+            while True:
+                diff = input("Enter difficulty (e/m/h): ").strip().lower()
+                if diff in ("e", "m", "h"):
+                    break
+                print("Invalid input. Please enter 'e', 'm', or 'h'.")
+            kind = WorldState if args.world else GameState
+            seed = args.seed
+            if seed is None and ROOM_LIBRARY is not None and not args.world:
+                # Start on one of the library's seeds so room changes are lookups
+                seed = ROOM_LIBRARY.pick_seed(diff)
+            if type(self.state) is kind:
+                self.state.reset(diff, seed=seed)
+            else:
+                self.replace_state(kind(diff, seed=seed))
+        if args.record:
+            self.log = ReplayLog(self.record_path(), self.state.seed, self.state.difficulty, args.world)
+        self.camera = Camera(*self.view) if self.view else Camera()
+        self.renderer.invalidate()
+
+    def record_path(self) -> str:
+        # Later games of the session go to run.2.replay, run.3.replay, ...
+        if self.games == 1:
+            return self.args.record
+        root, ext = os.path.splitext(self.args.record)
+        return f"{root}.{self.games}{ext}"
+
+    def replace_state(self, state: GameState) -> None:
+        if self.state is not None and self.state.pipeline is not None:
+            self.state.pipeline.cancel()
+        self.state = state
+
+    def close_log(self) -> None:
+        if self.log is not None:
+            self.log.close(self.state)
+            self.log = None
+
+    def play(self) -> str:
+        # One game; returns "restart" or "quit"
+        if self.args.realtime:
+            return self.play_realtime()
+        renderer = self.renderer
+        while True:
+            state = self.state
+            # Status updates from this turn's actions are coalesced into this one frame
+            renderer.draw(self.camera.frame(state), state.status_line())
+
+            if state.game_over:
+                return self.game_over()
+
+            move_seq = input(f"Enter up to {state.allowed_moves} actions (WASD to move, F to attack, U to use power-up, Q to quit, R to restart): ")
+            # :save [file] and :load [file] are shell commands, they don't use a turn
+            command, _, path = move_seq.strip().partition(" ")
+            if command in (":save", ":load"):
+                path = path.strip() or SAVE_PATH
+                try:
+                    if isinstance(state, WorldState):
+                        renderer.notify("Saving is not available in world mode")
+                    elif command == ":save":
+                        save_game(state, path)
+                        renderer.notify(f"Saved to {path}")
+                    else:
+                        loaded = load_game(path)
+                        # The recording stops at the session it described
+                        if self.log is not None:
+                            renderer.notify(f"Recording to {self.log.file.name} stopped (a loaded game cannot be replayed)")
+                        self.close_log()
+                        self.replace_state(loaded)
+                        renderer.invalidate()
+                        renderer.notify(f"Loaded {path}")
+                except (OSError, ValueError, struct.error) as e:
+                    renderer.notify(f"Could not {command[1:]} {path}: {e}")
                 continue
-            if abs(monster.row - player.row) + abs(monster.col - player.col) == 1:
-                # Auto-activate invulnerable if present
-                if getattr(player, 'invulnerable', False):
-                    pass
-                elif player.power_up == 'invulnerable':
-                    player.power_up = None
-                    player.invulnerable = True
-                else:
-                    player.hp -= 1
-        # Reset invulnerable at end of turn
-        if hasattr(player, 'invulnerable'):
-            player.invulnerable = False
+            if self.log is not None:
+                self.log.record(move_seq)
+            events = step(state, move_seq)
+            if any(event.kind in ("quit", "restart") for event in events):
+                self.close_log()
+            for event in events:
+                if event.kind in ("cheat", "message"):
+                    renderer.notify(event.text)
+                elif event.kind == "quit":
+                    print("Goodbye.")
+                    return "quit"
+                elif event.kind == "restart":
+                    return "restart"
+
+    def play_realtime(self) -> str:
+        outcome = asyncio.run(RealtimeLoop(self, self.args.realtime).run())
+        if outcome == "over":
+            return self.game_over()
+        self.close_log()
+        if outcome == "quit":
+            print("Goodbye.")
+        return outcome
+
+    def game_over(self) -> str:
+        print(f"Final Score: {self.state.score}")
+        print("=================")
+        self.close_log()
+        while True:
+            choice = input("Press R to restart or Q to quit: ").strip().lower()
+            if choice == "q":
+                return "quit"
+            if choice == "r":
+                return "restart"
+
+    def report(self) -> None:
+        # Memory after each game; restarts should leave it flat
+        blocks, rss = memory_usage()
+        if self.baseline is None:
+            self.baseline = blocks
+        text = f"Game {self.games}: {blocks} allocated blocks ({blocks - self.baseline:+d} since game 1)"
+        if rss is not None:
+            text += f", {rss} KiB resident"
+        print(text)
+
+
+def seed_arg(text: str) -> int:
+    try:
+        return parse_seed(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
 
-        monsters = remove_dead(monsters)
+def main() -> None:
+    global PROFILER, ROOM_LIBRARY
+    parser = argparse.ArgumentParser(description="Terminal dungeon crawler")
+    parser.add_argument("--seed", type=seed_arg, help="session seed (random if omitted)")
+    parser.add_argument("--record", metavar="FILE", help="write a replay log of this session")
+    parser.add_argument("--replay", metavar="FILE", help="re-run a replay log without rendering")
+    parser.add_argument("--load", metavar="FILE", help="resume a saved game")
+    parser.add_argument("--view", metavar="ROWSxCOLS", help="fixed viewport size in tiles (default: fit the terminal)")
+    parser.add_argument("--world", action="store_true", help="open-world mode: one endless dungeon made of chunks")
+    parser.add_argument("--profile", nargs="?", const="", metavar="FILE", help="time each turn phase and report on exit (FILE: also write JSON)")
+    parser.add_argument("--realtime", nargs="?", type=float, const=TICK_RATE, metavar="HZ",
+                        help=f"real-time mode: the world ticks HZ times a second (default {TICK_RATE}) and keys act without Enter")
+    parser.add_argument("--rooms", metavar="FILE", help="load rooms from a library built by src/roomlib.py (missing rooms are generated)")
+    parser.add_argument("--engine", default=GRID_ENGINE, metavar="NAME",
+                        help=f"room generation engine: python or numpy (default {GRID_ENGINE}, or set DUNGEON_ENGINE)")
+    args = parser.parse_args()
+    if args.realtime is not None and args.realtime <= 0:
+        parser.error("--realtime takes a positive tick rate")
+    if args.record and args.load:
+        # A replay is re-run from a new game's seed, it cannot start from a save
+        parser.error("--record cannot be combined with --load (replays start from a new game)")
+    try:
+        select_engine(args.engine)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.rooms:
+        try:
+            ROOM_LIBRARY = RoomLibrary(args.rooms)
+            ROOM_LIBRARY.check(GRID_SIZE, GRID_ENGINE)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    profile = args.profile if args.profile is not None else os.environ.get("DUNGEON_PROFILE")
+    if profile is not None and PROFILER is None:
+        PROFILER = Profiler()
+        PROFILER.install()
+        atexit.register(PROFILER.finish, None if profile in ("", "1") else profile)
+    view = None
+    if args.view:
+        try:
+            view = tuple(int(n) for n in args.view.lower().split("x"))
+        except ValueError:
+            view = ()
+        if len(view) != 2 or min(view) < 1:
+            parser.error("--view takes ROWSxCOLS, e.g. 20x40")
+    if args.replay:
+        try:
+            ok = replay(args.replay)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        sys.exit(0 if ok else 1)
 
+    Session(args, view).run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,69 @@
+# Builds a room library: every (difficulty, room, seed) in the requested ranges is
+# generated on a process pool and written to one indexed file that the game maps
+# and reads rooms from (python src/main.py --rooms rooms.lib).
+#
+#   python src/roomlib.py --seeds 0-99 --rooms 1-1000 --out rooms.lib
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import main
+from balance import parse_ranges, parse_rooms
+
+
+def build_rooms(difficulty: str, seed: int, rooms: list[int], size: int, engine: str) -> list[tuple[str, int, int, bytes]]:
+    # One task: every requested room of one (difficulty, seed), encoded
+    main.select_engine(engine)
+    records = []
+    for room in rooms:
+        result = main.generate_room(main.Actor(row=1, col=1, hp=0), room, difficulty, main.room_rng(seed, room), size)
+        records.append((difficulty, room, seed, main.encode_room(result)))
+    return records
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-generate rooms into an indexed library file")
+    parser.add_argument("--seeds", default="0-9", help="non-negative session seeds, e.g. 0-99 or 1,5,10-20")
+    parser.add_argument("--rooms", default="1-50", help="room list, e.g. 1-1000 or 1,5,10-20")
+    parser.add_argument("--difficulties", default="emh")
+    parser.add_argument("--size", type=int, default=main.GRID_SIZE, help="map size the game will run with")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="rooms.lib")
+    parser.add_argument("--engine", default=main.GRID_ENGINE, metavar="NAME", help="room generation engine the game will run with")
+    args = parser.parse_args(argv)
+    try:
+        main.select_engine(args.engine)
+    except ValueError as e:
+        parser.error(str(e))
+    if any(d not in main.START_STATS for d in args.difficulties):
+        parser.error(f"difficulties must be made of {''.join(main.START_STATS)}")
+
+    try:
+        rooms = parse_rooms(args.rooms)
+    except ValueError as e:
+        parser.error(f"--rooms: {e}")
+    try:
+        seeds = [main.parse_seed(str(seed)) for seed in parse_ranges(args.seeds)]
+    except ValueError as e:
+        parser.error(f"--seeds: {e}")
+    tasks = [(d, seed) for d in args.difficulties for seed in seeds]
+    start = time.perf_counter()
+
+    def finished():
+        # Records are written as tasks finish; the index is sorted at the end
+        for done, future in enumerate(as_completed(futures), 1):
+            yield from future.result()
+            if done % 20 == 0 or done == len(futures):
+                print(f"{done}/{len(futures)} seeds, {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(build_rooms, d, seed, rooms, args.size, args.engine) for d, seed in tasks]
+        count = main.write_library(args.out, finished(), args.size, main.GRID_ENGINE)
+    print(f"Wrote {count} rooms to {args.out} ({os.path.getsize(args.out) // 1024} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
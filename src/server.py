@@ -0,0 +1,318 @@
+# Game server: one process hosts many independent games over TCP or a Unix socket.
+# Every connection is one session with its own GameState (seed, RNG, room and
+# entities). Turns run on a single scheduler that serves sessions round-robin, one
+# command at a time, so a client that floods actions cannot starve the others.
+#
+#   python src/server.py --port 7777 --workers 4
+#   python src/server.py --unix /tmp/dungeon.sock
+#
+# Line protocol, UTF-8, one command per line:
+#   new <e|m|h> [seed] [world]   start (or restart) this connection's game; seed and world in any order
+#   <actions>                    one turn, same grammar as the prompt ("ddf", "ew", "u", "")
+#   quit                         end the session
+# Every command gets one reply block:
+#   seed <seed>                  after a new game
+#   event <kind> <text>          one per step() event
+#   full <rows> <cols>           then <rows> lines of tiles (first frame or a size change)
+#   delta <count>                then <count> lines "<row> <col> <tile>" that changed
+#   status <status line>
+#   ok                           end of the block ("error <message>" replaces the whole block)
+import argparse
+import asyncio
+import os
+import random
+import signal
+import statistics
+import sys
+import time
+from collections import deque
+from multiprocessing import Process
+
+import main
+
+DEFAULT_PORT = 7777
+VIEW = (24, 24)  # Rows, columns of the frame each session receives, in tiles
+MAX_PENDING = 8  # Unanswered commands per session before the server stops reading from it
+HIGH_WATER = 64 * 1024  # Unsent bytes per session before its turns are paused
+TIME_SLICE = 0.005  # Seconds of turns the scheduler runs before it lets the loop do I/O
+
+
+class ClientSession:
+    def __init__(self, server: "Server", writer: asyncio.StreamWriter):
+        self.server = server
+        self.writer = writer
+        self.inbox = deque()
+        self.has_room = asyncio.Event()
+        self.has_room.set()
+        self.queued = False  # In the scheduler's ready queue
+        self.paused = False  # Waiting for the client to read what was sent
+        self.closed = False
+        self.closing = False  # No more input, close once the inbox is answered
+        self.state = None
+        self.camera = None
+        self.prev = None  # Last frame sent, deltas are taken against it
+
+    def run_one(self) -> None:
+        # Answer the oldest queued command
+        line = self.inbox.popleft()
+        if len(self.inbox) < MAX_PENDING:
+            self.has_room.set()
+        parts = line.split()
+        if parts and parts[0] == "new":
+            self.new_game(parts[1:])
+        elif parts and parts[0] == "quit":
+            self.close()
+        elif self.state is None:
+            self.send(["error send 'new <e|m|h> [seed]' first"])
+        else:
+            self.turn(line)
+        if self.closing and not self.inbox:
+            self.close()
+
+    def new_game(self, args: list[str]) -> None:
+        difficulty = args[0] if args else "m"
+        if difficulty not in main.START_STATS:
+            self.send([f"error unknown difficulty {difficulty!r}"])
+            return
+        # The seed and "world" may come in either order after the difficulty
+        rest = args[1:]
+        kind = main.WorldState if "world" in rest else main.GameState
+        rest = [arg for arg in rest if arg != "world"]
+        if len(rest) > 1:
+            self.send([f"error unexpected arguments {' '.join(rest[1:])!r}"])
+            return
+        try:
+            seed = main.parse_seed(rest[0]) if rest else None
+        except ValueError:
+            self.send([f"error bad seed {rest[0]!r} (an integer of at most 64 bits)"])
+            return
+        if seed is None and main.ROOM_LIBRARY is not None and kind is main.GameState:
+            seed = main.ROOM_LIBRARY.pick_seed(difficulty)
+        if seed is None:
+            seed = random.getrandbits(32)
+        if type(self.state) is kind:
+            self.state.reset(difficulty, prefetch=False, seed=seed)
+        elif kind is main.WorldState:
+            self.state = main.WorldState(difficulty, seed=seed)
+        else:
+            self.state = main.GameState(difficulty, prefetch=False, seed=seed)
+        self.camera = main.Camera(*self.server.view)
+        self.prev = None
+        self.send([f"seed {seed}"] + self.frame_lines())
+
+    def turn(self, actions: str) -> None:
+        events = main.step(self.state, actions)
+        lines = [f"event {event.kind} {event.text}".rstrip() for event in events]
+        if any(event.kind == "quit" for event in events):
+            self.send(lines + ["ok"])
+            self.close()
+            return
+        if any(event.kind == "restart" for event in events):
+            self.new_game([self.state.difficulty])
+            return
+        self.send(lines + self.frame_lines())
+
+    def frame_lines(self) -> list[str]:
+        # Whole frame the first time, afterwards only the tiles that changed
+        frame = self.camera.frame(self.state)
+        prev = self.prev
+        self.prev = frame
+        if prev is None or len(prev) != len(frame) or len(prev[0]) != len(frame[0]):
+            lines = [f"full {len(frame)} {len(frame[0])}"] + ["".join(row) for row in frame]
+        else:
+            changed = [
+                f"{r} {c} {cell}"
+                for r, (row, old) in enumerate(zip(frame, prev)) if row != old
+                for c, (cell, was) in enumerate(zip(row, old)) if cell != was
+            ]
+            lines = [f"delta {len(changed)}"] + changed
+        return lines + [f"status {self.state.status_line()}", "ok"]
+
+    def send(self, lines: list[str]) -> None:
+        if self.writer.transport.is_closing():
+            # The client went away (reset or closed) with commands still queued
+            self.close()
+        if not self.closed:
+            self.writer.write(("\n".join(lines) + "\n").encode())
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+        self.has_room.set()
+
+
+class Server:
+    def __init__(self, view: tuple[int, int] = VIEW):
+        self.view = view
+        self.ready = deque()  # Sessions with a command waiting, served round-robin
+        self.wakeup = asyncio.Event()
+        self.sessions = set()
+        self.turn_times = []  # Seconds per answered command since the last stats line
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Reads one connection's commands into its inbox. A full inbox stops the
+        # reading, so the client's sends back up through the socket instead of
+        # queueing without limit in the server.
+        writer.transport.set_write_buffer_limits(high=HIGH_WATER)
+        session = ClientSession(self, writer)
+        self.sessions.add(session)
+        try:
+            while not session.closed:
+                while len(session.inbox) >= MAX_PENDING and not session.closed:
+                    session.has_room.clear()
+                    await session.has_room.wait()
+                line = await reader.readline()
+                if not line:
+                    # The client is done sending; answer what is queued, then close
+                    session.closing = True
+                    if not session.inbox:
+                        session.close()
+                    break
+                session.inbox.append(line.decode(errors="replace").rstrip("\r\n"))
+                self.schedule(session)
+        except (ConnectionError, ValueError):
+            # ValueError: a line longer than the reader's limit
+            session.close()
+        finally:
+            self.sessions.discard(session)
+
+    def schedule(self, session: ClientSession) -> None:
+        if session.inbox and not (session.queued or session.paused or session.closed):
+            session.queued = True
+            self.ready.append(session)
+            self.wakeup.set()
+
+    async def scheduler(self) -> None:
+        # Each pass answers one command per ready session, then requeues the session
+        # at the back if it has more. Slow readers are parked until their socket drains.
+        while True:
+            if not self.ready:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            slice_end = time.perf_counter() + TIME_SLICE
+            while self.ready and time.perf_counter() < slice_end:
+                session = self.ready.popleft()
+                session.queued = False
+                if session.closed:
+                    continue
+                start = time.perf_counter()
+                try:
+                    session.run_one()
+                except Exception as e:
+                    # A command that breaks the game ends its own session, not the scheduler
+                    session.send([f"error {type(e).__name__}: {e}"])
+                    session.close()
+                self.turn_times.append(time.perf_counter() - start)
+                if session.closed:
+                    continue
+                if session.writer.transport.get_write_buffer_size() > HIGH_WATER:
+                    session.paused = True
+                    asyncio.create_task(self.resume(session))
+                else:
+                    self.schedule(session)
+            await asyncio.sleep(0)
+
+    async def resume(self, session: ClientSession) -> None:
+        try:
+            await session.writer.drain()
+        except ConnectionError:
+            session.close()
+        session.paused = False
+        self.schedule(session)
+
+    async def report(self, every: float, name: str) -> None:
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(every)
+            now = time.perf_counter()
+            times, self.turn_times = sorted(self.turn_times), []
+            line = f"{name}: {len(self.sessions)} sessions, {len(times) / (now - last):.0f} turns/s"
+            if times:
+                line += f", turn p50 {statistics.median(times) * 1000:.2f} ms, p99 {times[len(times) * 99 // 100] * 1000:.2f} ms"
+            print(line, flush=True)
+            last = now
+
+
+async def serve(args: argparse.Namespace, name: str) -> None:
+    if args.rooms and main.ROOM_LIBRARY is None:
+        # Workers started with "spawn" do not inherit the parent's mapping
+        main.ROOM_LIBRARY = main.RoomLibrary(args.rooms)
+    server = Server(args.view)
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handle, path=args.unix, limit=4096)
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port, limit=4096,
+                                              reuse_port=args.workers > 1, backlog=4096)
+    tasks = [asyncio.create_task(server.scheduler())]
+    if args.stats:
+        tasks.append(asyncio.create_task(server.report(args.stats, name)))
+    async with listener:
+        await asyncio.gather(*tasks)
+
+
+def run_worker(args: argparse.Namespace, name: str) -> None:
+    main.select_engine(args.engine)
+    try:
+        asyncio.run(serve(args, name))
+    except KeyboardInterrupt:
+        pass
+
+
+def cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Host many dungeon sessions in one process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=1, help="server processes sharing the TCP port (one per core)")
+    parser.add_argument("--view", default=f"{VIEW[0]}x{VIEW[1]}", metavar="ROWSxCOLS", help="frame size sent to clients")
+    parser.add_argument("--stats", type=float, default=5.0, metavar="SECONDS", help="print load every SECONDS (0: never)")
+    parser.add_argument("--rooms", metavar="FILE", help="room library from src/roomlib.py; games without a seed start on its seeds")
+    parser.add_argument("--engine", default=main.GRID_ENGINE, metavar="NAME", help="room generation engine: python or numpy")
+    args = parser.parse_args(argv)
+    try:
+        main.select_engine(args.engine)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        args.view = tuple(int(n) for n in args.view.lower().split("x"))
+    except ValueError:
+        args.view = ()
+    if len(args.view) != 2 or min(args.view) < 1:
+        parser.error("--view takes ROWSxCOLS, e.g. 24x24")
+    if args.workers < 1 or (args.unix and args.workers > 1):
+        parser.error("--workers must be at least 1, and 1 with --unix")
+    if args.rooms:
+        try:
+            main.ROOM_LIBRARY = main.RoomLibrary(args.rooms)
+            main.ROOM_LIBRARY.check(main.GRID_SIZE, main.GRID_ENGINE)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if args.unix and os.path.exists(args.unix):
+        os.unlink(args.unix)
+
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Serving on {where} with {args.workers} worker(s)", flush=True)
+    if args.workers == 1:
+        run_worker(args, "server")
+        return 0
+    # Each worker is a whole server; the kernel spreads new connections over them
+    workers = [Process(target=run_worker, args=(args, f"worker {i}")) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    # A kill of this process alone (not the process group) still stops the workers
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
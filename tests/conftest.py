@@ -0,0 +1,5 @@
+# The game and its tools are plain scripts in src/, imported the way they import each other
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
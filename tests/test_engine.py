@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+import main
+
+
+def play(state: main.GameState, rng: random.Random, turns: int) -> None:
+    for _ in range(turns):
+        if state.game_over:
+            break
+        main.step(state, "".join(rng.choice("wasdfx") for _ in range(state.allowed_moves)))
+
+
+def test_batch_matches_scalar():
+    pytest.importorskip("numpy")
+    import batch
+    for difficulty in "emh":
+        assert batch.check(games=4, turns=40, difficulty=difficulty, seed=11)
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "game.sav")
+    state = main.GameState("m", prefetch=False, seed=5)
+    play(state, random.Random(1), 12)
+    main.save_game(state, path)
+    loaded = main.load_game(path, prefetch=False)
+    assert main.state_digest(loaded) == main.state_digest(state)
+    # The random stream is saved too, so both copies keep playing the same game
+    play(state, random.Random(2), 12)
+    play(loaded, random.Random(2), 12)
+    assert main.state_digest(loaded) == main.state_digest(state)
@@ -0,0 +1,56 @@
+import pytest
+
+import main
+import roomlib
+
+SEEDS = [0, 7, -3, 2**63 - 1]
+ROOMS = [1, 2, 5, 10]
+
+
+@pytest.fixture(scope="module")
+def library(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("lib") / "rooms.lib")
+    records = [record for d in "emh" for seed in SEEDS
+               for record in roomlib.build_rooms(d, seed, ROOMS, main.GRID_SIZE, main.GRID_ENGINE)]
+    main.write_library(path, records, main.GRID_SIZE, main.GRID_ENGINE)
+    lib = main.RoomLibrary(path)
+    lib.check(main.GRID_SIZE, main.GRID_ENGINE)
+    yield lib
+    lib.close()
+
+
+def test_library_rooms_match_generated_rooms(library):
+    for d in "emh":
+        for seed in SEEDS:
+            for room in ROOMS:
+                generated = main.generate_room(main.Actor(row=1, col=1, hp=0), room, d, main.room_rng(seed, room))
+                stored = library.get(d, room, seed)
+                assert main.encode_room(stored) == main.encode_room(generated)
+                assert stored[0] == generated[0]
+
+
+def test_library_misses(library):
+    assert library.get("e", 3, 0) is None
+    assert library.get("e", 1, 8) is None
+    # Seeds outside 64 bits can never be in a library
+    assert library.get("e", 1, 2**63) is None
+    assert library.get("e", 1, -2**63 - 1) is None
+
+
+def test_games_play_the_same_with_the_library(library, monkeypatch):
+    # Room changes by cheat and through exits load library rooms instead of building them
+    keys = ["ddss", "sdsd", "f", "568405", "eweded", "5684010", "ssdd", "568402"] * 4
+    traces, from_library = [], 0
+    for room_library in (None, library):
+        monkeypatch.setattr(main, "ROOM_LIBRARY", room_library)
+        state = main.GameState("m", prefetch=False, seed=7)
+        trace = []
+        for actions in keys:
+            main.step(state, actions)
+            state.player.hp = 100
+            trace.append(main.state_digest(state))
+            # Library rooms come without build stats
+            from_library += state.room_stats is None
+        traces.append(trace)
+    assert traces[0] == traces[1]
+    assert from_library
@@ -0,0 +1,80 @@
+import asyncio
+
+import loadgen
+import main
+import server
+
+
+async def start_server():
+    srv = server.Server()
+    listener = await asyncio.start_server(srv.handle, "127.0.0.1", 0)
+    scheduler = asyncio.create_task(srv.scheduler())
+    return listener, scheduler, listener.sockets[0].getsockname()[1]
+
+
+async def send(client, line: str) -> list[str]:
+    # One command, returns the event (and error) lines of its reply
+    reader, writer = client
+    writer.write((line + "\n").encode())
+    await writer.drain()
+    events, _ = await loadgen.read_reply(reader)
+    return events
+
+
+def run_with_server(scenario) -> None:
+    async def run():
+        listener, scheduler, port = await start_server()
+        try:
+            await asyncio.wait_for(scenario(port), timeout=30)
+        finally:
+            scheduler.cancel()
+            listener.close()
+    asyncio.run(run())
+
+
+def test_bad_seed_is_an_error_reply():
+    async def scenario(port):
+        client = await asyncio.open_connection("127.0.0.1", port)
+        events = await send(client, "new h 99999999999999999999999")
+        assert events and events[0].startswith("error bad seed")
+        assert await send(client, "new h 5") == []
+        assert await send(client, "d") is not None
+        client[1].close()
+    run_with_server(scenario)
+
+
+def test_failing_command_only_ends_its_session(monkeypatch):
+    step = main.step
+
+    def broken_step(state, actions):
+        if actions == "boom":
+            raise RuntimeError("broken turn")
+        return step(state, actions)
+
+    monkeypatch.setattr(main, "step", broken_step)
+
+    async def scenario(port):
+        bad = await asyncio.open_connection("127.0.0.1", port)
+        good = await asyncio.open_connection("127.0.0.1", port)
+        await send(bad, "new m 1")
+        await send(good, "new m 2")
+        events = await send(bad, "boom")
+        assert events == ["error RuntimeError: broken turn"]
+        assert await bad[0].read() == b""  # The failing session was closed
+        for _ in range(5):
+            events = await send(good, "x")
+            assert not any(event.startswith("error") for event in events)
+        good[1].close()
+    run_with_server(scenario)
+
+
+def test_new_world_without_seed():
+    async def scenario(port):
+        client = await asyncio.open_connection("127.0.0.1", port)
+        for command in ("new m world", "new m world 7", "new m 7 world"):
+            assert await send(client, command) == []
+            events = await send(client, "d")
+            assert not any(event.startswith("error") for event in events)
+        assert (await send(client, "new m 7 8"))[0].startswith("error unexpected")
+        client[1].close()
+    run_with_server(scenario)
@@ -0,0 +1,86 @@
+import itertools
+import pickle
+
+import pytest
+
+import main
+
+# 9x9 trap rooms where entering by the exit (spike clock 1) and entering any other
+# way (clock 0) need a different number of turns
+ROOMS = [("m", 1, 5), ("m", 4, 10), ("h", 3, 5)]
+SIZE = 9
+
+
+@pytest.fixture(autouse=True)
+def small_rooms(monkeypatch):
+    monkeypatch.setattr(main, "GRID_SIZE", SIZE)
+    # Power-ups shield the player from arrows and spikes, which the search leaves out
+    monkeypatch.setattr(main, "place_powerups", lambda *args, **kwargs: None)
+
+
+def action_paths(state: main.GameState) -> dict[tuple, str]:
+    # One action string per distinct walk through the tiles (staying is "x")
+    paths = {}
+    for actions in map("".join, itertools.product("wasdx", repeat=state.allowed_moves)):
+        walker = main.Actor(row=state.player.row, col=state.player.col, hp=1)
+        path = []
+        for key in actions:
+            if key != "x":
+                main.try_move(walker, *main.DIRECTIONS[key], state.grid)
+            path.append((walker.row, walker.col))
+        paths.setdefault(tuple(path), actions)
+    return paths
+
+
+def fewest_turns(state: main.GameState, limit: int = 40) -> int | None:
+    # Breadth-first over whole turns of the real step(): every walk from every tile
+    # the player can be on alive. Without monsters or power-ups the hazards do not
+    # depend on the player, so one state per tile and turn is enough.
+    room, start = state.room, state.turn
+    frontier = [state]
+    for _ in range(limit):
+        tiles = {}
+        for current in frontier:
+            saved = pickle.dumps(current)
+            for actions in action_paths(current).values():
+                trial = pickle.loads(saved)
+                main.step(trial, actions)
+                if trial.room != room:
+                    return trial.turn - start
+                if not trial.game_over:
+                    tiles.setdefault((trial.player.row, trial.player.col), trial)
+        frontier = list(tiles.values())
+        if not frontier:
+            return None
+    return None
+
+
+def entered(difficulty: str, room: int, seed: int, tick: int) -> main.GameState:
+    if tick == 0:
+        return main.GameState(difficulty, prefetch=False, room=room, seed=seed)
+    # Walk through the previous room's exit, the way a room is entered in play
+    state = main.GameState(difficulty, prefetch=False, room=room - 1, seed=seed)
+    state.monsters.load([])
+    state.arrows.clear()
+    state.player.hp = 10**6
+    row, col = state.exit_pos
+    if state.grid[row - 1][col] == main.FLOOR:
+        state.player.row, state.player.col, key = row - 1, col, "s"
+    else:
+        state.player.row, state.player.col, key = row, col - 1, "d"
+    # With actions to spare the room is entered inside apply_actions and the rest of
+    # the turn (spikes included) runs in it
+    main.step(state, key.ljust(state.allowed_moves, "x"))
+    assert state.room == room
+    assert all(spike.turn == tick for spike in state.spikes)
+    return state
+
+
+@pytest.mark.parametrize("difficulty, seed, room", ROOMS)
+def test_survival_search_matches_step(difficulty, seed, room):
+    grid, exit_pos, _, spikes, shooters = main.generate_room(main.Actor(row=1, col=1, hp=0), room, difficulty, main.room_rng(seed, room))
+    turns = {}
+    for tick in main.ENTRY_SPIKE_TICKS:
+        turns[tick] = main.survival_search(grid, exit_pos, spikes, shooters, spike_tick=tick)[0]
+        assert fewest_turns(entered(difficulty, room, seed, tick)) == turns[tick]
+    assert len(set(turns.values())) > 1
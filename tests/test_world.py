@@ -0,0 +1,60 @@
+import random
+
+import main
+
+CHUNK = 10
+
+
+def explore(seed: int, cache: int, turns: int = 120) -> tuple[list[str], list[tuple[int, int]], main.WorldState]:
+    # Walks out towards far tiles across chunk borders and back again (with time stop
+    # for long walks), mixed with random actions, and never lets the game end
+    state = main.WorldState("e", seed=seed, chunk_size=CHUNK, cache=cache)
+    rng = random.Random(seed)
+    digests, centers = [], []
+    for turn in range(turns):
+        if turn % 3 == 0:
+            actions = "56840time_stop"
+        elif turn % 3 == 1:
+            player = state.player
+            way = 1 if turn % 60 < 30 else -1
+            goal = max(main.reachable_tiles(state.grid, (player.row, player.col)),
+                       key=lambda tile: way * (tile[0] + tile[1]) + rng.random() * 2 * CHUNK)
+            field = main.FlowField(state.grid, goal)
+            row, col, actions = player.row, player.col, "u"
+            for _ in range(4 * CHUNK):
+                step = field.best_step(row, col, rng)
+                if step is None:
+                    break
+                row, col = row + step[0], col + step[1]
+                actions += next(key for key, move in main.DIRECTIONS.items() if move == step)
+        else:
+            actions = "".join(rng.choice("wasdfe") for _ in range(state.allowed_moves))
+        main.step(state, actions)
+        state.player.hp = 10**6
+        state.game_over = False
+        digests.append(main.state_digest(state))
+        centers.append(state.center)
+    return digests, centers, state
+
+
+def test_chunk_cache_size_does_not_change_the_game():
+    for seed in range(2):
+        # 9 chunks is only the live window, so every chunk left behind is evicted
+        small, centers, state = explore(seed, 9)
+        large, _, _ = explore(seed, 1000)
+        assert small == large
+        assert state.store.deltas
+        # The walk came back to chunks it had left, so deltas were re-applied
+        assert any(center in centers[:i - 2] and center != centers[i - 1] for i, center in enumerate(centers))
+
+
+def test_untouched_chunks_keep_no_delta():
+    store = main.ChunkStore(3, "m", CHUNK, capacity=2)
+    for col in range(4):
+        store.get((0, col))
+    assert store.deltas == {}
+    store.get((0, 4)).tiles[1][1] = main.WALL
+    for col in range(5, 8):
+        store.get((0, col))
+    assert list(store.deltas) == [(0, 4)]
+    assert store.get((0, 4)).tiles[1][1] == main.WALL